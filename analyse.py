@@ -7,7 +7,7 @@
 
 Usage:
   analyse.py list (cases|analysers)
-  analyse.py analyse <analyser> <case_number>
+  analyse.py analyse <analyser> <case_number> [--profile]
   analyse.py allanalysers <case_number>
   analyse.py (-h | --help)
   analyse.py --version
@@ -15,17 +15,25 @@ Usage:
 Options:
   -h --help     Show this screen.
   -v --version     Show version.
+  --profile        Profile the analyser, saved in parsed_data/<case_number>/_profiles/.
 """
 
 import config
 import parsing
 
-import os
 import sys
-import glob
-import importlib.util
-from docopt import docopt
-from tabulate import tabulate
+
+from utils import casedb
+from utils import lazy
+from utils import parsed_data
+from utils import plugins
+from utils import profiling
+from utils import resources
+
+# loaded on first use, see utils/lazy.py
+scheduler = lazy.module('utils.scheduler')
+docopt = lazy.function('docopt', 'docopt')
+tabulate = lazy.function('tabulate', 'tabulate')
 
 version_string = "analyse.py v2023-04-27 Version 1.0"
 
@@ -34,52 +42,96 @@ def list_analysers(folder):
     """
         List available analysers
     """
-    os.chdir(folder)
-    modules = glob.glob(os.path.join(os.path.dirname('.'), "*.py"))
     lines = []
-    for analyser in modules:
-        try:
-            spec = importlib.util.spec_from_file_location(analyser[:-3], analyser)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            line = [analyser[:-3], module.analyser_description]
-            lines.append(line)
-        except:     # noqa: E722
-            continue
+    for analyser, metadata in plugins.list_plugins(folder, 'analyser_call').items():
+        line = [analyser, metadata.get('analyser_description')]
+        lines.append(line)
 
     headers = ['Analyser Name', 'Analyser Description']
 
     print(tabulate(lines, headers=headers))
 
 
-def analyse(analyser, caseid):
-    # Load parser module
-    spec = importlib.util.spec_from_file_location(analyser[:-3], config.analysers_folder + "/" + analyser + '.py')
-    print(spec, file=sys.stderr)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+def run_analyser(analyser, caseid, profile=False):
+    """
+        Run an analyser on the parsed data of a case, profiled if profile is True.
+        Return the path of the output file, exceptions of the analyser are raised.
+    """
+    analyser_file = config.analysers_folder + "/" + analyser + '.py'
+    metadata = plugins.read_metadata(analyser_file)
 
-    # building command
     parse_data_path = "%s/%s/" % (config.parsed_data_folder, caseid)
-    output_file = config.parsed_data_folder + caseid + '/' + analyser + "." + module.analyser_format
-    command = "module.%s('%s', '%s')" % (module.analyser_call, parse_data_path, output_file)
-    result = eval(command)
+    output_file = config.parsed_data_folder + caseid + '/' + analyser + "." + metadata['analyser_format']
+
+    # the outputs of the parsers it reads, all the parsed data if not declared
+    folder = config.parsed_data_folder + caseid
+    if 'analyser_input' in metadata:
+        inputs = [parsed_data.output_file(folder, parser) for parser in metadata['analyser_input']]
+        input_bytes = resources.path_size([path for path in inputs if path is not None])
+    else:
+        input_bytes = resources.path_size(parse_data_path)
+
+    meter = resources.Meter()
+    try:
+        with meter, profiling.profile(folder, analyser, profile):
+            plugins.get_function(analyser_file, metadata['analyser_call'])(parse_data_path, output_file)
+    except MemoryError:
+        resources.record(folder, analyser, resources.entry('analyser', meter, 'out of memory', input_bytes,
+                                                           error=resources.out_of_memory(meter)))
+        raise
+    except Exception as e:
+        resources.record(folder, analyser, resources.entry('analyser', meter, 'error', input_bytes,
+                                                           error=f'{type(e).__name__}: {str(e)}'))
+        raise
+    resources.record(folder, analyser, resources.entry('analyser', meter, 'ok', input_bytes,
+                                                       resources.path_size(output_file)))
+
+    return output_file
+
+
+def analyse(analyser, caseid, profile=False):
+    if config.worker_memory_limit is not None:
+        resources.limit_memory(config.worker_memory_limit)
+    try:
+        output_file = run_analyser(analyser, caseid, profile)
+    except MemoryError:
+        print(f'{analyser} failed: {resources.out_of_memory()}', file=sys.stderr)
+        sys.exit(-1)
+    casedb.load_output(config.parsed_data_folder + caseid, analyser, output_file)
 
     print(f'Execution success, output saved in: {output_file}', file=sys.stderr)
+    if profile:
+        print(f'Profile saved in: {", ".join(profiling.profile_files(config.parsed_data_folder + caseid, analyser))}',
+              file=sys.stderr)
 
     return 0
 
 
 def allanalysers(caseid):
-    os.chdir(config.analysers_folder)
-    modules = glob.glob(os.path.join(os.path.dirname('.'), "*.py"))
-    os.chdir('..')
-    for analyser in modules:
-        try:
-            print(f'Trying: {analyser[:-3]}', file=sys.stderr)
-            analyse(analyser[:-3], caseid)
-        except:     # noqa: E722
-            continue
+    """
+        Run all the analysers on a case, one after the other, each in a worker
+        process limited to config.worker_memory_limit MB. An analyser failing
+        or running out of memory does not stop the others, its failure is
+        reported.
+    """
+    def done(task):
+        print(f"{task.name}: {task.status} ({task.duration:.1f}s)", file=sys.stderr)
+        if task.status == 'ok':
+            casedb.load_output(config.parsed_data_folder + caseid, task.name, task.result)
+
+    tasks = [scheduler.Task(analyser, run_analyser, (analyser, caseid))
+             for analyser in plugins.list_plugins(config.analysers_folder, 'analyser_call')]
+    tasks = scheduler.run(tasks, 1, None, done, memory_limit=config.worker_memory_limit)
+
+    lines = []
+    for task in tasks:
+        status = task.status
+        if task.error:
+            status += ': ' + task.error.splitlines()[0]
+        lines.append([task.name, status, f"{task.duration:.1f}"])
+
+    headers = ['Analyser', 'Status', 'Duration (s)']
+    print(tabulate(lines, headers=headers))
     return 0
 
 # --------------------------------------------------------------------------- #
@@ -95,12 +147,12 @@ def main():
 
     arguments = docopt(__doc__, version=version_string)
     if arguments['list'] and arguments['cases']:
-        parsing.list_cases(config.cases_file)
+        parsing.list_cases(config.cases_db)
     elif arguments['list'] and arguments['analysers']:
         list_analysers(config.analysers_folder)
     elif arguments['analyse']:
         if arguments['<case_number>'].isdigit():
-            analyse(arguments['<analyser>'], arguments['<case_number>'])
+            analyse(arguments['<analyser>'], arguments['<case_number>'], arguments['--profile'])
         else:
             print("case number should be ... a number ...", file=sys.stderr)
     elif arguments['allanalysers']:
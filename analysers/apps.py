@@ -15,12 +15,16 @@ Options:
   -v --version     Show version.
 """
 import os
+import sys
 # from optparse import OptionParser
 import json
-import ijson
 from docopt import docopt
 # import glob
 
+sys.path.append(os.path.abspath('./'))
+sys.path.append(os.path.abspath('../'))
+from utils import parsed_data       # noqa: E402
+
 version_string = "sysdiagnose-demo-analyser.py v2023-04-28 Version 0.1"
 
 # ----- definition for analyse.py script -----#
@@ -29,6 +33,7 @@ version_string = "sysdiagnose-demo-analyser.py v2023-04-28 Version 0.1"
 analyser_description = "Get list of Apps installed on the device"
 analyser_call = "apps_analysis"
 analyser_format = "md"
+analyser_input = ["sysdiagnose-accessibility-tcc", "sysdiagnose-brctl", "sysdiagnose-itunesstore", "sysdiagnose-logarchive"]
 
 # --------------------------------------------------------------------------- #
 
@@ -42,50 +47,55 @@ def apps_analysis(jsondir, filename):
 
     # building data depending on the source
     for jsonfile in jsondir:
-        if jsonfile.endswith('accessibility-tcc.json'):
-            with open(jsonfile, 'r') as f:
-                accessibility_data = json.load(f)
-                for entry in accessibility_data['access']:
-                    if entry['client'] not in apps.keys():
-                        apps[entry['client']]= {"found": ['accessibility-tcc'], "services": [entry['service']]}
-                    else:
-                        apps[entry['client']]["services"].append(entry['service'])
-        elif jsonfile.endswith('brctl.json'):
-            with open(jsonfile, 'r') as f:
-                brctl_data = json.load(f)
-                # directly going to the list of apps
-                for entry in brctl_data['app_library_id'].keys():
-                    if entry not in apps.keys():
-                        apps[entry]= {"found": ['brctl'], "libraries": brctl_data['app_library_id'][entry]}
-                    else:
-                        apps[entry]["libraries"] = brctl_data['app_library_id'][entry]
-                        apps[entry]["found"].append('brctl')
-        elif jsonfile.endswith('itunesstore.json'):
-            with open(jsonfile, 'r') as f:
-                itunesstore_data = json.load(f)
-                # directly going to the list of apps
-                for entry in itunesstore_data['application_id']:
-                    if entry['bundle_id'] not in apps.keys():
-                        apps[entry['bundle_id']]= {"found": ['itunesstore']}
-                    else:
-                        apps[entry['bundle_id']]["found"].append('itunesstore')
-        elif jsonfile.endswith('logarchive.json'):
+        name = parsed_data.name_of(jsonfile)
+        if name.endswith('accessibility-tcc'):
+            # only the two columns needed are read from a columnar output
+            access = parsed_data.columns(jsonfile, ['client', 'service'], 'access')
+            for client, service in zip(access['client'], access['service']):
+                if client not in apps.keys():
+                    apps[client]= {"found": ['accessibility-tcc'], "services": [service]}
+                else:
+                    apps[client]["services"].append(service)
+        elif name.endswith('brctl'):
+            brctl_data = parsed_data.load(jsonfile)
+            # directly going to the list of apps
+            for entry in brctl_data['app_library_id'].keys():
+                if entry not in apps.keys():
+                    apps[entry]= {"found": ['brctl'], "libraries": brctl_data['app_library_id'][entry]}
+                else:
+                    apps[entry]["libraries"] = brctl_data['app_library_id'][entry]
+                    apps[entry]["found"].append('brctl')
+        elif name.endswith('itunesstore'):
+            itunesstore_data = parsed_data.load(jsonfile)
+            # directly going to the list of apps
+            for entry in itunesstore_data['application_id']:
+                if entry['bundle_id'] not in apps.keys():
+                    apps[entry['bundle_id']]= {"found": ['itunesstore']}
+                else:
+                    apps[entry['bundle_id']]["found"].append('itunesstore')
+        elif name.endswith('logarchive'):
             # try something simple
             app_list = []
-            with open(jsonfile, 'rb') as f:
-                for entry in ijson.items(f, 'data.item'):
-                    if 'subsystem' in entry.keys():
-                        if entry['subsystem'] not in app_list and '.' in entry['subsystem']:
-                            if entry['subsystem'].startswith('pid/'):
-                                pass
-                            elif entry['subsystem'].startswith('user/'):
-                                pass
+            key = None if parsed_data.is_stream_file(jsonfile) else 'data'
+            if parsed_data.is_columnar(jsonfile):
+                # only this column is read
+                subsystems = parsed_data.columns(jsonfile, ['subsystem'], key)['subsystem']
+            else:
+                # streamed, the log archive may not fit in memory
+                subsystems = (event.get('subsystem') for event in parsed_data.records(jsonfile, key))
+            for subsystem in subsystems:
+                if subsystem is not None:
+                    if subsystem not in app_list and '.' in subsystem:
+                        if subsystem.startswith('pid/'):
+                            pass
+                        elif subsystem.startswith('user/'):
+                            pass
+                        else:
+                            app_list.append(subsystem)
+                            if subsystem not in apps.keys():
+                                apps[subsystem]= {"found": ['logarchive']}
                             else:
-                                app_list.append(entry['subsystem'])
-                                if entry['subsystem'] not in apps.keys():
-                                    apps[entry['subsystem']]= {"found": ['logarchive']}
-                                else:
-                                    apps[entry['subsystem']]["found"].append('logarchive')
+                                apps[subsystem]["found"].append('logarchive')
     print(json.dumps(apps, indent=4))
 
     return
@@ -108,7 +118,7 @@ def main():
         # go through the json files in the folder
         json_files = []
         for file in os.listdir(arguments['<logfolder>']):
-            if file.endswith(".json"):
+            if file.endswith(tuple(parsed_data.extensions)):
                 json_files.append(os.path.join(arguments['<logfolder>'], file))
         # call the function to generate the apps analysis
         apps_analysis(json_files, 'tmp.md')
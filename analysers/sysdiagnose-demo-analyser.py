@@ -18,6 +18,7 @@ version_string = "sysdiagnose-demo-analyser.py v2023-04-28 Version 0.1"
 analyser_description = "Do something useful (DEMO)"
 analyser_call = "generate_something"
 analyser_format = "json"
+analyser_input = []
 
 
 def generate_something(jsondir, filename):
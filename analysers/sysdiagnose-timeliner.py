@@ -8,10 +8,14 @@
 
 import os
 import sys
-import json
 from datetime import datetime
 from optparse import OptionParser
 
+sys.path.append(os.path.abspath('./'))
+sys.path.append(os.path.abspath('../'))
+from utils import parsed_data       # noqa: E402
+from utils import serialization     # noqa: E402
+
 version_string = "sysdiagnose-timeliner.py v2023-04-05 Version 0.1"
 
 # ----- definition for analyse.py script -----#
@@ -20,19 +24,29 @@ version_string = "sysdiagnose-timeliner.py v2023-04-05 Version 0.1"
 analyser_description = "Generate a Timesketch compatible timeline"
 analyser_call = "generate_timeline"
 analyser_format = "jsonl"
+analyser_input = [
+    "sysdiagnose-accessibility-tcc",
+    "sysdiagnose-mobileactivation",
+    "sysdiagnose-powerlogs",
+    "sysdiagnose-swcutil",
+    "sysdiagnose-shutdownlogs",
+    "sysdiagnose-logarchive",
+    "sysdiagnose-wifisecurity",
+    "sysdiagnose_wifi_known_networks",
+]
 
 # Structure:
-# filename : parsing_function
+# parser : parsing_function
 timestamps_files = {
-    "sysdiagnose-accessibility-tcc.json": "__extract_ts_accessibility_tcc",
+    "sysdiagnose-accessibility-tcc": "__extract_ts_accessibility_tcc",
     # itunesstore: TODO
-    "sysdiagnose-mobileactivation.json": "__extract_ts_mobileactivation",
-    "sysdiagnose-powerlogs.json": "__extract_ts_powerlogs",
-    "sysdiagnose-swcutil.json": "__extract_ts_swcutil",
-    "sysdiagnose-shutdownlogs.json": "__extract_ts_shutdownlogs",
-    "sysdiagnose-logarchive.json": "__extract_ts_logarchive",
-    "sysdiagnose-wifisecurity.json": "__extract_ts_wifisecurity",
-    "sysdiagnose_wifi_known_networks.json": "__extract_ts_wifi_known_networks",
+    "sysdiagnose-mobileactivation": "__extract_ts_mobileactivation",
+    "sysdiagnose-powerlogs": "__extract_ts_powerlogs",
+    "sysdiagnose-swcutil": "__extract_ts_swcutil",
+    "sysdiagnose-shutdownlogs": "__extract_ts_shutdownlogs",
+    "sysdiagnose-logarchive": "__extract_ts_logarchive",
+    "sysdiagnose-wifisecurity": "__extract_ts_wifisecurity",
+    "sysdiagnose_wifi_known_networks": "__extract_ts_wifi_known_networks",
 }
 
 
@@ -43,21 +57,20 @@ timeline = []
 
 def __extract_ts_mobileactivation(filename):
     try:
-        with open(filename, 'r') as fd:
-            data = json.load(fd)
-            if "events" in data.keys():
-                for event in data["events"]:
-                    timestamp = datetime.strptime(event["timestamp"], "%Y-%m-%d %H:%M:%S")
-                    ts_event = {
-                        "message": "Mobile Activation",
-                        "timestamp": int(timestamp.timestamp() * 1000000),
-                        "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                        "timestamp_desc": "Mobile Activation Time",
-                        "extra_field_1": "Build Version: %s" % event["build_version"]
-                    }
-                    timeline.append(ts_event)
-            else:
-                return False
+        data = parsed_data.load(filename)
+        if "events" in data.keys():
+            for event in data["events"]:
+                timestamp = datetime.strptime(event["timestamp"], "%Y-%m-%d %H:%M:%S")
+                ts_event = {
+                    "message": "Mobile Activation",
+                    "timestamp": int(timestamp.timestamp() * 1000000),
+                    "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                    "timestamp_desc": "Mobile Activation Time",
+                    "extra_field_1": "Build Version: %s" % event["build_version"]
+                }
+                timeline.append(ts_event)
+        else:
+            return False
         return True
     except Exception as e:
         print(f"ERROR while extracting timestamp from {filename}. Reason: {str(e)}")
@@ -67,13 +80,12 @@ def __extract_ts_mobileactivation(filename):
 
 def __extract_ts_powerlogs(filename):
     try:
-        with open(filename, 'r') as fd:
-            data = json.load(fd)
+        data = parsed_data.load(filename)
 
-            # extract tables of interest
-            __extract_ts_powerlogs__PLProcessMonitorAgent_EventPoint_ProcessExit(data)  # PLProcessMonitorAgent_EventPoint_ProcessExit
-            __extract_ts_powerlogs__PLProcessMonitorAgent_EventBackward_ProcessExitHistogram(data)  # PLProcessMonitorAgent_EventBackward_ProcessExitHistogram
-            __extract_ts_powerlogs__PLAccountingOperator_EventNone_Nodes(data)  # PLAccountingOperator_EventNone_Nodes
+        # extract tables of interest
+        __extract_ts_powerlogs__PLProcessMonitorAgent_EventPoint_ProcessExit(data)  # PLProcessMonitorAgent_EventPoint_ProcessExit
+        __extract_ts_powerlogs__PLProcessMonitorAgent_EventBackward_ProcessExitHistogram(data)  # PLProcessMonitorAgent_EventBackward_ProcessExitHistogram
+        __extract_ts_powerlogs__PLAccountingOperator_EventNone_Nodes(data)  # PLAccountingOperator_EventNone_Nodes
         return True
     except Exception as e:
         print(f"ERROR while extracting timestamp from {filename}. Reason: {str(e)}")
@@ -144,22 +156,21 @@ def __extract_ts_swcutil(filename):
             "Next Check": "2023-02-28 22:06:35 +0000"
         },
     """
-    with open(filename, 'r') as fd:
-        data = json.load(fd)
-        if "db" in data.keys():
-            for service in data["db"]:
-                try:
-                    timestamp = datetime.strptime(service["Last Checked"], "%Y-%m-%d %H:%M:%S %z")
-                    ts_event = {
-                        "message": service["Service"],
-                        "timestamp": int(timestamp.timestamp() * 1000000),
-                        "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                        "timestamp_desc": "swcutil last checkeed",
-                        "extra_field_1": "application: %s" % service["App ID"]
-                    }
-                    timeline.append(ts_event)
-                except Exception as e:
-                    print(f"ERROR {filename} while extracting timestamp from {(service['Service'])} - {(service['App ID'])}. Record not inserted.")
+    data = parsed_data.load(filename)
+    if "db" in data.keys():
+        for service in data["db"]:
+            try:
+                timestamp = datetime.strptime(service["Last Checked"], "%Y-%m-%d %H:%M:%S %z")
+                ts_event = {
+                    "message": service["Service"],
+                    "timestamp": int(timestamp.timestamp() * 1000000),
+                    "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                    "timestamp_desc": "swcutil last checkeed",
+                    "extra_field_1": "application: %s" % service["App ID"]
+                }
+                timeline.append(ts_event)
+            except Exception as e:
+                print(f"ERROR {filename} while extracting timestamp from {(service['Service'])} - {(service['App ID'])}. Record not inserted.")
     return True
 
 
@@ -181,20 +192,19 @@ def __extract_ts_accessibility_tcc(filename):
             { "last_modified": "1537694318" }
     """
     try:
-        with open(filename, 'r') as fd:
-            data = json.load(fd)
-            if "access" in data.keys():
-                for access in data["access"]:
-                    # create timeline entry
-                    timestamp = datetime.fromtimestamp(int(access["last_modified"]))
-                    ts_event = {
-                        "message": access["service"],
-                        "timestamp": int(timestamp.timestamp() * 1000000),
-                        "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                        "timestamp_desc": "Accessibility TC Last Modified",
-                        "extra_field_1": "client: %s" % access["client"]
-                    }
-                    timeline.append(ts_event)
+        data = parsed_data.load(filename)
+        if "access" in data.keys():
+            for access in data["access"]:
+                # create timeline entry
+                timestamp = datetime.fromtimestamp(int(access["last_modified"]))
+                ts_event = {
+                    "message": access["service"],
+                    "timestamp": int(timestamp.timestamp() * 1000000),
+                    "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                    "timestamp_desc": "Accessibility TC Last Modified",
+                    "extra_field_1": "client: %s" % access["client"]
+                }
+                timeline.append(ts_event)
         return True
     except Exception as e:
         print(f"ERROR while extracting timestamp from {filename}. Reason {str(e)}")
@@ -203,24 +213,23 @@ def __extract_ts_accessibility_tcc(filename):
 
 def __extract_ts_shutdownlogs(filename):
     try:
-        with open(filename, 'r') as fd:
-            data = json.load(fd)
-            for ts in data["data"].keys():
-                try:
-                    # create timeline entries
-                    timestamp = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S+00:00")
-                    processes = data["data"][ts]
-                    for p in processes:
-                        ts_event = {
-                            "message": p["path"],
-                            "timestamp": int(timestamp.timestamp() * 1000000),
-                            "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                            "timestamp_desc": "Entry in shutdown.log",
-                            "extra_field_1": "pid: %s" % p["pid"]
-                        }
-                        timeline.append(ts_event)
-                except Exception as e:
-                    print(f"WARNING: entry not parsed: {ts}")
+        data = parsed_data.load(filename)
+        for ts in data["data"].keys():
+            try:
+                # create timeline entries
+                timestamp = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S+00:00")
+                processes = data["data"][ts]
+                for p in processes:
+                    ts_event = {
+                        "message": p["path"],
+                        "timestamp": int(timestamp.timestamp() * 1000000),
+                        "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                        "timestamp_desc": "Entry in shutdown.log",
+                        "extra_field_1": "pid: %s" % p["pid"]
+                    }
+                    timeline.append(ts_event)
+            except Exception as e:
+                print(f"WARNING: entry not parsed: {ts}")
         return True
     except Exception as e:
         print(f"ERROR while extracting timestamp from {filename}. Reason: {str(e)}")
@@ -264,22 +273,21 @@ def __extract_ts_logarchive(filename):
         },
     """         # XXX FIXME pycodestyle error W605 when not using python's r-strings. Are the backslashes actually there in the data?
     try:
-        with open(filename, 'r') as fd:
-            data = json.load(fd)
-            for trace in data["data"]:
-                try:
-                    # create timeline entry
-                    timestamp = datetime.strptime(trace["timestamp"], "%Y-%m-%d %H:%M:%S.%f%z")
-                    ts_event = {
-                        "message": trace["eventMessage"],
-                        "timestamp": int(timestamp.timestamp() * 1000000),
-                        "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                        "timestamp_desc": "Entry in logarchive: %s" % trace["eventType"],
-                        "extra_field_1": "subsystem: %s; processImageUUID: %s; processImagePath: %s" % (trace["subsystem"], trace["processImageUUID"], trace["processImagePath"])
-                    }
-                    timeline.append(ts_event)
-                except Exception as e:
-                    print(f"WARNING: trace not parsed: {trace}")
+        # .jsonl when streamed by the parser, {"data": [...]} otherwise
+        for trace in parsed_data.records(filename, None if parsed_data.is_stream_file(filename) else 'data'):
+            try:
+                # create timeline entry
+                timestamp = datetime.strptime(trace["timestamp"], "%Y-%m-%d %H:%M:%S.%f%z")
+                ts_event = {
+                    "message": trace["eventMessage"],
+                    "timestamp": int(timestamp.timestamp() * 1000000),
+                    "datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                    "timestamp_desc": "Entry in logarchive: %s" % trace["eventType"],
+                    "extra_field_1": "subsystem: %s; processImageUUID: %s; processImagePath: %s" % (trace["subsystem"], trace["processImageUUID"], trace["processImagePath"])
+                }
+                timeline.append(ts_event)
+            except Exception as e:
+                print(f"WARNING: trace not parsed: {trace}")
         return True
     except Exception as e:
         print(f"ERROR while extracting timestamp from {filename}. Reason: {str(e)}")
@@ -302,33 +310,32 @@ def __extract_ts_wifisecurity(filename):
         "tomb": "0"
     """
     try:
-        with open(filename, 'r') as fd:
-            data = json.load(fd)
-            for wifi in data:
-                if bool(wifi):
-                    # create timeline entry
-                    ctimestamp = datetime.strptime(wifi["cdat"], "%Y-%m-%d %H:%M:%S %z")
-                    mtimestamp = datetime.strptime(wifi["mdat"], "%Y-%m-%d %H:%M:%S %z")
-
-                    # Event 1: creation
-                    ts_event = {
-                        "message": wifi["acct"],
-                        "timestamp": int(ctimestamp.timestamp() * 1000000),
-                        "datetime": ctimestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                        "timestamp_desc": "SSID added to known secured WIFI list",
-                        "extra_field_1": wifi["accc"]
-                    }
-                    timeline.append(ts_event)
+        data = parsed_data.load(filename)
+        for wifi in data:
+            if bool(wifi):
+                # create timeline entry
+                ctimestamp = datetime.strptime(wifi["cdat"], "%Y-%m-%d %H:%M:%S %z")
+                mtimestamp = datetime.strptime(wifi["mdat"], "%Y-%m-%d %H:%M:%S %z")
+
+                # Event 1: creation
+                ts_event = {
+                    "message": wifi["acct"],
+                    "timestamp": int(ctimestamp.timestamp() * 1000000),
+                    "datetime": ctimestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                    "timestamp_desc": "SSID added to known secured WIFI list",
+                    "extra_field_1": wifi["accc"]
+                }
+                timeline.append(ts_event)
 
-                    # Event 2: modification
-                    ts_event = {
-                        "message": wifi["acct"],
-                        "timestamp": int(mtimestamp.timestamp() * 1000000),
-                        "datetime": mtimestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                        "timestamp_desc": "SSID modified into the secured WIFI list",
-                        "extra_field_1": wifi["accc"]
-                    }
-                    timeline.append(ts_event)
+                # Event 2: modification
+                ts_event = {
+                    "message": wifi["acct"],
+                    "timestamp": int(mtimestamp.timestamp() * 1000000),
+                    "datetime": mtimestamp.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                    "timestamp_desc": "SSID modified into the secured WIFI list",
+                    "extra_field_1": wifi["accc"]
+                }
+                timeline.append(ts_event)
         return True
     except Exception as e:
         print(f"ERROR while extracting timestamp from {filename}. Reason {str(e)}")
@@ -337,52 +344,51 @@ def __extract_ts_wifisecurity(filename):
 
 
 def __extract_ts_wifi_known_networks(filename):
-    with open(filename, 'r') as fd:
-        data = json.load(fd)
-        for wifi in data.keys():
-            ssid = data[wifi]["SSID"]
-            try:
-                added = datetime.strptime(data[wifi]["AddedAt"], "%Y-%m-%d %H:%M:%S.%f")
-
-                # WIFI added
-                ts_event = {
-                    "message": "WIFI %s added" % ssid,
-                    "timestamp": added.timestamp(),
-                    "datetime": added.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                    "timestamp_desc": "%s added in known networks plist",
-                    "extra_field_1": "Add reason: %s" % data[wifi]["AddReason"]
-                }
-                timeline.append(ts_event)
-            except Exception as e:
-                print(f"ERROR {filename} while extracting timestamp from {ssid}. Reason: {str(e)}. Record not inserted.")
-
-                # WIFI modified
-            try:
-                updated = datetime.strptime(data[wifi]["UpdatedAt"], "%Y-%m-%d %H:%M:%S.%f")
-                ts_event = {
-                    "message": "WIFI %s added" % updated,
-                    "timestamp": updated.timestamp(),
-                    "datetime": updated.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                    "timestamp_desc": "%s updated in known networks plist",
-                    "extra_field_1": "Add reason: %s" % data[wifi]["AddReason"]
-                }
-                timeline.append(ts_event)
-            except Exception as e:
-                print(f"ERROR {filename} while extracting timestamp from {ssid}. Reason: {str(e)}. Record not inserted.")
-
-                # Password for wifi modified
-            try:
-                modified_password = datetime.strptime(data[wifi]["__OSSpecific__"]["WiFiNetworkPasswordModificationDate"], "%Y-%m-%d %H:%M:%S.%f")
-                ts_event = {
-                    "message": "Password for WIFI %s modified" % ssid,
-                    "timestamp": modified_password.timestamp(),
-                    "datetime": modified_password.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-                    "timestamp_desc": "%s password modified in known networks plist",
-                    "extra_field_1": "AP mode: %s" % data[wifi]["__OSSpecific__"]["AP_MODE"]
-                }
-                timeline.append(ts_event)
-            except Exception as e:
-                print(f"ERROR {filename} while extracting timestamp from {ssid}. Reason: {str(e)}. Record not inserted.")
+    data = parsed_data.load(filename)
+    for wifi in data.keys():
+        ssid = data[wifi]["SSID"]
+        try:
+            added = datetime.strptime(data[wifi]["AddedAt"], "%Y-%m-%d %H:%M:%S.%f")
+
+            # WIFI added
+            ts_event = {
+                "message": "WIFI %s added" % ssid,
+                "timestamp": added.timestamp(),
+                "datetime": added.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                "timestamp_desc": "%s added in known networks plist",
+                "extra_field_1": "Add reason: %s" % data[wifi]["AddReason"]
+            }
+            timeline.append(ts_event)
+        except Exception as e:
+            print(f"ERROR {filename} while extracting timestamp from {ssid}. Reason: {str(e)}. Record not inserted.")
+
+            # WIFI modified
+        try:
+            updated = datetime.strptime(data[wifi]["UpdatedAt"], "%Y-%m-%d %H:%M:%S.%f")
+            ts_event = {
+                "message": "WIFI %s added" % updated,
+                "timestamp": updated.timestamp(),
+                "datetime": updated.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                "timestamp_desc": "%s updated in known networks plist",
+                "extra_field_1": "Add reason: %s" % data[wifi]["AddReason"]
+            }
+            timeline.append(ts_event)
+        except Exception as e:
+            print(f"ERROR {filename} while extracting timestamp from {ssid}. Reason: {str(e)}. Record not inserted.")
+
+            # Password for wifi modified
+        try:
+            modified_password = datetime.strptime(data[wifi]["__OSSpecific__"]["WiFiNetworkPasswordModificationDate"], "%Y-%m-%d %H:%M:%S.%f")
+            ts_event = {
+                "message": "Password for WIFI %s modified" % ssid,
+                "timestamp": modified_password.timestamp(),
+                "datetime": modified_password.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                "timestamp_desc": "%s password modified in known networks plist",
+                "extra_field_1": "AP mode: %s" % data[wifi]["__OSSpecific__"]["AP_MODE"]
+            }
+            timeline.append(ts_event)
+        except Exception as e:
+            print(f"ERROR {filename} while extracting timestamp from {ssid}. Reason: {str(e)}. Record not inserted.")
 
     return True
 
@@ -394,9 +400,9 @@ def parse_json(jsondir):
     """
     # Loop through all the files to check
     for parser in timestamps_files.keys():
-        path = "%s/%s" % (jsondir, parser)
+        path = parsed_data.output_file(jsondir, parser)
 
-        if os.path.exists(path):
+        if path is not None:
             function_name = timestamps_files[parser]
             parser_function = globals()[function_name]
             parser_function(path)
@@ -412,7 +418,7 @@ def save_timeline(timeline, ts_file):
     try:
         with open(ts_file, 'w') as f:
             for event in timeline:
-                line = json.dumps(event)
+                line = serialization.dumps(event, compact=True)
                 f.write("%s\n" % line)
     except Exception as e:
         print(f"ERROR: impossible to save timeline to {timeline}. Reason: {str(e)}")
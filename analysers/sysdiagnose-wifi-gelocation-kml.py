@@ -4,7 +4,6 @@
 # Author: Aaron Kaplan <aaron@lo-res.org>
 
 import sys
-import json
 # import dateutil.parser
 from optparse import OptionParser
 
@@ -12,6 +11,7 @@ import xml.etree.ElementTree as ET
 
 
 sys.path.append('..')   # noqa: E402
+from utils import parsed_data       # noqa: E402
 # from sysdiagnose import config        # noqa: E402
 
 
@@ -23,6 +23,7 @@ version_string = "sysdiagnose-wifi-geolocation-kml.py v2023-08-09 Version 0.2"
 analyser_description = "Generate KML file for wifi geolocations"
 analyser_call = "generate_kml"
 analyser_format = "json"
+analyser_input = ["sysdiagnose_wifi_known_networks"]
 
 
 def generate_kml(jsonfile: str, outfile: str = "wifi-geolocations.kml"):
@@ -31,8 +32,7 @@ def generate_kml(jsonfile: str, outfile: str = "wifi-geolocations.kml"):
     Reads <jsonfile> as input and extracts all known Wi-Fi networks and their locations.
     """
     try:
-        with open(jsonfile, 'r') as fp:
-            json_data = json.load(fp)
+        json_data = parsed_data.load(jsonfile)
     except Exception as e:
         print(f"Error while parsing inputfile JSON. Reason: {str(e)}")
         sys.exit(-1)
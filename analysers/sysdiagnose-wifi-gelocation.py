@@ -5,7 +5,6 @@
 
 import os
 import sys
-import json
 import dateutil.parser
 from optparse import OptionParser
 
@@ -13,6 +12,7 @@ import gpxpy
 import gpxpy.gpx
 
 sys.path.append('..')   # noqa: E402
+from utils import parsed_data       # noqa: E402
 from sysdiagnose import config        # noqa: E402
 
 
@@ -24,6 +24,7 @@ version_string = "sysdiagnose-demo-analyser.py v2023-04-28 Version 0.1"
 analyser_description = "Generate GPS Exchange (GPX) of wifi geolocations"
 analyser_call = "generate_gpx"
 analyser_format = "json"
+analyser_input = ["sysdiagnose_wifi_known_networks"]
 
 
 def generate_gpx(jsonfile: str, outfile: str = "wifi-geolocations.gpx"):
@@ -34,8 +35,7 @@ def generate_gpx(jsonfile: str, outfile: str = "wifi-geolocations.gpx"):
     ```json
     """
     try:
-        with open(jsonfile, 'r') as fp:
-            json_data = json.load(fp)
+        json_data = parsed_data.load(jsonfile)
     except Exception as e:
         print(f"Error while parsing inputfile JSON. Reason: {str(e)}")
         sys.exit(-1)
@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+
+# For Python3
+# Benchmark the start time of the command line scripts
+#
+# Each command is run in a new interpreter, as a user would, once to warm
+# the file system caches and then --runs times. The median time is compared
+# to the one saved by a previous run with --compare, to catch slower starts
+# (e.g. a heavy module imported at the top of a script).
+
+"""sysdiagnose benchmark.
+
+Usage:
+  benchmark.py [--case=<case_number>] [--parser=<parser>] [--runs=<n>] [--save=<file>] [--compare=<file>] [--tolerance=<percent>]
+  benchmark.py (-h | --help)
+  benchmark.py --version
+
+Options:
+  -h --help     Show this screen.
+  -v --version     Show version.
+  --case=<case_number>  Also time parse and pipeline show on this case.
+  --parser=<parser>     Parser timed by parse [default: sysdiagnose-sys].
+  --runs=<n>       Number of timed runs of each command [default: 10].
+  --save=<file>    Save the results (JSON) to compare later runs with.
+  --compare=<file>  Compare with saved results, exit with 1 if a command is slower.
+  --tolerance=<percent>  Slowdown allowed by --compare [default: 20].
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+import config
+from utils import cases
+from utils import lazy
+
+# loaded on first use, see utils/lazy.py
+docopt = lazy.function('docopt', 'docopt')
+tabulate = lazy.function('tabulate', 'tabulate')
+
+version_string = "benchmark.py v2026-10-18 Version 1.0"
+
+# the commands are run from the repository, whatever the current folder
+repository = os.path.dirname(os.path.abspath(__file__))
+
+
+def commands(case_id=None, parser=None):
+    """
+        Return name -> command line of the commands to time
+    """
+    timed = {
+        "python": [sys.executable, '-c', 'pass'],
+        "parsing.py --version": [sys.executable, 'parsing.py', '--version'],
+        "parsing.py list parsers": [sys.executable, 'parsing.py', 'list', 'parsers'],
+        "parsing.py list cases": [sys.executable, 'parsing.py', 'list', 'cases'],
+        "analyse.py list analysers": [sys.executable, 'analyse.py', 'list', 'analysers'],
+        "initialyze.py --version": [sys.executable, 'initialyze.py', '--version'],
+    }
+    if case_id is not None:
+        timed[f"parsing.py parse {parser}"] = [sys.executable, 'parsing.py', 'parse', parser, case_id]
+        timed["pipeline.py show"] = [sys.executable, 'pipeline.py', 'show', case_id]
+    return timed
+
+
+def measure(command, runs):
+    """
+        Return the times in seconds of runs runs of command, after a first
+        untimed one. Raise subprocess.CalledProcessError if it fails: the
+        time of a failing command is not a start time.
+    """
+    times = []
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        process = subprocess.run(command, cwd=repository, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if i > 0:
+            times.append(time.perf_counter() - start)
+        process.check_returncode()
+    return times
+
+
+def benchmark(case_id=None, parser=None, runs=10):
+    """
+        Return name -> {"median", "min", "max"} (seconds) of the commands
+    """
+    results = {}
+    for name, command in commands(case_id, parser).items():
+        print(f'Timing: {name}', file=sys.stderr)
+        times = measure(command, runs)
+        results[name] = {"median": statistics.median(times), "min": min(times), "max": max(times)}
+    return results
+
+
+def compare(results, previous, tolerance):
+    """
+        Return the names of the commands whose median is more than tolerance
+        percent above the previous one
+    """
+    return [name for name, result in results.items()
+            if name in previous and result['median'] > previous[name]['median'] * (1 + tolerance / 100)]
+
+
+"""
+    Main function
+"""
+
+
+def main():
+
+    if sys.version_info[0] < 3:
+        print("Still using Python 2 ?!?", file=sys.stderr)
+        sys.exit(-1)
+
+    arguments = docopt(__doc__, version=version_string)
+
+    for option in ['--runs', '--tolerance']:
+        if not arguments[option].isdigit():
+            print(f"{option} should be ... a number ...", file=sys.stderr)
+            sys.exit(-1)
+    if arguments['--case'] is not None and not arguments['--case'].isdigit():
+        print("case number should be ... a number ...", file=sys.stderr)
+        sys.exit(-1)
+    if arguments['--case'] is not None:
+        # parsing.py parse exits with 0 on an unknown case
+        registry = os.path.join(repository, config.cases_db)
+        case = None
+        if os.path.exists(registry):
+            db = cases.connect(registry)
+            case = cases.get_case(db, arguments['--case'])
+            db.close()
+        if case is None:
+            print(f"Case {arguments['--case']} not found", file=sys.stderr)
+            sys.exit(-1)
+
+    previous = {}
+    if arguments['--compare']:
+        try:
+            with open(arguments['--compare'], 'r') as f:
+                previous = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Could not read {arguments["--compare"]}. Reason: {str(e)}', file=sys.stderr)
+            sys.exit(-1)
+
+    try:
+        results = benchmark(arguments['--case'], arguments['--parser'], int(arguments['--runs']))
+    except subprocess.CalledProcessError as e:
+        reason = e.stderr.decode('utf-8', errors='replace').strip().splitlines()[-1:] or ['no error output']
+        print(f"{' '.join(e.cmd[1:])} failed with exit code {e.returncode}, nothing saved. Reason: {reason[0]}",
+              file=sys.stderr)
+        sys.exit(1)
+
+    lines = []
+    for name, result in results.items():
+        line = [name, f"{result['median'] * 1000:.0f}", f"{result['min'] * 1000:.0f}", f"{result['max'] * 1000:.0f}"]
+        if previous:
+            line.append(f"{previous[name]['median'] * 1000:.0f}" if name in previous else '-')
+        lines.append(line)
+    headers = ['Command', 'Median (ms)', 'Min (ms)', 'Max (ms)']
+    if previous:
+        headers.append('Previous median (ms)')
+    print(tabulate(lines, headers=headers))
+
+    if arguments['--save']:
+        with open(arguments['--save'], 'w') as f:
+            json.dump(results, f, indent=4)
+
+    slower = compare(results, previous, int(arguments['--tolerance']))
+    if slower:
+        print(f"Slower than {arguments['--compare']} by more than {arguments['--tolerance']}%: {', '.join(slower)}",
+              file=sys.stderr)
+        sys.exit(1)
+    return 0
+
+
+"""
+   Call main function
+"""
+if __name__ == "__main__":
+
+    main()
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
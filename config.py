@@ -5,9 +5,28 @@ This file contains all of the configuration values for the project.
 """
 
 
-cases_file = "cases.json"
+cases_file = "cases.json"       # legacy case list, imported in cases_db
+cases_db = "cases.db"
 data_folder = "./data/"
 parsed_data_folder = "./parsed_data/"
 parsers_folder = "./parsers/"
 analysers_folder = "./analysers"
 debug = True
+ingest_chunk_size = 1024 * 1024     # bytes read at once when hashing and extracting an archive
+gzip_index_spacing = 4 * 1024 * 1024     # uncompressed bytes between two seek points of a gzip archive (indexed_gzip)
+store_folder = "./data/.store/"     # content-addressed store of extracted files
+dedup = False       # always store extracted files once across cases (initialyze.py --dedup)
+store_buffer_size = 16 * 1024 * 1024      # bytes of a file hashed in memory before being written to the store, if new
+digests = ['md5', 'sha1', 'sha256']     # digests of the source file kept in the case registry
+tree_digest = 'sha256'      # digest of each extracted file, kept in data/<case>.digests.json
+parser_timeout = 1800       # seconds before a parser run by parsing.py allparsers is stopped
+metadata_cache = "./.metadata_cache.json"      # definitions of parsers and analysers, keyed by file mtime
+serializer = 'auto'     # parsed data format: json, orjson, msgpack or auto (orjson if installed, json otherwise)
+compact_output = False      # write parsed data without indentation
+compression = None      # compress parsed data: 'gzip', 'zstd' (needs zstandard) or None
+columnar_output = None      # 'arrow' (Arrow IPC) or 'parquet' to write tabular parser outputs as columns (needs pyarrow)
+serve_port = 8421      # localhost port of serve.py
+serve_queue_size = 100      # jobs waiting in serve.py before new ones are refused
+worker_memory_limit = None      # MB of memory (address space) a parser or analyser run may use, None for no limit
+case_database = False      # load the parser outputs in parsed_data/<case>/case.db (SQLite) as parsers finish, or run parsing.py casedb
+case_database_timeout = 10      # seconds a write to case.db waits for another one, each holds the lock for one batch of rows
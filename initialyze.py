@@ -8,28 +8,47 @@
 """sysdiagnose initialize.
 
 Usage:
-  initialyze.py file <sysdiagnose_file> [--force]
+  initialyze.py file <sysdiagnose_file> [--force] [--selective] [--parsers=<parsers>] [--no-extract] [--dedup]
+  initialyze.py folder <sysdiagnose_folder> [--force] [--digests]
+  initialyze.py batch <path> [--workers=<n>] [--force] [--selective] [--parsers=<parsers>] [--dedup]
+  initialyze.py probe <sysdiagnose_file>
+  initialyze.py verify <case_number>
   initialyze.py (-h | --help)
   initialyze.py --version
 
 Options:
   -h --help     Show this screen.
   -v --version     Show version.
+  --workers=<n>    Number of archives processed concurrently (default: number of CPUs).
+  --selective      Only extract the artifacts listed in the manifest.
+  --parsers=<parsers>  Only extract the inputs of these parsers (comma separated),
+                   other artifacts are extracted when a parser needs them.
+  --no-extract     Do not extract anything, parsers read the artifacts from the archive.
+  --dedup          Store extracted files once across cases and hard link them in the case folder.
+  --digests        Compute the digest of every file of the folder, for verify (reads the whole folder).
 """
 
 import config
 
 import sys
 import os
-import tarfile
 import json
-import hashlib
 import glob
-from docopt import docopt
+import time
+import shutil
+import tempfile
+import concurrent.futures
 
 from misc import get_version
+from utils import archive
+from utils import artifacts
+from utils import cases
+from utils import lazy
+from utils import plugins
 
-version = get_version()
+# loaded on first use, see utils/lazy.py
+docopt = lazy.function('docopt', 'docopt')
+tabulate = lazy.function('tabulate', 'tabulate')
 
 
 """
@@ -37,257 +56,478 @@ version = get_version()
 """
 
 
-def init(sysdiagnose_file, force=False):
-    # open case json file
+def get_selection(parsers):
+    """
+        Return the artifacts consumed by parsers, sysdiagnose.log being always
+        needed to get the iOS version
+    """
+    names = {'sysdiagnose.log'}
+    for parser in parsers:
+        names.add(plugins.read_metadata(config.parsers_folder + parser + '.py')['parser_input'])
+    return names
+
+
+def no_member(path):
+    return False
+
+
+def is_sysdiagnose_log(path):
+    return path.partition('/')[2] == 'sysdiagnose.log'
+
+
+def stage(sysdiagnose_file, selective=False, names=None, extract=True, dedup=False):
+    """
+        Hash and extract the sysdiagnose file in a single streaming read.
+        As the hash is only known once the archive has been read, files are
+        extracted in a staging folder that is renamed once the case is created.
+        With extract=False nothing is written: parsers read the artifacts from
+        the archive through its member index. With dedup=True files are stored
+        once in the content-addressed store shared by all cases and hard linked
+        in the case folder.
+
+        Nothing is shared with the caller but the returned dict, so this can
+        run in a worker process.
+    """
+    start = time.monotonic()
+    extraction = 'full'
+    select = None
+    capture = None
+    if not extract:
+        extraction = 'none'
+        select = no_member
+        capture = is_sysdiagnose_log
+    elif selective or names is not None:
+        extraction = 'selective'
+        select = artifacts.selector(names)
+
+    staging_folder = create_staging_folder()
+    # seek points of a gzip archive whose members are read from it later
+    gzip_index = None if extraction == 'full' else staging_folder + '.gzidx'
     try:
-        with open(config.cases_file, 'r') as f:
-            cases = json.load(f)
-    except Exception as e:
-        print(f'error opening cases json file - check config.py. Failure reason: f{str(e)}')
-        sys.exit()
+        store = config.store_folder if dedup else None
+        extracted = archive.extract(sysdiagnose_file, staging_folder, select, capture, store, gzip_index=gzip_index,
+                                    file_digest=config.tree_digest)
+    except Exception:
+        discard(staging_folder)
+        raise
+
+    # match the artifact manifest against the list of extracted members
+    # instead of walking the case folder
+    found = artifacts.ArtifactIndex.from_members(extracted['members']).match()
+    if 'sysdiagnose.log' not in found:
+        discard(staging_folder)
+        raise ValueError('sysdiagnose.log not found in the sysdiagnose file')
 
-    # calculate sha256 of sysdiagnose file and compare with past cases
+    # Get iOS version
+    ios_version = None
     try:
-        with open(sysdiagnose_file, 'rb') as f:
-            bytes = f.read()  # read entire file as bytes
-            readable_hash = hashlib.sha256(bytes).hexdigest()
-            print(readable_hash)
+        if found['sysdiagnose.log'] in extracted['captured']:
+            lines = extracted['captured'][found['sysdiagnose.log']].decode('utf-8', errors='replace').splitlines()
+        else:
+            with open(os.path.join(staging_folder, found['sysdiagnose.log']), 'r') as f:
+                lines = f.readlines()
+        line_version=[line for line in lines if 'iPhone OS' in line][0]
+        ios_version=line_version.split()[4]
     except Exception as e:
-        print(f'error calculating sha256. Reason: {str(e)}')
-    case_id = 0
-    for case in cases['cases']:
-        # Take the opportunity to find the highest case_id
-        case_id = max(case_id, case['case_id'])
-        if readable_hash == case['source_sha256']:
-            if force:
-                case_id = case['case_id'] -1
-            else:
-                print(f"this sysdiagnose has already been extracted : caseID: {str(case['case_id'])}")
-                sys.exit()
+        discard(staging_folder)
+        raise ValueError(f"Could not read iOS version from sysdiagnose.log. Reason: {str(e)}")
 
-    # test sysdiagnose file
-    try:
-        tf = tarfile.open(sysdiagnose_file)
-    except Exception as e:
-        print(f'error opening sysdiagnose file. Reason: {str(e)}')
-        sys.exit()
+    members = None
+    if extraction != 'full':
+        members = archive.member_index(extracted['members'])
 
-    # if sysdiagnose file is new and legit, create new case and extract files
-    # create case dictionnary
-    new_case = {
-        "case_id": case_id +1,
+    return {
         "source_file": sysdiagnose_file,
-        "source_sha256": readable_hash,
-        "case_file": config.data_folder +str(case_id +1) +".json"
+        "staging_folder": staging_folder,
+        "sha256": extracted['sha256'],
+        "tree_hash": None,
+        "digests": extracted['digests'],
+        # digest of every extracted file, to verify the case without the archive
+        "tree_digests": extracted['file_digests'],
+        "bytes_read": extracted['bytes_read'],
+        "deduplicated": extracted['deduplicated'],
+        "artifacts": found,
+        "members": members,
+        "gzip_index": gzip_index if gzip_index is not None and os.path.exists(gzip_index) else None,
+        "ios_version": ios_version,
+        "extraction": extraction,
+        "names": names,
+        "elapsed": time.monotonic() - start
     }
-    # create case folder
-    new_folder = config.data_folder +str(new_case['case_id'])
-    if not os.path.exists(new_folder):
-        os.makedirs(new_folder)
 
-    # create parsed_data folder
-    new_parsed_folder = config.parsed_data_folder +str(new_case['case_id'])
-    if not os.path.exists(new_parsed_folder):
-        os.makedirs(new_parsed_folder)
 
-    # extract sysdiagnose files
-    if config.debug:
-        print(f"cd'ing to {new_folder}")
-    os.chdir(new_folder)
+def create_staging_folder():
+    """
+        Create a staging folder in the data folder. It becomes the case
+        folder, so it gets the permissions of a folder created by os.makedirs
+        instead of those of mkdtemp, only for the user.
+    """
+    staging_folder = tempfile.mkdtemp(prefix='.ingest-', dir=config.data_folder)
+    umask = os.umask(0o022)
+    os.umask(umask)
+    os.chmod(staging_folder, 0o777 & ~umask)
+    return staging_folder
+
+
+def discard(staging_folder):
+    """
+        Remove a staging folder, and the gzip seek points saved next to it
+    """
+    shutil.rmtree(staging_folder, ignore_errors=True)
+    if os.path.exists(staging_folder + '.gzidx'):
+        os.remove(staging_folder + '.gzidx')
+
+
+def find_sysdiagnose_folder(folder):
+    """
+        Return the sysdiagnose folder (the one containing sysdiagnose.log):
+        folder itself or its only subfolder
+    """
+    if os.path.isfile(os.path.join(folder, 'sysdiagnose.log')):
+        return folder
+    subfolders = [entry.path for entry in os.scandir(folder)
+                  if entry.is_dir() and os.path.isfile(os.path.join(entry.path, 'sysdiagnose.log'))]
+    if len(subfolders) != 1:
+        raise ValueError(f'no sysdiagnose folder found in {folder}')
+    return subfolders[0]
+
+
+def stage_folder(folder, digests=False):
+    """
+        Stage an already extracted sysdiagnose folder without copying it.
+        The staging folder only holds a symbolic link to the sysdiagnose folder,
+        which is identified by its tree hash (paths, sizes and mtimes) instead
+        of the sha256 of an archive, computed in seconds. The digest of every
+        file, for verify, is only computed if digests is True: it reads the
+        whole folder.
+    """
+    start = time.monotonic()
+    sysdiagnose_folder = os.path.abspath(find_sysdiagnose_folder(folder))
+    name = os.path.basename(sysdiagnose_folder)
+
+    found = artifacts.ArtifactIndex.from_folder(sysdiagnose_folder, name + '/').match()
+
+    # Get iOS version
     try:
-        tf.extractall()
+        with open(os.path.join(sysdiagnose_folder, 'sysdiagnose.log'), 'r', errors='replace') as f:
+            line_version = next(line for line in f if 'iPhone OS' in line)
+        ios_version = line_version.split()[4]
     except Exception as e:
-        print(f'Error while decompressing sysdiagnose file. Reason: {str(e)}')
-
-    # create case json file
-    new_case_json = {
-        "sysdiagnose.log": new_folder +glob.glob('./*/sysdiagnose.log')[0][1:]
+        raise ValueError(f"Could not read iOS version from sysdiagnose.log. Reason: {str(e)}")
+
+    tree_hash = archive.tree_hash(sysdiagnose_folder)
+    tree_digests = None
+    if digests:
+        tree_digests = {name + '/' + path: digest
+                        for path, digest in archive.digest_tree(sysdiagnose_folder, config.tree_digest).items()}
+
+    staging_folder = create_staging_folder()
+    os.symlink(sysdiagnose_folder, os.path.join(staging_folder, name), target_is_directory=True)
+
+    return {
+        "source_file": sysdiagnose_folder,
+        "staging_folder": staging_folder,
+        "sha256": None,
+        "tree_hash": tree_hash,
+        "digests": None,
+        "tree_digests": tree_digests,
+        "bytes_read": 0,
+        "deduplicated": 0,
+        "artifacts": found,
+        "members": None,
+        "gzip_index": None,
+        "ios_version": ios_version,
+        "extraction": 'folder',
+        "names": None,
+        "elapsed": time.monotonic() - start
     }
 
-    try:
-        new_case_json["ps"] = new_folder +glob.glob('./*/ps.txt')[0][1:]
-    except:        # noqa: E722
-        pass
 
+def register(staged, force=False):
+    """
+        Create the case of a staged sysdiagnose file and return its case ID.
+        Raise ValueError if the file has already been extracted.
+        The staging folder is removed if the case is not created, whatever
+        the reason.
+    """
+    registered = False
     try:
-        new_case_json["swcutil_show"] = new_folder +glob.glob('./*/swcutil_show.txt')[0][1:]
-    except:        # noqa: E722
-        pass
+        db = cases.connect()
+        try:
+            # the registry stays locked until the case is created, so concurrent
+            # ingests can neither get the same case ID nor register the same file twice
+            db.execute("BEGIN IMMEDIATE")
+            if staged['sha256'] is not None:
+                case = cases.find_by_sha256(db, staged['sha256'])
+            else:
+                case = cases.find_by_tree_hash(db, staged['tree_hash'])
+            if case is not None and not force:
+                raise ValueError(f"this sysdiagnose has already been extracted : caseID: {str(case['case_id'])}")
+            case_id = cases.add_case(db, staged['source_file'], staged['sha256'], case['case_id'] if case else None,
+                                     staged['digests'], staged['tree_hash'])
+            create_case(case_id, staged)
+            db.execute("COMMIT")
+            registered = True
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+    finally:
+        if not registered:
+            discard(staged['staging_folder'])
+
+    return case_id
+
+
+def create_case(case_id, staged):
+    """
+        Move the staged files to the case folder and write the case json file
+    """
+    # move extracted files to the case folder
+    new_folder = config.data_folder +str(case_id)
+    if os.path.exists(new_folder):
+        shutil.rmtree(new_folder)
+    # files of the case replaced (--force): a member index or gzip index left
+    # behind would give offsets in the previous archive
+    for suffix in ['.members.json', '.gzidx', '.digests.json']:
+        if os.path.exists(new_folder + suffix):
+            os.remove(new_folder + suffix)
+    os.rename(staged['staging_folder'], new_folder)
 
-    try:
-        new_case_json["ps_thread"] = new_folder +glob.glob('./*/ps_thread.txt')[0][1:]
-    except:        # noqa: E722
-        pass
+    # create parsed_data folder
+    new_parsed_folder = config.parsed_data_folder +str(case_id)
+    if not os.path.exists(new_parsed_folder):
+        os.makedirs(new_parsed_folder)
 
-    try:
-        new_case_json["appupdate_db"] = new_folder +glob.glob('./*/logs/appinstallation/AppUpdates.sqlitedb')[0][1:]
-    except:        # noqa: E722
-        pass
+    # create case json file
+    new_case_json = {}
+    for name, path in staged['artifacts'].items():
+        if isinstance(path, list):
+            new_case_json[name] = [new_folder + '/' + p for p in path]
+        else:
+            new_case_json[name] = new_folder + '/' + path
+
+    # artifacts left in the archive are read by parsing.py through the
+    # member index, and extracted on first use for selective cases
+    if staged['extraction'] == 'folder':
+        new_case_json['extraction'] = staged['extraction']
+        new_case_json['source_folder'] = staged['source_file']
+    elif staged['extraction'] != 'full':
+        pending = []
+        if staged['extraction'] == 'none':
+            pending = list(new_case_json)
+        elif staged['names'] is not None:
+            pending = [name for name in new_case_json if name not in staged['names']]
+        new_case_json['extraction'] = staged['extraction']
+        new_case_json['source_file'] = os.path.abspath(staged['source_file'])
+        new_case_json['pending'] = pending
+        with open(config.data_folder + str(case_id) + ".members.json", 'w') as data_file:
+            data_file.write(json.dumps(staged['members']))
+        if staged['gzip_index'] is not None:
+            os.replace(staged['gzip_index'], config.data_folder + str(case_id) + ".gzidx")
+
+    new_case_json['ios_version'] = staged['ios_version']
 
-    try:
-        new_case_json["brctl"] = new_folder +glob.glob('./*/brctl/')[0][1:]
-    except:        # noqa: E722
-        pass
+    # Save JSON file
+    with open(config.data_folder + str(case_id) + ".json", 'w') as data_file:
+        data_file.write(json.dumps(new_case_json, indent=4))
 
-    try:
-        new_case_json["networkextensioncache"] = new_folder + \
-            glob.glob('./*/logs/Networking/com.apple.networkextension.cache.plist')[0][1:]
-    except:        # noqa: E722
-        pass
+    # Save digests of the extracted files
+    if staged['tree_digests'] is not None:
+        with open(config.data_folder + str(case_id) + ".digests.json", 'w') as data_file:
+            data_file.write(json.dumps({"algorithm": config.tree_digest, "files": staged['tree_digests']}, indent=4))
 
-    try:
-        new_case_json["networkextension"] = new_folder +glob.glob('./*/logs/Networking/com.apple.networkextension.plist')[0][1:]
-    except:        # noqa: E722
-        pass
 
-    try:
-        new_case_json["powerlogs"] = new_folder +glob.glob('./*/logs/powerlogs/powerlog_*')[0][1:]
-    except:        # noqa: E722
-        pass
+def init(sysdiagnose_file, force=False, selective=False, parsers=None, extract=True, dedup=False):
+    names = None
+    if parsers:
+        try:
+            names = get_selection(parsers)
+        except Exception as e:
+            print(f'error reading parsers {parsers}. Reason: {str(e)}')
+            sys.exit()
 
     try:
-        new_case_json["systemversion"] = new_folder +glob.glob('./*/logs/SystemVersion/SystemVersion.plist')[0][1:]
-    except:        # noqa: E722
-        pass
+        staged = stage(sysdiagnose_file, selective, names, extract, dedup)
+    except Exception as e:
+        print(f'Error while decompressing sysdiagnose file. Reason: {str(e)}')
+        sys.exit()
+    print(staged['sha256'])
+    for algorithm, digest in staged['digests'].items():
+        if algorithm != 'sha256':
+            print(f'{algorithm}: {digest}')
+    print(f"Read {staged['bytes_read'] / (1024 * 1024):.1f} MB in {staged['elapsed']:.1f}s "
+          f"({archive.throughput(staged['bytes_read'], staged['elapsed']):.1f} MB/s)")
+    if dedup:
+        print(f"{staged['deduplicated'] / (1024 * 1024):.1f} MB already in the store, not written again")
 
     try:
-        new_case_json["UUIDToBinaryLocations"] = new_folder +glob.glob('./*/logs/tailspindb/UUIDToBinaryLocations')[0][1:]
-    except:        # noqa: E722
-        pass
+        case_id = register(staged, force)
+    except Exception as e:
+        print(str(e))
+        sys.exit()
 
-    try:
-        new_case_json["logarchive_folder"] = new_folder +glob.glob('./*/system_logs.logarchive/')[0][1:]
-    except:        # noqa: E722
-        pass
+    print("Sysdiagnose file has been processed")
+    print(f"New case ID: {str(case_id)}")
 
-    try:
-        new_case_json["shutdownlog"] = new_folder +glob.glob('./*/system_logs.logarchive/Extra/shutdown.log')[0][1:]
-    except:        # noqa: E722
-        pass
 
+def init_folder(folder, force=False, digests=False):
+    """
+        Register an already extracted sysdiagnose folder as a case, in place
+    """
     try:
-        new_case_json["taskinfo"] = new_folder +glob.glob('./*/taskinfo.txt')[0][1:]
-    except:        # noqa: E722
-        pass
+        staged = stage_folder(folder, digests)
+    except Exception as e:
+        print(f'Error while reading sysdiagnose folder. Reason: {str(e)}')
+        sys.exit()
+    print(f"Tree hash: {staged['tree_hash']}")
+    print(f"Indexed {staged['source_file']} in {staged['elapsed']:.1f}s")
 
     try:
-        new_case_json["spindump-nosymbols"] = new_folder +glob.glob('./*/spindump-nosymbols.txt')[0][1:]
-    except:        # noqa: E722
-        pass
+        case_id = register(staged, force)
+    except Exception as e:
+        print(str(e))
+        sys.exit()
 
-    try:
-        new_case_json["Accessibility-TCC"] = new_folder +glob.glob('./*/logs/Accessibility/TCC.db')[0][1:]
-    except:        # noqa: E722
-        pass
+    print("Sysdiagnose folder has been registered")
+    print(f"New case ID: {str(case_id)}")
 
-    try:
-        new_case_json["appinstallation"] = new_folder +glob.glob('./*/logs/appinstallation/appstored.sqlitedb')[0][1:]
-    except:        # noqa: E722
-        pass
 
-    try:
-        new_case_json["itunesstore"] = new_folder +glob.glob('./*/./logs/itunesstored/downloads.*.sqlitedb')[0][1:]
-    except:        # noqa: E722
-        pass
+"""
+    Batch function
+"""
 
-    try:
-        new_case_json["wifisecurity"] = new_folder +glob.glob('./*/WiFi/security.txt')[0][1:]
-    except:        # noqa: E722
-        pass
 
-    # wifi data listing
-    try:
-        # plists
-        wifi_plist = glob.glob('./*/WiFi/*.plist')
-        wifi_data_fullpath = []
-        for data in wifi_plist:
-            data = new_folder +data[1:]
-            wifi_data_fullpath.append(data)
-        # scans
-        wifi_scans = glob.glob('./*/WiFi/wifi_scan*.txt')
-        for scans in wifi_scans:
-            scans = new_folder +scans[1:]
-            wifi_data_fullpath.append(scans)
-        # recent networks
-        wifi_recent = glob.glob('./*/WiFi/com.apple.wifi.recent-networks.json')
-        for recent in wifi_recent:
-            recent = new_folder +recent[1:]
-            wifi_data_fullpath.append(recent)
-        new_case_json["wifi_data"] = wifi_data_fullpath
-    except:        # noqa: E722
-        pass
-
-    # ips files
-    try:
-        ips_files = glob.glob('./*/crashes_and_spins/*.ips')
-        ips_files_fullpath = []
-        for ips in ips_files:
-            ips = new_folder +ips[1:]
-            ips_files_fullpath.append(ips)
-        new_case_json["ips_files"] = ips_files_fullpath
-    except:        # noqa: E722
-        pass
-
-    # mobile activation logs
-    try:
-        mobile_activation = glob.glob('./*/logs/MobileActivation/mobileactivationd.log*')
-        mobile_activation_fullpath = []
-        for log in mobile_activation:
-            log = new_folder +log[1:]
-            mobile_activation_fullpath.append(log)
-        new_case_json["mobile_activation"] = mobile_activation_fullpath
-    except:        # noqa: E722
-        pass
-
-    # container manager
-    try:
-        container_manager = glob.glob('./*/logs/MobileContainerManager/containermanagerd.log*')
-        container_manager_fullpath = []
-        for log in container_manager:
-            log = new_folder +log[1:]
-            container_manager_fullpath.append(log)
-        new_case_json["container_manager"] = container_manager_fullpath
-    except:        # noqa: E722
-        pass
-
-    # mobile installation
-    try:
-        mobile_installation = glob.glob('./*/logs/MobileInstallation/mobile_installation.log*')
-        mobile_installation_fullpath = []
-        for log in mobile_installation:
-            log = new_folder +log[1:]
-            mobile_installation_fullpath.append(log)
-        new_case_json["mobile_installation"] = mobile_installation_fullpath
-    except:        # noqa: E722
-        pass
+def batch(path, workers=None, force=False, selective=False, parsers=None, dedup=False):
+    """
+        Ingest many sysdiagnose files concurrently.
+        Hashing, decompression and extraction run in worker processes, cases
+        are then created one at a time by this process.
+    """
+    if os.path.isdir(path):
+        files = []
+        for pattern in ['*.tar.gz', '*.tgz', '*.tar']:
+            files += glob.glob(os.path.join(path, pattern))
+        files.sort()
+    else:
+        files = sorted(glob.glob(path))
+    if not files:
+        print("no sysdiagnose file found")
+        sys.exit()
 
-    # print(json.dumps(new_case_json, indent=4))
+    names = None
+    if parsers:
+        try:
+            names = get_selection(parsers)
+        except Exception as e:
+            print(f'error reading parsers {parsers}. Reason: {str(e)}')
+            sys.exit()
 
-    # Get iOS version
-    if config.debug:
-        print(f"cd'ing to ../..")
-    os.chdir('../..')
+    lines = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(stage, sysdiagnose_file, selective, names, True, dedup): sysdiagnose_file for sysdiagnose_file in files}
+        for future in concurrent.futures.as_completed(futures):
+            sysdiagnose_file = futures[future]
+            try:
+                staged = future.result()
+                case_id = register(staged, force)
+                lines.append([sysdiagnose_file, 'ok', case_id, f"{staged['elapsed']:.1f}",
+                              f"{archive.throughput(staged['bytes_read'], staged['elapsed']):.1f}"])
+            except Exception as e:
+                lines.append([sysdiagnose_file, f'error: {str(e)}', '-', '-', '-'])
+            print(f"Processed: {sysdiagnose_file}", file=sys.stderr)
+
+    headers = ['Sysdiagnose file', 'Status', 'Case ID', 'Elapsed (s)', 'MB/s']
+    print(tabulate(sorted(lines), headers=headers))
+
+
+"""
+    Verify function
+"""
+
+
+def verify(case_id):
+    """
+        Check the extracted files of a case against their digests computed at ingest.
+        A folder case registered without digests is checked against its tree hash.
+    """
+    case_folder = config.data_folder + str(case_id)
+    if not os.path.exists(case_folder + ".digests.json"):
+        db = cases.connect()
+        case = cases.get_case(db, case_id)
+        db.close()
+        if case is not None and case['tree_hash']:
+            verify_tree(case)
+            return
     try:
-        with open(new_case_json['sysdiagnose.log'], 'r') as f:
-            line_version=[line for line in f if 'iPhone OS' in line][0]
-            version=line_version.split()[4]
-        new_case_json['ios_version']=version
+        with open(case_folder + ".digests.json", 'r') as f:
+            manifest = json.load(f)
     except Exception as e:
-        print(f"Could not open file {new_case_json['sysdiagnose.log']}. Reason: {str(e)}")
+        print(f'error opening digests of case {case_id}. Reason: {str(e)}')
         sys.exit()
 
-    # Save JSON file
-    with open(new_case['case_file'], 'w') as data_file:
-        data_file.write(json.dumps(new_case_json, indent=4))
+    files = manifest['files']
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = {executor.submit(archive.digest_file, os.path.join(case_folder, path), manifest['algorithm']): path
+                   for path in files}
+        lines = []
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                if future.result() != files[path]:
+                    lines.append([path, 'modified'])
+            except FileNotFoundError:
+                lines.append([path, 'missing'])
+            except OSError as e:
+                # replaced by a folder, no permission...
+                lines.append([path, f'unreadable: {e.strerror or type(e).__name__}'])
+
+    if lines:
+        print(tabulate(sorted(lines), headers=['File', 'Status']))
+    print(f"{len(files) - len(lines)}/{len(files)} files verified")
+
+
+def verify_tree(case):
+    """
+        Check the paths, sizes and modification times of the files of a folder
+        case against its tree hash
+    """
+    if archive.tree_hash(case['source_file']) != case['tree_hash']:
+        print(f"{case['source_file']} changed since it was registered: files added, removed or modified")
+    else:
+        print(f"{case['source_file']} unchanged since it was registered (paths, sizes and modification times)")
+    print("Register the folder with --digests to verify the content of its files")
 
-    # update cases list file
-    cases['cases'].append(new_case)
 
-    with open(config.cases_file, 'w') as data_file:
-        data_file.write(json.dumps(cases, indent=4))
+"""
+    Probe function
+"""
 
-    print("Sysdiagnose file has been processed")
-    print(f"New case ID: {str(new_case['case_id'])}")
+
+def probe(sysdiagnose_file):
+    """
+        List the artifacts present in a sysdiagnose file without extracting it
+    """
+    try:
+        inventory = archive.probe(sysdiagnose_file)
+    except Exception as e:
+        print(f'error opening sysdiagnose file. Reason: {str(e)}')
+        sys.exit()
+
+    lines = []
+    for name in dict.fromkeys(artifact[0] for artifact in artifacts.artifacts):
+        found = inventory['artifacts'].get(name, [])
+        if found:
+            lines.append([name, len(found), sum(size for path, size in found), found[0][0].partition('/')[2]])
+        else:
+            lines.append([name, 0, 0, '-'])
+
+    print(f"iOS version: {inventory['ios_version']}")
+    print(f"Members: {inventory['members']} ({inventory['size']} bytes)")
+    headers = ['Artifact', 'Files', 'Size', 'Path']
+    print(tabulate(lines, headers=headers))
 
 
 """
@@ -300,10 +540,8 @@ def integrity_check():
         os.makedirs(config.data_folder)
     if not os.path.exists(config.parsed_data_folder):
         os.makedirs(config.parsed_data_folder)
-    if not os.path.exists(config.cases_file):
-        cases = {'cases': []}
-        with open(config.cases_file, 'w') as data_file:
-            data_file.write(json.dumps(cases, indent=4))
+    # create the case registry
+    cases.connect().close()
 
 
 """
@@ -317,13 +555,42 @@ def main():
         print("Still using Python 2 ?!?")
         sys.exit(-1)
 
-    arguments = docopt(__doc__, version=f'Sysdiagnose initialize script {version}')
+    arguments = docopt(__doc__, version=f'Sysdiagnose initialize script {get_version()}')
 
     integrity_check()
 
     if arguments['file']:
         if os.path.realpath(arguments['<sysdiagnose_file>']):
-            init(arguments['<sysdiagnose_file>'], arguments['--force'])
+            parsers = arguments['--parsers'].split(',') if arguments['--parsers'] else None
+            init(arguments['<sysdiagnose_file>'], arguments['--force'], arguments['--selective'], parsers,
+                 not arguments['--no-extract'], arguments['--dedup'] or config.dedup)
+        else:
+            print("file not found")
+            sys.exit()
+    elif arguments['folder']:
+        if os.path.isdir(arguments['<sysdiagnose_folder>']):
+            init_folder(arguments['<sysdiagnose_folder>'], arguments['--force'], arguments['--digests'])
+        else:
+            print("folder not found")
+            sys.exit()
+    elif arguments['batch']:
+        parsers = arguments['--parsers'].split(',') if arguments['--parsers'] else None
+        workers = None
+        if arguments['--workers'] is not None:
+            if not arguments['--workers'].isdigit() or int(arguments['--workers']) == 0:
+                print("workers should be ... a number ... greater than 0", file=sys.stderr)
+                sys.exit(-1)
+            workers = int(arguments['--workers'])
+        batch(arguments['<path>'], workers, arguments['--force'], arguments['--selective'], parsers,
+              arguments['--dedup'] or config.dedup)
+    elif arguments['verify']:
+        if arguments['<case_number>'].isdigit():
+            verify(arguments['<case_number>'])
+        else:
+            print("case number should be ... a number ...")
+    elif arguments['probe']:
+        if os.path.isfile(arguments['<sysdiagnose_file>']):
+            probe(arguments['<sysdiagnose_file>'])
         else:
             print("file not found")
             sys.exit()
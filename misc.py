@@ -4,14 +4,17 @@ import os
 import sys
 import json
 import plistlib
-import biplist
-from biplist import Uid, Data
 from datetime import datetime
 import binascii
 
+from utils import lazy
+
+# loaded on first use, see utils/lazy.py
+biplist = lazy.module('biplist')
+
 class CustomEncoder(json.JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, Uid) or isinstance(obj, Data) or isinstance(obj, datetime):
+        if isinstance(obj, biplist.Uid) or isinstance(obj, biplist.Data) or isinstance(obj, datetime):
             return str(obj)
         return super().default(obj)
 
@@ -19,7 +22,6 @@ def get_version(filename="VERSION.txt"):
     """Read the program version from VERSION.txt"""
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
-        print(script_dir)
         version_file = os.path.join(script_dir, filename)
         with open(version_file, "r") as file:
             data = json.load(file)
@@ -34,7 +36,18 @@ def load_plist_and_fix(plist):
         plist = biplist.readPlist(f)
         # plist = find_datetime(plist)
         # plist = find_bytes(plist)
-    return json.loads(json.dumps(plist, indent=4, cls=CustomEncoder))
+    return fix_plist(plist)
+
+def fix_plist(obj):
+    """Return obj as a JSON round trip with CustomEncoder would, in a single pass:
+    keys and Uid, Data and datetime values converted to strings, tuples to lists."""
+    if isinstance(obj, dict):
+        return {key if isinstance(key, str) else json.dumps(key): fix_plist(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [fix_plist(item) for item in obj]
+    if isinstance(obj, biplist.Uid) or isinstance(obj, biplist.Data) or isinstance(obj, datetime):
+        return str(obj)
+    return obj
 
 def find_datetime(d):
     for k, v in d.items():
@@ -15,6 +15,7 @@ version_string = "sysdiagnose-Accessibility-TCC.py v2020-20-20 Version 1.0"
 parser_description = "Parsing Accessibility TCC logs"
 parser_input = "Accessibility-TCC"
 parser_call = "get_accessibility_tcc"
+parser_schema = {"layout": "tables"}
 
 # --------------------------------------------#
 
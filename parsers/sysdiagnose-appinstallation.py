@@ -15,7 +15,6 @@ from optparse import OptionParser
 import time
 import struct
 import datetime
-import sqlite3
 
 version_string = "sysdiagnose-appinstallation.py v2019-11-22 Version 2.0"
 
@@ -24,6 +23,7 @@ version_string = "sysdiagnose-appinstallation.py v2019-11-22 Version 2.0"
 parser_description = "Parsing app installation logs"
 parser_input = "appinstallation"
 parser_call = "get_appinstallation"
+parser_schema = {"layout": "tables"}
 
 # --------------------------------------------#
 
@@ -38,21 +38,23 @@ def get_appinstallation(dbpath, ios_version=13):
 
 
 def print_appinstall_ios12(dbpath):
+    from utils import sqlite2json
+
     try:
-        appinstalldb = sqlite3.connect(dbpath)
-        cursor = appinstalldb.cursor()
-        for row in cursor.execute("SELECT pid, bundle_id, install_date FROM app_updates"):
-            [pid, bundle_id, install_date] = row
+        with sqlite2json.open_database(dbpath) as appinstalldb:
+            cursor = appinstalldb.cursor()
+            for row in cursor.execute("SELECT pid, bundle_id, install_date FROM app_updates"):
+                [pid, bundle_id, install_date] = row
 
-            # convert install_date from Cocoa EPOCH -> UTC
-            epoch = install_date + 978307200  # difference between COCOA and UNIX epoch is 978307200 seconds
-            utctime = datetime.datetime.utcfromtimestamp(epoch)
+                # convert install_date from Cocoa EPOCH -> UTC
+                epoch = install_date + 978307200  # difference between COCOA and UNIX epoch is 978307200 seconds
+                utctime = datetime.datetime.utcfromtimestamp(epoch)
 
-            # convert PID
-            # pid =  struct.pack('>I', pid)
+                # convert PID
+                # pid =  struct.pack('>I', pid)
 
-            # print result
-            print(f"{pid},{bundle_id},{utctime}")
+                # print result
+                print(f"{pid},{bundle_id},{utctime}")
     except Exception as e:
         print(f"AN UNHANDLED ERROR OCCURED AND THE DB WAS NOT PARSED. Reason: {str(e)}")
 
@@ -62,7 +64,7 @@ def get_appinstallation_ios13(dbpath):
     from utils import sqlite2json
 
     appinstallation = sqlite2json.sqlite2struct(dbpath)
-    return json.loads(sqlite2json.dump2json(appinstallation))
+    return appinstallation
 
 
 # --------------------------------------------------------------------------- #
@@ -17,6 +17,7 @@ version_string = "sysdiagnose-itunesstore.py v2020-20-19 Version 1.0"
 parser_description = "Parsing iTunes store logs"
 parser_input = "itunesstore"
 parser_call = "get_itunesstore"
+parser_schema = {"layout": "tables"}
 
 # --------------------------------------------#
 
@@ -29,7 +30,7 @@ def get_itunesstore(dbpath, ios_version=13):
     from utils import sqlite2json
 
     itunes = sqlite2json.sqlite2struct(dbpath)
-    return json.loads(sqlite2json.dump2json(itunes))
+    return itunes
 
 
 def print_itunesstore(inputfile):
@@ -21,6 +21,13 @@ version_string = "sysdiagnose-logarchive.py v2020-02-07 Version 1.0"
 parser_description = "Parsing system_logs.logarchive folder"
 parser_input = "logarchive_folder"
 parser_call = "get_logs"
+parser_schema = {"layout": "records", "key": "data",      # records of log show --style ndjson
+                 "columns": {"timestamp": "string", "eventType": "string", "messageType": "string",
+                             "subsystem": "string", "category": "string", "eventMessage": "string",
+                             "formatString": "string", "processID": "int64", "threadID": "int64",
+                             "processImagePath": "string", "processImageUUID": "string",
+                             "senderImagePath": "string", "senderImageUUID": "string",
+                             "bootUUID": "string", "timezoneName": "string"}}
 
 # --------------------------------------------#
 
@@ -75,6 +82,10 @@ def __cleanup(outpath):
 
 def get_logs_on_osx(filename, output):
     cmd_line = cmd_parsing_osx % (filename)
+    # without output file, stream the entries to parsing.py that writes them
+    # as they come instead of keeping millions of them in memory
+    if output is None:
+        return __execute_cmd_and_yield_result(cmd_line)
     return __execute_cmd_and_get_result(cmd_line, filename, output)
 
 
@@ -140,6 +151,23 @@ def __execute_cmd_and_get_result(command, filename, outfile=sys.stdout):
     return result
 
 
+def __execute_cmd_and_yield_result(command):
+    """
+        Yield the entries of the ndjson output of command, one at a time
+    """
+    import subprocess
+    process = subprocess.Popen(command.split(), stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        for output in process.stdout:
+            try:
+                yield json.loads(output)
+            except Exception as e:
+                print(f"Something was not properly parsed : {str(e)}")
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
 # --------------------------------------------------------------------------- #
 """
     Main function
@@ -16,6 +16,7 @@ version_string = "sysdiagnose-powerlogs.py v2020-20-19 Version 1.0"
 parser_description = "Parsing  powerlogs database"
 parser_input = "powerlogs"
 parser_call = "get_powerlogs"
+parser_schema = {"layout": "tables"}
 
 # --------------------------------------------#
 
@@ -22,6 +22,7 @@ version_string = "sysdiagnose-ps.py v2023-03-10 Version 1.1"
 parser_description = "Parsing ps.txt file"
 parser_input = "ps"
 parser_call = "parse_ps"
+parser_schema = {"layout": "keyed", "columns": {"PID": "int64", "PPID": "int64", "USER": "string", "COMMAND": "string"}}
 
 # --------------------------------------------#
 
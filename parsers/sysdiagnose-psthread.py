@@ -22,6 +22,7 @@ version_string = "sysdiagnose-ps.py Version 1.0"
 parser_description = "Parsing ps_thread.txt file"
 parser_input = "ps_thread"
 parser_call = "parse_ps_thread"
+parser_schema = {"layout": "records"}
 
 # --------------------------------------------#
 
@@ -15,6 +15,7 @@ from biplist import Uid, Data
 from datetime import datetime
 
 import config
+import misc
 
 
 class CustomEncoder(json.JSONEncoder):
@@ -55,7 +56,7 @@ def getKnownWifiNetworks(plistfiles=[], ios_version=13):
                         print(json.dumps(result, indent=4, cls=CustomEncoder), file=sys.stderr)
             except Exception as e:
                 print(f"Could not parse {path}. Reason: {str(e)}", file=sys.stderr)
-    return json.loads(json.dumps(result, indent=4, cls=CustomEncoder))
+    return misc.fix_plist(result)
 
 
 def main():
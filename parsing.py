@@ -9,14 +9,21 @@
 
 Usage:
   parsing.py list (cases|parsers)
-  parsing.py parse <parser> <case_number>
-  parsing.py allparsers <case_number>
+  parsing.py parse <parser> (<case_number> | --cases=<cases>) [--workers=<n>] [--timeout=<seconds>] [--profile]
+  parsing.py allparsers (<case_number> | --cases=<cases>) [--workers=<n>] [--timeout=<seconds>] [--force] [--profile]
+  parsing.py report <case_number>
+  parsing.py casedb <case_number>
   parsing.py (-h | --help)
   parsing.py --version
 
 Options:
   -h --help     Show this screen.
   -v --version     Show version.
+  --cases=<cases>  Cases to parse, e.g. 1-200 or 1,4,10-20.
+  --workers=<n>    Number of parsers run concurrently (default: number of CPUs).
+  --timeout=<seconds>  Stop a parser running longer than this (default: config.parser_timeout).
+  --force          Run parsers even if their inputs and version did not change since their last run.
+  --profile        Profile the parsers, saved in parsed_data/<case_number>/_profiles/.
 """
 
 import config
@@ -24,10 +31,27 @@ import config
 import json
 import os
 import sys
-import importlib.util
-import glob
-from tabulate import tabulate
-from docopt import docopt
+import copy
+import time
+import contextlib
+import shutil
+import hashlib
+import tempfile
+
+from utils import artifacts
+from utils import cases
+from utils import casedb
+from utils import lazy
+from utils import parsed_data
+from utils import plugins
+from utils import profiling
+from utils import resources
+
+# loaded on first use, see utils/lazy.py
+archive = lazy.module('utils.archive')
+scheduler = lazy.module('utils.scheduler')
+docopt = lazy.function('docopt', 'docopt')
+tabulate = lazy.function('tabulate', 'tabulate')
 
 
 """
@@ -35,19 +59,20 @@ from docopt import docopt
 """
 
 
-def list_cases(case_file):
+def list_cases(cases_db):
     try:
-        with open(config.cases_file, 'r') as f:
-            cases = json.load(f)
+        db = cases.connect(cases_db)
+        case_list = cases.list_cases(db)
+        db.close()
     except Exception as e:
-        print(f'error opening cases json file - check config.py. Reason: {str(e)}', file=sys.stderr)
+        print(f'error opening cases registry - check config.py. Reason: {str(e)}', file=sys.stderr)
         sys.exit()
 
     print("#### case List ####")
-    headers = ['Case ID', 'Source file', 'SHA256']
+    headers = ['Case ID', 'Source file', 'SHA256', 'Tree hash']
     lines = []
-    for case in cases['cases']:
-        line = [case['case_id'], case['source_file'], case['source_sha256']]
+    for case in case_list:
+        line = [case['case_id'], case['source_file'], case['source_sha256'], case['tree_hash']]
         lines.append(line)
 
     print(tabulate(lines, headers=headers))
@@ -59,18 +84,10 @@ def list_cases(case_file):
 
 
 def list_parsers(folder):
-    os.chdir(folder)
-    modules = glob.glob(os.path.join(os.path.dirname('.'), "*.py"))
     lines = []
-    for parser in modules:
-        try:
-            spec = importlib.util.spec_from_file_location(parser[:-3], parser)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            line = [parser[:-3], module.parser_description, module.parser_input]
-            lines.append(line)
-        except:     # noqa: E722
-            continue
+    for parser, metadata in plugins.list_plugins(folder, 'parser_call').items():
+        line = [parser, metadata.get('parser_description'), metadata.get('parser_input')]
+        lines.append(line)
 
     headers = ['Parser Name', 'Parser Description', 'Parser Input']
 
@@ -82,81 +99,469 @@ def list_parsers(folder):
 """
 
 
-def parse(parser, case_id):
+# cases already loaded: case_id -> (case_file, mtime, case)
+_cases = {}
+
+
+def load_case(case_id):
+    """
+        Return the case json of a case, raise ValueError if it cannot be read.
+        Cases are loaded once per process, again if their case file changed.
+    """
+    if str(case_id) in _cases:
+        case_file, mtime, case = _cases[str(case_id)]
+        try:
+            if os.stat(case_file).st_mtime_ns == mtime:
+                return copy.deepcopy(case)
+        except OSError:
+            pass
+
     try:
-        with open(config.cases_file, 'r') as f:
-            cases = json.load(f)
+        db = cases.connect()
+        registered = cases.get_case(db, case_id)
+        db.close()
     except Exception as e:
-        print(f'error opening cases json file - check config.py. Error: {str(e)}', file=sys.stderr)
-        sys.exit()
-
-    case_file = ''
-    for case in cases['cases']:
-        if int(case_id) == case['case_id']:
-            case_file = case['case_file']
+        raise ValueError(f'error opening cases registry - check config.py. Error: {str(e)}')
 
-    if case_file == '':
-        print("Case ID not found", file=sys.stderr)
-        sys.exit()
+    if registered is None:
+        raise ValueError("Case ID not found")
 
     # Load case file
     try:
-        with open(case_file, 'r') as f:
+        mtime = os.stat(registered['case_file']).st_mtime_ns
+        with open(registered['case_file'], 'r') as f:
             case = json.load(f)
-    except:     # noqa: E722
-        print("error opening case file", file=sys.stderr)
-        sys.exit()
+    except Exception:
+        raise ValueError("error opening case file")
+    _cases[str(case_id)] = (registered['case_file'], mtime, case)
+    return copy.deepcopy(case)
+
+
+def run_parser(parser, case_id, profile=False):
+    """
+        Run a parser on a case and save its output, profiled if profile is True.
+        Return the path of the output file, exceptions of the parser are raised.
+    """
+    case = load_case(case_id)
 
     # print(json.dumps(case, indent=4), file=sys.stderr)   #debug
 
-    # Load parser module
-    spec = importlib.util.spec_from_file_location(parser[:-3], config.parsers_folder + parser + '.py')
-    print(spec, file=sys.stderr)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    # only the metadata is needed to find the input, the parser module is
+    # imported when called
+    parser_file = config.parsers_folder + parser + '.py'
+    metadata = plugins.read_metadata(parser_file)
+    parser_input = metadata['parser_input']
+    parsed_data.check_settings()
+
+    # the parser input is still in the archive: extract it on first use for
+    # selective cases, serve it from a temporary folder for zero-extraction cases
+    inputs = case[parser_input]
+    tmp_folder = None
+    if parser_input in case.get('pending', []):
+        if case['extraction'] == 'none':
+            tmp_folder = tempfile.mkdtemp(prefix='sysdiagnose-')
+            inputs = read_from_archive(case_id, case, parser_input, tmp_folder)
+        else:
+            extract_pending(case_id, case, parser_input)
+
+    # fingerprint of the inputs before parsing them
+    parser_fingerprint = fingerprint(parser, case_id, case)
+
+    folder = config.parsed_data_folder + str(case_id)
+    base = folder + '/' + parser
+    schema = metadata.get('parser_schema')
+    input_bytes = resources.path_size(inputs)
+    records = {'count': 0}
+
+    def counting(stream):
+        for record in stream:
+            records['count'] += 1
+            yield record
+
+    # running the parser, expecting JSON output (or a generator of records),
+    # and saving its output, records of streaming parsers are written as they
+    # are produced
+    meter = resources.Meter()
+    try:
+        with meter, profiling.profile(folder, parser, profile):
+            result = plugins.get_function(parser_file, metadata['parser_call'])(inputs)
+            if parsed_data.is_streaming(result):
+                result = counting(result)
+            else:
+                records['count'] = parsed_data.count(result, schema)
+            output_file = parsed_data.write(result, base, schema)
+    except MemoryError:
+        resources.record(folder, parser, resources.entry('parser', meter, 'out of memory', input_bytes,
+                                                         error=resources.out_of_memory(meter)))
+        raise
+    except Exception as e:
+        resources.record(folder, parser, resources.entry('parser', meter, 'error', input_bytes,
+                                                         error=f'{type(e).__name__}: {str(e)}'))
+        raise
+    finally:
+        if tmp_folder is not None:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+    resources.record(folder, parser, resources.entry('parser', meter, 'ok', input_bytes,
+                                                     parsed_data.size(output_file), records['count']))
 
-    # building command
-    if isinstance(case[module.parser_input], str):
-        command = 'module.' + module.parser_call + '(\'' + case[module.parser_input] + '\')'
-    else:
-        command = 'module.' + module.parser_call + '(' + str(case[module.parser_input]) + ')'
+    with open(base + '.fingerprint', 'w') as data_file:
+        data_file.write(json.dumps(parser_fingerprint, indent=4))
 
-    # running the command, expecting JSON output
-    # try:
-    #    result = eval(command)
-    # except Exception as e:
-    #    print(f'Error trying to parse {case[module.parser_input]}: {str(e)}', file=sys.stderr)
+    return output_file
 
-    result = eval(command)
 
-    # saving the parser output
-    output_file = config.parsed_data_folder + case_id + '/' + parser + '.json'
-    with open(output_file, 'w') as data_file:
-        data_file.write(json.dumps(result, indent=4))
+def parse(parser, case_id, profile=False):
+    if config.worker_memory_limit is not None:
+        resources.limit_memory(config.worker_memory_limit)
+    try:
+        output_file = run_parser(parser, case_id, profile)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit()
+    except MemoryError:
+        print(f'{parser} failed: {resources.out_of_memory()}', file=sys.stderr)
+        sys.exit(-1)
+    casedb.load_output(config.parsed_data_folder + str(case_id), parser, output_file)
 
     print(f'Execution success, output saved in: {output_file}', file=sys.stderr)
+    if profile:
+        print(f'Profile saved in: {", ".join(profiling.profile_files(config.parsed_data_folder + str(case_id), parser))}',
+              file=sys.stderr)
 
     return 0
 
 
+"""
+    Incremental parsing
+"""
+
+
+def fingerprint(parser, case_id, case):
+    """
+        Return what the output of a parser depends on: its version and source,
+        the settings it is written with, and the path, size and mtime of its
+        inputs (of all the files below input folders). Inputs left in the
+        archive are identified by their path and size in the member index,
+        the archive of a case never changes.
+    """
+    parser_file = config.parsers_folder + parser + '.py'
+    metadata = plugins.read_metadata(parser_file)
+    parser_input = metadata['parser_input']
+    paths = case[parser_input] if isinstance(case[parser_input], list) else [case[parser_input]]
+
+    inputs = []
+    if parser_input in case.get('pending', []):
+        with open(config.data_folder + str(case_id) + '.members.json', 'r') as f:
+            members = json.load(f)
+        for path, member in zip(paths, archive_paths(case_id, paths)):
+            name = artifacts.normalize(member)
+            below = sorted(f'{key} {value[1]}' for key, value in members.items()
+                           if key == name or key.startswith(name + '/'))
+            inputs.append([path, 'archive', hashlib.sha256('\n'.join(below).encode('utf-8')).hexdigest()])
+    else:
+        for path in paths:
+            if os.path.isdir(path):
+                inputs.append([path, 'tree', archive.tree_hash(path)])
+            else:
+                stat = os.stat(path)
+                inputs.append([path, stat.st_size, stat.st_mtime_ns])
+
+    return {
+        "parser": parser,
+        "version_string": metadata.get('version_string'),
+        "parser_sha256": archive.digest_file(parser_file),
+        "output": parsed_data.settings(),
+        "inputs": inputs
+    }
+
+
+def is_up_to_date(parser, case_id, case):
+    """
+        Tell if the output of a parser was produced from the current inputs
+        by the current version of the parser
+    """
+    folder = config.parsed_data_folder + str(case_id)
+    try:
+        with open(os.path.join(folder, parser + '.fingerprint'), 'r') as f:
+            previous = json.load(f)
+        return parsed_data.output_file(folder, parser) is not None and previous == fingerprint(parser, case_id, case)
+    except Exception:
+        return False
+
+
+"""
+    Read artifacts left in the archive
+"""
+
+
+def open_archive(case_id, case):
+    with open(config.data_folder + str(case_id) + '.members.json', 'r') as f:
+        members = json.load(f)
+    return archive.ArchiveReader(case['source_file'], members, config.data_folder + str(case_id) + '.gzidx')
+
+
+def archive_paths(case_id, artifact_paths):
+    # path of the archive members, keeping the trailing slash identifying folders
+    case_folder = config.data_folder + str(case_id)
+    return [os.path.relpath(path, case_folder) + ('/' if path.endswith('/') else '') for path in artifact_paths]
+
+
+@contextlib.contextmanager
+def case_lock(case_id):
+    """
+        Hold an exclusive lock on a case, shared with the other processes
+        (parsers run concurrently by allparsers --workers, parse service).
+        No lock where fcntl is not available.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    folder = os.path.join(config.data_folder + str(case_id), '.extracted')
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def extract_pending(case_id, case, artifact):
+    """
+        Extract an artifact left in the archive by a selective ingest.
+        Parsers sharing an input may ask for it at the same time: it is
+        extracted once, under the case lock, and the marker telling it is
+        extracted is only written once all its files are in place.
+    """
+    case_folder = config.data_folder + str(case_id)
+    marker = os.path.join(case_folder, '.extracted', artifact)
+    if os.path.exists(marker):
+        return
+
+    with case_lock(case_id):
+        # extracted meanwhile by another parser
+        if os.path.exists(marker):
+            return
+        paths = case[artifact] if isinstance(case[artifact], list) else [case[artifact]]
+        print(f"Extracting {artifact} from {case['source_file']}", file=sys.stderr)
+        with open_archive(case_id, case) as reader:
+            reader.extract(archive_paths(case_id, paths), case_folder)
+
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        with open(marker, 'w'):
+            pass
+
+
+def read_from_archive(case_id, case, artifact, folder):
+    """
+        Write an artifact of a zero-extraction case to folder, and return its path(s)
+    """
+    paths = case[artifact] if isinstance(case[artifact], list) else [case[artifact]]
+    members = archive_paths(case_id, paths)
+    with open_archive(case_id, case) as reader:
+        reader.extract(members, folder)
+    paths = [os.path.join(folder, member) for member in members]
+    if isinstance(case[artifact], list):
+        return paths
+    return paths[0]
+
+
 """
     Parse All
 """
 
 
-def parse_all(case_id):
-    # get list of working parsers
-    # for each parser, run and save which is working
-    # display list of successful parses
-    os.chdir(config.parsers_folder)
-    modules = glob.glob(os.path.join(os.path.dirname('.'), "*.py"))
-    os.chdir('..')
-    for parser in modules:
+def get_parsers():
+    """
+        Return the names of the available parsers
+    """
+    return list(plugins.list_plugins(config.parsers_folder, 'parser_call'))
+
+
+def parse_all(case_id, workers=None, timeout=None, force=False, profile=False):
+    """
+        Run all the parsers on a case, concurrently in worker processes.
+        A parser failing, crashing or running longer than timeout seconds
+        does not stop the others. Parsers whose inputs and version did not
+        change since their last run are skipped, unless force is True.
+        With profile, each parser run is profiled.
+    """
+    if timeout is None:
+        timeout = config.parser_timeout
+    try:
+        case = load_case(case_id)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit()
+
+    def done(task):
+        print(f"{task.name}: {task.status} ({task.duration:.1f}s)", file=sys.stderr)
+        if task.status == 'ok':
+            casedb.load_output(config.parsed_data_folder + str(case_id), task.name, task.result)
+
+    lines = []
+    tasks = []
+    for parser in get_parsers():
+        if not force and is_up_to_date(parser, case_id, case):
+            output_file = parsed_data.output_file(config.parsed_data_folder + str(case_id), parser)
+            lines.append([parser, 'unchanged', '-', parsed_data.size(output_file)])
+        else:
+            tasks.append(scheduler.Task(parser, run_parser, (parser, case_id, profile)))
+    tasks = scheduler.run(tasks, workers, timeout, done, memory_limit=config.worker_memory_limit)
+
+    for task in tasks:
+        size = '-'
+        if task.status == 'ok':
+            size = parsed_data.size(task.result)
+        status = task.status
+        if task.error:
+            status += ': ' + task.error.splitlines()[0]
+        lines.append([task.name, status, f"{task.duration:.1f}", size])
+    lines.sort()
+
+    headers = ['Parser', 'Status', 'Duration (s)', 'Output size']
+    print(tabulate(lines, headers=headers))
+    return 0
+
+
+"""
+    Parse many cases
+"""
+
+
+def parse_case_list(cases_spec):
+    """
+        Return the case IDs of a list of cases and ranges like 1-200 or 1,4,10-20,
+        raise ValueError if it is not one
+    """
+    case_ids = []
+    for part in cases_spec.split(','):
+        first, sep, last = part.strip().partition('-')
+        if not first.isdigit() or (sep and not last.isdigit()):
+            raise ValueError(f'invalid case list {cases_spec}, expected e.g. 1-200 or 1,4,10-20')
+        for case_id in range(int(first), int(last if sep else first) + 1):
+            if str(case_id) not in case_ids:
+                case_ids.append(str(case_id))
+    return case_ids
+
+
+def parse_cases(parsers, case_ids, workers=None, timeout=None, force=False, profile=False):
+    """
+        Run parsers (all of them if None) on many cases. The runs are shared
+        by long-lived worker processes, so each worker imports a parser module
+        once whatever the number of cases. When running all the parsers,
+        those whose inputs and version did not change are skipped, unless
+        force is True.
+    """
+    if timeout is None:
+        timeout = config.parser_timeout
+    try:
+        db = cases.connect()
+        registered = {str(case['case_id']) for case in cases.list_cases(db)}
+        db.close()
+    except Exception as e:
+        print(f'error opening cases registry - check config.py. Reason: {str(e)}', file=sys.stderr)
+        sys.exit()
+
+    missing = [case_id for case_id in case_ids if case_id not in registered]
+    if missing:
+        print(f"Skipping unknown cases: {', '.join(missing)}", file=sys.stderr)
+
+    lines = []
+    tasks = []
+    parsed_cases = 0
+    for case_id in case_ids:
+        if case_id in missing:
+            continue
         try:
-            print(f"Trying: {parser[:-3]}", file=sys.stderr)
-            parse(parser[:-3], case_id)
-        except:     # noqa: E722
+            case = load_case(case_id)
+        except ValueError as e:
+            print(f'Skipping case {case_id}: {str(e)}', file=sys.stderr)
             continue
+        parsed_cases += 1
+        for parser in (parsers or get_parsers()):
+            if parsers is None and not force and is_up_to_date(parser, case_id, case):
+                output_file = parsed_data.output_file(config.parsed_data_folder + case_id, parser)
+                lines.append([case_id, parser, 'unchanged', '-', parsed_data.size(output_file)])
+            else:
+                tasks.append(scheduler.Task(case_id + '/' + parser, run_parser, (parser, case_id, profile)))
+
+    def done(task):
+        print(f"{task.name}: {task.status} ({task.duration:.1f}s)", file=sys.stderr)
+        if task.status == 'ok':
+            case_id, parser = task.name.split('/', 1)
+            casedb.load_output(config.parsed_data_folder + case_id, parser, task.result)
+
+    start = time.monotonic()
+    tasks = scheduler.run(tasks, workers, timeout, done, persistent=True, memory_limit=config.worker_memory_limit)
+    for task in tasks:
+        case_id, parser = task.name.split('/', 1)
+        size = '-'
+        if task.status == 'ok':
+            size = parsed_data.size(task.result)
+        status = task.status
+        if task.error:
+            status += ': ' + task.error.splitlines()[0]
+        lines.append([case_id, parser, status, f"{task.duration:.1f}", size])
+    lines.sort(key=lambda line: (int(line[0]), line[1]))
+
+    headers = ['Case', 'Parser', 'Status', 'Duration (s)', 'Output size']
+    print(tabulate(lines, headers=headers))
+    print(f"{len(tasks)} parser runs on {parsed_cases} cases in {time.monotonic() - start:.1f}s",
+          file=sys.stderr)
+    return 0
+
+
+"""
+    Run report
+"""
+
+
+def report(case_id):
+    """
+        Print the resources used by the last run of each parser and analyser
+    """
+    runs = resources.read(config.parsed_data_folder + str(case_id))
+    if not runs:
+        print(f'No run recorded for case {case_id}', file=sys.stderr)
+        return 0
+
+    lines = []
+    for name, run in sorted(runs.items()):
+        peak_rss = '-' if run.get('peak_rss') is None else f"{run['peak_rss'] / (1024 * 1024):.1f}"
+        growth = '-'
+        if run.get('peak_rss') is not None and run.get('start_rss') is not None:
+            growth = f"{(run['peak_rss'] - run['start_rss']) / (1024 * 1024):.1f}"
+        lines.append([name, run['kind'], run['status'], f"{run['wall_time']:.2f}", f"{run['cpu_time']:.2f}", peak_rss,
+                      growth, run['input_bytes'], run['output_bytes'], run['records'], run['records_per_second']])
+
+    headers = ['Name', 'Kind', 'Status', 'Wall (s)', 'CPU (s)', 'Peak RSS (MB)', 'Growth (MB)', 'Input bytes',
+               'Output bytes', 'Records', 'Records/s']
+    print(tabulate(lines, headers=headers, missingval='-'))
+    return 0
+
+
+"""
+    Case database
+"""
+
+
+def build_casedb(case_id):
+    """
+        Load all the parser outputs of a case in its case.db
+    """
+    folder = config.parsed_data_folder + str(case_id)
+    if not os.path.isdir(folder):
+        print(f'No parsed data for case {case_id}', file=sys.stderr)
+        return 0
+
+    lines = []
+    for name, rows in casedb.build(folder).items():
+        lines.append([name, rows])
+    print(tabulate(lines, headers=['Name', 'Rows']))
+    print(f'Case database saved in: {os.path.join(folder, casedb.database_file)}', file=sys.stderr)
     return 0
 
 
@@ -165,6 +570,27 @@ def parse_all(case_id):
 """
 
 
+def positive_number(arguments, option):
+    """
+        Return the value of a numeric option, None if not given.
+        Exit with a usage error if it is not a number greater than 0.
+    """
+    value = arguments[option]
+    if value is None:
+        return None
+    if not value.isdigit() or int(value) == 0:
+        print(f"{option} should be ... a number ... greater than 0", file=sys.stderr)
+        sys.exit(-1)
+    return int(value)
+
+
+def run_options(arguments):
+    """
+        Return the --workers and --timeout options, None if not given
+    """
+    return positive_number(arguments, '--workers'), positive_number(arguments, '--timeout')
+
+
 def main():
 
     if sys.version_info[0] < 3:
@@ -176,17 +602,44 @@ def main():
     # print(arguments, file=sys.stderr)
 
     if arguments['list'] and arguments['cases']:
-        list_cases(config.cases_file)
+        list_cases(config.cases_db)
     elif arguments['list'] and arguments['parsers']:
         list_parsers(config.parsers_folder)
+    elif arguments['parse'] and arguments['--cases']:
+        try:
+            case_ids = parse_case_list(arguments['--cases'])
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit()
+        workers, timeout = run_options(arguments)
+        parse_cases([arguments['<parser>']], case_ids, workers, timeout, True, arguments['--profile'])
     elif arguments['parse']:
         if arguments['<case_number>'].isdigit():
-            parse(arguments['<parser>'], arguments['<case_number>'])
+            parse(arguments['<parser>'], arguments['<case_number>'], arguments['--profile'])
         else:
             print("case number should be ... a number ...", file=sys.stderr)
+    elif arguments['allparsers'] and arguments['--cases']:
+        try:
+            case_ids = parse_case_list(arguments['--cases'])
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit()
+        workers, timeout = run_options(arguments)
+        parse_cases(None, case_ids, workers, timeout, arguments['--force'], arguments['--profile'])
     elif arguments['allparsers']:
+        workers, timeout = run_options(arguments)
+        if arguments['<case_number>'].isdigit():
+            parse_all(arguments['<case_number>'], workers, timeout, arguments['--force'], arguments['--profile'])
+        else:
+            print("case number should be ... a number ...", file=sys.stderr)
+    elif arguments['report']:
+        if arguments['<case_number>'].isdigit():
+            report(arguments['<case_number>'])
+        else:
+            print("case number should be ... a number ...", file=sys.stderr)
+    elif arguments['casedb']:
         if arguments['<case_number>'].isdigit():
-            parse_all(arguments['<case_number>'])
+            build_casedb(arguments['<case_number>'])
         else:
             print("case number should be ... a number ...", file=sys.stderr)
 
@@ -0,0 +1,213 @@
+#! /usr/bin/env python3
+
+# For Python3
+# Run parsers and analysers of a case as a dependency graph
+#
+# Parsers read the artifacts of the case (parser_input) and write
+# <parser>.json (<parser>.jsonl for streaming parsers). Analysers declare
+# the parsers (or analysers) whose output they read in analyser_input and
+# write <analyser>.<analyser_format>.
+# Every step starts as soon as the steps it depends on are over, so
+# analysers overlap with the parsers they do not need.
+
+"""sysdiagnose pipeline.
+
+Usage:
+  pipeline.py run <case_number> [--workers=<n>] [--timeout=<seconds>] [--force]
+  pipeline.py show <case_number>
+  pipeline.py (-h | --help)
+  pipeline.py --version
+
+Options:
+  -h --help     Show this screen.
+  -v --version     Show version.
+  --workers=<n>    Number of steps run concurrently (default: number of CPUs).
+  --timeout=<seconds>  Stop a step running longer than this (default: config.parser_timeout).
+  --force          Run parsers even if their inputs and version did not change since their last run.
+"""
+
+import config
+import parsing
+import analyse
+
+import os
+import sys
+import time
+
+from utils import casedb
+from utils import lazy
+from utils import parsed_data
+from utils import plugins
+from utils import scheduler
+
+# loaded on first use, see utils/lazy.py
+docopt = lazy.function('docopt', 'docopt')
+tabulate = lazy.function('tabulate', 'tabulate')
+
+version_string = "pipeline.py v2026-10-18 Version 1.0"
+
+
+"""
+    Build the graph
+"""
+
+
+def build_graph(case):
+    """
+        Return the steps of the pipeline of a case: name -> {"kind", "depends"}.
+        Parsers whose input is not in the case are left out. Analysers not
+        declaring their input depend on all the parsers.
+    """
+    steps = {}
+    for parser, metadata in plugins.list_plugins(config.parsers_folder, 'parser_call').items():
+        if metadata.get('parser_input') in case:
+            steps[parser] = {"kind": 'parser', "depends": set()}
+    parsers = set(steps)
+
+    for analyser, metadata in plugins.list_plugins(config.analysers_folder, 'analyser_call').items():
+        depends = metadata.get('analyser_input')
+        if depends is None:
+            depends = parsers
+        steps[analyser] = {"kind": 'analyser', "depends": set(depends)}
+
+    # dependencies that cannot run for this case (or unknown ones) are ignored,
+    # the analyser then runs without their output
+    for step in steps.values():
+        step['depends'] &= set(steps)
+
+    check_cycles(steps)
+    return steps
+
+
+def check_cycles(steps):
+    """
+        Raise ValueError if steps depend on each other
+    """
+    remaining = {name: set(step['depends']) for name, step in steps.items()}
+    while remaining:
+        ready = [name for name, depends in remaining.items() if not depends]
+        if not ready:
+            raise ValueError(f"dependency cycle between {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for depends in remaining.values():
+            depends.difference_update(ready)
+
+
+def make_task(name, step, case_id):
+    if step['kind'] == 'parser':
+        return scheduler.Task(name, parsing.run_parser, (name, case_id))
+    return scheduler.Task(name, analyse.run_analyser, (name, case_id))
+
+
+"""
+    Run
+"""
+
+
+def run(case_id, workers=None, timeout=None, force=False):
+    """
+        Run the pipeline of a case. Parsers whose inputs and version did not
+        change since their last run are skipped, unless force is True.
+    """
+    if timeout is None:
+        timeout = config.parser_timeout
+    try:
+        case = parsing.load_case(case_id)
+        steps = build_graph(case)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit()
+
+    # parsers whose output is up to date are over before starting
+    lines = []
+    unchanged = set()
+    if not force:
+        for name, step in steps.items():
+            if step['kind'] == 'parser' and parsing.is_up_to_date(name, case_id, case):
+                unchanged.add(name)
+                output_file = parsed_data.output_file(config.parsed_data_folder + str(case_id), name)
+                lines.append([name, 'parser', 'unchanged', '-', parsed_data.size(output_file)])
+    waiting = {name: set(step['depends']) - unchanged for name, step in steps.items() if name not in unchanged}
+
+    def done(task):
+        print(f"{task.name}: {task.status} ({task.duration:.1f}s)", file=sys.stderr)
+        if task.status == 'ok':
+            casedb.load_output(config.parsed_data_folder + str(case_id), task.name, task.result)
+        new_tasks = []
+        for name, depends in list(waiting.items()):
+            depends.discard(task.name)
+            if not depends:
+                del waiting[name]
+                new_tasks.append(make_task(name, steps[name], case_id))
+        return new_tasks
+
+    start = time.monotonic()
+    tasks = [make_task(name, steps[name], case_id) for name, depends in list(waiting.items()) if not depends]
+    for task in tasks:
+        del waiting[task.name]
+    tasks = scheduler.run(tasks, workers, timeout, done, memory_limit=config.worker_memory_limit)
+    elapsed = time.monotonic() - start
+
+    for task in tasks:
+        size = '-'
+        if task.status == 'ok':
+            size = parsed_data.size(task.result) if os.path.exists(task.result) else 0
+        status = task.status
+        if task.error:
+            status += ': ' + task.error.splitlines()[0]
+        lines.append([task.name, steps[task.name]['kind'], status, f"{task.duration:.1f}", size])
+
+    headers = ['Step', 'Kind', 'Status', 'Duration (s)', 'Output size']
+    print(tabulate(lines, headers=headers))
+    print(f"Pipeline finished in {elapsed:.1f}s")
+    return 0
+
+
+def show(case_id):
+    """
+        Print the steps of the pipeline of a case and their dependencies
+    """
+    try:
+        steps = build_graph(parsing.load_case(case_id))
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit()
+
+    lines = [[name, step['kind'], ', '.join(sorted(step['depends']))] for name, step in steps.items()]
+    print(tabulate(lines, headers=['Step', 'Kind', 'Depends on']))
+
+
+"""
+    Main function
+"""
+
+
+def main():
+
+    if sys.version_info[0] < 3:
+        print("Still using Python 2 ?!?", file=sys.stderr)
+        sys.exit(-1)
+
+    arguments = docopt(__doc__, version=version_string)
+
+    if not arguments['<case_number>'].isdigit():
+        print("case number should be ... a number ...", file=sys.stderr)
+        sys.exit()
+
+    if arguments['run']:
+        workers, timeout = parsing.run_options(arguments)
+        run(arguments['<case_number>'], workers, timeout, arguments['--force'])
+    elif arguments['show']:
+        show(arguments['<case_number>'])
+
+
+"""
+   Call main function
+"""
+if __name__ == "__main__":
+
+    main()
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
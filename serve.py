@@ -0,0 +1,287 @@
+#! /usr/bin/env python3
+
+# For Python3
+# Parse and analyse service
+#
+# Keeps worker processes with the parser and analyser modules imported and
+# the case registry open, and runs the parse and analyse jobs it is sent over
+# localhost HTTP (or a Unix socket) with a bounded queue:
+#
+#   POST /jobs        {"kind": "parse" or "analyse", "name": <parser or analyser>, "case": <case_number>}
+#                     -> 202 {"id": ..., "status": "queued"}, 503 when the queue is full
+#   GET  /jobs/<id>   status, output file or error, duration of a job
+#   GET  /jobs        all the jobs
+#   GET  /status      queue, workers and job counts
+#
+# e.g. curl -d '{"kind": "parse", "name": "sysdiagnose-ps", "case": 1}' http://127.0.0.1:8421/jobs
+#      curl --unix-socket /tmp/sysdiagnose.sock http://localhost/status
+
+"""sysdiagnose serve.
+
+Usage:
+  serve.py [--port=<port> | --socket=<path>] [--workers=<n>] [--queue=<n>] [--timeout=<seconds>]
+  serve.py (-h | --help)
+  serve.py --version
+
+Options:
+  -h --help     Show this screen.
+  -v --version     Show version.
+  --port=<port>    Listen on this localhost port (default: config.serve_port).
+  --socket=<path>  Listen on this Unix socket instead.
+  --workers=<n>    Number of jobs run concurrently (default: number of CPUs).
+  --queue=<n>      Number of jobs waiting before new ones are refused (default: config.serve_queue_size).
+  --timeout=<seconds>  Stop a job running longer than this (default: config.parser_timeout).
+"""
+
+import config
+import parsing
+import analyse
+
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import threading
+import socketserver
+import multiprocessing
+import http.server
+from docopt import docopt
+
+from utils import cases
+from utils import casedb
+from utils import plugins
+from utils import scheduler
+
+version_string = "serve.py v2026-10-18 Version 1.0"
+
+
+"""
+    Workers
+"""
+
+
+def warm_up():
+    """
+        Import all the parser and analyser modules in the worker process.
+        Return the names of those that could not be imported.
+    """
+    failed = []
+    for folder, call in [(config.parsers_folder, 'parser_call'), (config.analysers_folder, 'analyser_call')]:
+        for name in plugins.list_plugins(folder, call):
+            try:
+                plugins.load_module(os.path.join(folder, name + '.py'))
+            except BaseException:
+                failed.append(name)
+    return failed
+
+
+class Service:
+    """
+        The job queue and the threads running its jobs, each with its own
+        worker process kept from job to job
+    """
+
+    def __init__(self, workers=None, queue_size=None, timeout=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.timeout = timeout or config.parser_timeout
+        self.queue = queue.Queue(maxsize=queue_size or config.serve_queue_size)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.started = time.time()
+        self.db = cases.connect()
+        self.parsers = plugins.list_plugins(config.parsers_folder, 'parser_call')
+        self.analysers = plugins.list_plugins(config.analysers_folder, 'analyser_call')
+        self.threads = [threading.Thread(target=self.run, daemon=True) for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, kind, name, case_id):
+        """
+            Queue a job and return it, raise ValueError if it is not valid and
+            queue.Full if the queue is full
+        """
+        if kind not in ('parse', 'analyse'):
+            raise ValueError(f'unknown job kind {kind}, use parse or analyse')
+        if name not in (self.parsers if kind == 'parse' else self.analysers):
+            raise ValueError(f'unknown {"parser" if kind == "parse" else "analyser"} {name}')
+        case_id = str(case_id)
+        if not case_id.isdigit() or cases.get_case(self.db, case_id) is None:
+            raise ValueError(f'unknown case {case_id}')
+
+        with self.lock:
+            job = {"id": self.next_id, "kind": kind, "name": name, "case": case_id, "status": 'queued',
+                   "submitted": time.time(), "duration": None, "output_file": None, "error": None}
+            self.queue.put_nowait(job)
+            self.jobs[job['id']] = job
+            self.next_id += 1
+        return job
+
+    def run(self):
+        # thread running the jobs of the queue, one at a time, in its worker,
+        # warmed up when started and when replaced (after a timeout or crash)
+        pool = [scheduler.Worker(config.worker_memory_limit, warm_up)]
+        while True:
+            job = self.queue.get()
+            try:
+                with self.lock:
+                    job['status'] = 'running'
+                if job['kind'] == 'parse':
+                    task = scheduler.Task(job['name'], parsing.run_parser, (job['name'], job['case']))
+                else:
+                    task = scheduler.Task(job['name'], analyse.run_analyser, (job['name'], job['case']))
+                task = scheduler.run([task], 1, self.timeout, pool=pool, memory_limit=config.worker_memory_limit,
+                                     initializer=warm_up)[0]
+                if task.status == 'ok':
+                    casedb.load_output(config.parsed_data_folder + job['case'], job['name'], task.result)
+                with self.lock:
+                    job['status'] = task.status
+                    job['duration'] = round(task.duration, 3)
+                    job['output_file'] = task.result
+                    if task.error:
+                        job['error'] = task.error.splitlines()[0]
+            except Exception as e:
+                # the job ends whatever happens, the thread runs the next one
+                with self.lock:
+                    job['status'] = 'error'
+                    job['error'] = f'{type(e).__name__}: {str(e)}'
+            finally:
+                self.queue.task_done()
+
+    def status(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {"version": version_string, "uptime": round(time.time() - self.started),
+                    "workers": self.workers, "queued": self.queue.qsize(), "queue_size": self.queue.maxsize,
+                    "jobs": counts}
+
+    def job(self, job_id):
+        with self.lock:
+            return dict(self.jobs[job_id]) if job_id in self.jobs else None
+
+    def all_jobs(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+
+"""
+    HTTP interface
+"""
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    service = None
+
+    def reply(self, code, body):
+        data = json.dumps(body, indent=4).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/status':
+            self.reply(200, self.service.status())
+        elif path == '/jobs':
+            self.reply(200, self.service.all_jobs())
+        elif path.startswith('/jobs/') and path[len('/jobs/'):].isdigit():
+            job = self.service.job(int(path[len('/jobs/'):]))
+            if job is None:
+                self.reply(404, {"error": 'job not found'})
+            else:
+                self.reply(200, job)
+        else:
+            self.reply(404, {"error": 'not found'})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            self.reply(404, {"error": 'not found'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            job = self.service.submit(request.get('kind'), request.get('name'), request.get('case'))
+        except queue.Full:
+            self.reply(503, {"error": 'job queue is full, retry later'})
+            return
+        except (ValueError, AttributeError) as e:
+            self.reply(400, {"error": str(e)})
+            return
+        self.reply(202, {"id": job['id'], "status": job['status']})
+
+    def log_message(self, format, *args):
+        # the client address of a Unix socket is empty
+        print(f'{self.log_date_time_string()} {format % args}', file=sys.stderr)
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    def get_request(self):
+        request, client_address = super().get_request()
+        return request, ('unix', 0)
+
+
+def serve(port=None, socket_path=None, workers=None, queue_size=None, timeout=None):
+    Handler.service = Service(workers, queue_size, timeout)
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, Handler)
+        os.chmod(socket_path, 0o600)
+        print(f'Listening on {socket_path}', file=sys.stderr)
+    else:
+        server = http.server.HTTPServer(('127.0.0.1', port or config.serve_port), Handler)
+        print(f'Listening on http://127.0.0.1:{server.server_address[1]}', file=sys.stderr)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+    return 0
+
+
+"""
+    Main function
+"""
+
+
+def main():
+
+    if sys.version_info[0] < 3:
+        print("Still using Python 2 ?!?", file=sys.stderr)
+        sys.exit(-1)
+
+    arguments = docopt(__doc__, version=version_string)
+
+    port = arguments['--port']
+    if port is not None and not port.isdigit():
+        print("--port should be ... a number ...", file=sys.stderr)
+        sys.exit(-1)
+    # --port=0 is valid: any free port
+    port = int(port) if port is not None else None
+    numbers = {option: parsing.positive_number(arguments, option) for option in ['--workers', '--queue', '--timeout']}
+
+    serve(port, arguments['--socket'], numbers['--workers'], numbers['--queue'], numbers['--timeout'])
+
+
+"""
+   Call main function
+"""
+if __name__ == "__main__":
+
+    main()
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
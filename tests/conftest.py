@@ -0,0 +1,30 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Fixtures shared by the tests
+
+import os
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+        Run the test in an empty folder with its own data, parsed_data and
+        case registry
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    os.makedirs('parsed_data')
+    monkeypatch.setattr(config, 'data_folder', './data/')
+    monkeypatch.setattr(config, 'parsed_data_folder', './parsed_data/')
+    monkeypatch.setattr(config, 'cases_db', 'cases.db')
+    monkeypatch.setattr(config, 'cases_file', 'cases.json')
+    monkeypatch.setattr(config, 'store_folder', './data/.store/')
+    return tmp_path
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
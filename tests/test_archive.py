@@ -0,0 +1,182 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/archive.py: archives are hashed and extracted in one read,
+# nothing is ever written outside of the extraction folder
+
+import io
+import os
+import hashlib
+import tarfile
+
+import pytest
+
+import config
+from utils import archive
+
+files = {
+    "sysdiagnose_X/sysdiagnose.log": b'Sysdiagnose version: iPhone OS 16.3 (20D47)\n',
+    "sysdiagnose_X/ps.txt": b'USER PID COMMAND\nroot 1 launchd\n',
+    "sysdiagnose_X/WiFi/com.apple.wifi.known-networks.plist": b'<plist/>',
+}
+
+
+def make_archive(path, files, links=(), mode='w:gz'):
+    """
+        Write a tar archive with files (name -> content) and links (list of
+        (name, target, tarfile type))
+    """
+    with tarfile.open(path, mode) as tf:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mtime = 1677145442
+            tf.addfile(info, io.BytesIO(content))
+        for name, target, type in links:
+            info = tarfile.TarInfo(name)
+            info.type = type
+            info.linkname = target
+            tf.addfile(info)
+    return str(path)
+
+
+def test_extract(tmp_path):
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', files)
+    destination = str(tmp_path / 'case')
+    extracted = archive.extract(archive_file, destination, algorithms=['md5'], file_digest='sha256')
+    with open(archive_file, 'rb') as f:
+        content = f.read()
+    assert extracted['digests'] == {"md5": hashlib.md5(content).hexdigest(), "sha256": hashlib.sha256(content).hexdigest()}
+    assert extracted['bytes_read'] == len(content)
+    assert extracted['file_digests'] == {name: hashlib.sha256(data).hexdigest() for name, data in files.items()}
+    assert extracted['file_digests'] == archive.digest_tree(destination)
+    for name, data in files.items():
+        with open(os.path.join(destination, name), 'rb') as f:
+            assert f.read() == data
+        assert os.path.getmtime(os.path.join(destination, name)) == 1677145442
+
+
+def test_select_capture(tmp_path):
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', files)
+    destination = str(tmp_path / 'case')
+    extracted = archive.extract(archive_file, destination, select=lambda path: path.endswith('ps.txt'),
+                                capture=lambda path: path.endswith('sysdiagnose.log'))
+    assert extracted['captured'] == {"sysdiagnose_X/sysdiagnose.log": files['sysdiagnose_X/sysdiagnose.log']}
+    assert archive.digest_tree(destination).keys() == {'sysdiagnose_X/ps.txt'}
+    assert len(extracted['members']) == len(files)
+
+
+def test_archive_reader(tmp_path):
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', files)
+    extracted = archive.extract(archive_file, str(tmp_path / 'case'), select=lambda path: False)
+    members = archive.member_index(extracted['members'])
+    assert set(members) == set(files)
+    destination = str(tmp_path / 'lazy')
+    with archive.ArchiveReader(archive_file, members) as reader:
+        assert reader.read('sysdiagnose_X/ps.txt') == files['sysdiagnose_X/ps.txt']
+        reader.extract(['sysdiagnose_X/WiFi/'], destination)
+    assert os.listdir(os.path.join(destination, 'sysdiagnose_X/WiFi')) == ['com.apple.wifi.known-networks.plist']
+
+
+@pytest.mark.parametrize('name', ['sysdiagnose_X/../../outside.txt', '../outside.txt', '/sysdiagnose_X/a/../../../outside.txt'])
+def test_member_outside(tmp_path, name):
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', {name: b'written outside'})
+    with pytest.raises(ValueError):
+        archive.extract(archive_file, str(tmp_path / 'data' / 'case'))
+    assert not os.path.exists(tmp_path / 'outside.txt')
+    assert not os.path.exists(tmp_path / 'data' / 'outside.txt')
+
+
+def test_member_index_outside(tmp_path):
+    # a member index can only be read back inside the case folder
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar', {"a/../../outside.txt": b'written outside'}, mode='w')
+    with archive.ArchiveReader(archive_file, {"a/../../outside.txt": [512, 15, False]}) as reader:
+        with pytest.raises(ValueError):
+            reader.extract(['a/../../outside.txt'], str(tmp_path / 'case'))
+    assert not os.path.exists(tmp_path / 'outside.txt')
+
+
+def test_links_outside(tmp_path):
+    links = [
+        ('sysdiagnose_X/passwd', '/etc/passwd', tarfile.SYMTYPE),
+        ('sysdiagnose_X/up', '../../..', tarfile.SYMTYPE),
+        ('sysdiagnose_X/hard', '../outside.txt', tarfile.LNKTYPE),
+        ('sysdiagnose_X/ps', 'ps.txt', tarfile.SYMTYPE),
+    ]
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', files, links)
+    destination = str(tmp_path / 'case')
+    extracted = archive.extract(archive_file, destination, file_digest='sha256')
+    assert sorted(os.listdir(os.path.join(destination, 'sysdiagnose_X'))) == ['WiFi', 'ps', 'ps.txt', 'sysdiagnose.log']
+    assert extracted['file_digests']['sysdiagnose_X/ps'] == extracted['file_digests']['sysdiagnose_X/ps.txt']
+
+
+def test_write_through_link(tmp_path):
+    # a file is not written where a link of the extraction folder points to
+    os.makedirs(tmp_path / 'outside')
+    destination = str(tmp_path / 'case')
+    os.makedirs(os.path.join(destination, 'sysdiagnose_X'))
+    os.symlink(str(tmp_path / 'outside'), os.path.join(destination, 'sysdiagnose_X', 'logs'))
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', {"sysdiagnose_X/logs/x.txt": b'written outside'})
+    with pytest.raises(ValueError):
+        archive.extract(archive_file, destination)
+    assert os.listdir(tmp_path / 'outside') == []
+
+def test_probe(tmp_path):
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', files)
+    probed = archive.probe(archive_file)
+    assert probed['members'] == len(files)
+    assert probed['size'] == sum(len(data) for data in files.values())
+    assert probed['ios_version'] == '16.3'
+    assert probed['artifacts']['ps'] == [('sysdiagnose_X/ps.txt', len(files['sysdiagnose_X/ps.txt']))]
+    assert probed['artifacts']['wifi_data'] == [('sysdiagnose_X/WiFi/com.apple.wifi.known-networks.plist', 8)]
+    assert 'powerlogs' not in probed['artifacts']
+    # nothing is extracted
+    assert os.listdir(tmp_path) == ['sysdiagnose.tar.gz']
+
+def test_store(tmp_path, monkeypatch):
+    store = str(tmp_path / 'store')
+    first = make_archive(tmp_path / 'first.tar.gz', files)
+    archive.extract(first, str(tmp_path / 'first'), store=store)
+    # written to a temporary file while hashed, instead of buffered
+    monkeypatch.setattr(config, 'store_buffer_size', 0)
+    extracted = archive.extract(first, str(tmp_path / 'again'), store=store)
+    assert extracted['deduplicated'] == sum(len(data) for data in files.values())
+    ps = 'sysdiagnose_X/ps.txt'
+    assert os.path.samefile(tmp_path / 'first' / ps, tmp_path / 'again' / ps)
+    # stored files cannot be modified through a case
+    assert os.stat(tmp_path / 'first' / ps).st_mode & 0o222 == 0
+
+    # same content, other modification time: not shared, each case keeps its own
+    with tarfile.open(tmp_path / 'second.tar.gz', 'w:gz') as tf:
+        info = tarfile.TarInfo(ps)
+        info.size = len(files[ps])
+        info.mtime = 1700000000
+        tf.addfile(info, io.BytesIO(files[ps]))
+    extracted = archive.extract(str(tmp_path / 'second.tar.gz'), str(tmp_path / 'second'), store=store)
+    assert extracted['deduplicated'] == 0
+    assert os.path.getmtime(tmp_path / 'second' / ps) == 1700000000
+    assert os.path.getmtime(tmp_path / 'first' / ps) == 1677145442
+    assert not os.path.samefile(tmp_path / 'first' / ps, tmp_path / 'second' / ps)
+
+
+def test_store_concurrent(tmp_path, monkeypatch):
+    # another ingest stores the same file between the check and the publication
+    store = str(tmp_path / 'store')
+    archive_file = make_archive(tmp_path / 'sysdiagnose.tar.gz', files)
+    archive.extract(archive_file, str(tmp_path / 'first'), store=store)
+    exists = os.path.exists
+
+    def stored_meanwhile(path):
+        # store/<2 first chars>/<sha256>_<mtime>_<mode> not found yet
+        return len(os.path.basename(os.path.dirname(path))) != 2 and exists(path)
+    monkeypatch.setattr(os.path, 'exists', stored_meanwhile)
+    extracted = archive.extract(archive_file, str(tmp_path / 'second'), store=store)
+    monkeypatch.undo()
+    assert extracted['deduplicated'] == sum(len(data) for data in files.values())
+    ps = 'sysdiagnose_X/ps.txt'
+    assert os.path.samefile(tmp_path / 'first' / ps, tmp_path / 'second' / ps)
+    # no temporary file left in the store
+    assert all(len(name) == 2 for name in os.listdir(store))
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
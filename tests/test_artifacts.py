@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/artifacts.py: the artifact index finds what the globs of
+# initialyze.py found, from a folder or from the members of an archive
+
+import os
+import glob
+import tarfile
+
+import pytest
+
+from utils import artifacts
+
+paths = [
+    'sysdiagnose.log',
+    'ps.txt',
+    'taskinfo.txt',
+    'brctl/brctl-dump.txt',
+    'logs/powerlogs/powerlog_2023-02-23_10-44_B3A5E51F.PLSQL',
+    'logs/powerlogs/powerlog_2023-02-22_08-01_0E6C4E2A.PLSQL',
+    'logs/SystemVersion/SystemVersion.plist',
+    'logs/Accessibility/TCC.db',
+    'logs/itunesstored/downloads.28.sqlitedb',
+    'system_logs.logarchive/Extra/shutdown.log',
+    'WiFi/com.apple.wifi.known-networks.plist',
+    'WiFi/com.apple.wifi-private-mac-networks.plist',
+    'WiFi/wifi_scan_2023.txt',
+    'WiFi/security.txt',
+    'crashes_and_spins/backboardd-2023-02-23.ips',
+    'crashes_and_spins/.hidden.ips',
+    'crashes_and_spins/sub/nested.ips',
+    'logs/MobileActivation/mobileactivationd.log',
+    'logs/MobileActivation/mobileactivationd.log.1',
+    'logs/MobileInstallation/notes.txt',
+]
+
+
+@pytest.fixture
+def sysdiagnose(tmp_path):
+    root = tmp_path / 'extracted'
+    for path in paths:
+        target = root / 'sysdiagnose_2023.02.23_iPhone_20D47' / path
+        os.makedirs(target.parent, exist_ok=True)
+        target.write_bytes(b'')
+    return str(root)
+
+
+def globbed(folder):
+    # what the globs of initialyze.py found, relative to folder
+    found = {}
+    for name, pattern, multiple in artifacts.artifacts:
+        matches = sorted(os.path.relpath(path, folder) + ('/' if pattern.endswith('/') else '')
+                         for path in glob.glob(os.path.join(folder, '*', pattern)))
+        if multiple:
+            found.setdefault(name, []).extend(matches)
+        elif matches and name not in found:
+            found[name] = matches[0]
+    return found
+
+
+def test_match_folder(sysdiagnose):
+    found = artifacts.ArtifactIndex.from_folder(sysdiagnose).match()
+    assert found == globbed(sysdiagnose)
+    assert found['powerlogs'].endswith('powerlog_2023-02-22_08-01_0E6C4E2A.PLSQL')
+    assert len(found['ips_files']) == 1
+    assert 'appinstallation' not in found
+
+
+def test_match_members(sysdiagnose, tmp_path):
+    # archives do not always list the parent folders of their files
+    archive_file = str(tmp_path / 'sysdiagnose.tar')
+    with tarfile.open(archive_file, 'w') as tf:
+        for path in paths:
+            tf.add(os.path.join(sysdiagnose, 'sysdiagnose_2023.02.23_iPhone_20D47', path),
+                   './sysdiagnose_2023.02.23_iPhone_20D47/' + path, recursive=False)
+    with tarfile.open(archive_file) as tf:
+        members = tf.getmembers()
+    assert artifacts.ArtifactIndex.from_members(members).match() == globbed(sysdiagnose)
+
+
+def test_selector(sysdiagnose):
+    found = artifacts.ArtifactIndex.from_folder(sysdiagnose).match()
+    select = artifacts.selector(['wifi_data', 'brctl'])
+    for path in found['wifi_data'] + [found['brctl'] + 'brctl-dump.txt']:
+        assert select(path.rstrip('/'))
+    assert not select(found['ps'])
+    assert not select('sysdiagnose_2023.02.23_iPhone_20D47/WiFi/sub/other.plist')
+    assert artifacts.selector()(found['powerlogs'])
+    assert not artifacts.selector([])(found['ps'])
+
+
+def test_normalize():
+    assert artifacts.normalize('./sysdiagnose_X/ps.txt') == 'sysdiagnose_X/ps.txt'
+    assert artifacts.normalize('/sysdiagnose_X/brctl/') == 'sysdiagnose_X/brctl'
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
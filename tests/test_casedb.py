@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/casedb.py: parser outputs loaded in case.db, replaced when
+# a parser runs again
+
+import sqlite3
+
+import pytest
+
+import config
+from utils import casedb
+from utils import parsed_data
+
+ps = {
+    "1": {"PID": '1', "PPID": '0', "USER": 'root', "COMMAND": 'launchd'},
+    "55": {"PID": '55', "PPID": '1', "USER": 'mobile', "COMMAND": 'backboardd'},
+}
+
+events = [
+    {"timestamp": '2023-02-23 10:44:02', "processID": 55, "eventMessage": 'first'},
+    {"timestamp": '2023-02-23 10:44:03', "processID": 1, "eventMessage": 'second'},
+    {"timestamp": '2023-02-23 10:44:04', "processID": 55, "eventMessage": 'third'},
+]
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'compression', None)
+    monkeypatch.setattr(config, 'columnar_output', None)
+    return str(tmp_path)
+
+
+def test_update(folder, monkeypatch):
+    output_file = parsed_data.write(ps, folder + '/sysdiagnose-ps')
+    assert casedb.update(folder, 'sysdiagnose-ps', output_file) == 2
+    # a run again replaces the rows of the parser
+    monkeypatch.setattr(casedb, 'batch_size', 1)
+    assert casedb.update(folder, 'sysdiagnose-ps', output_file) == 2
+    db = casedb.connect(folder)
+    rows = db.execute("SELECT pid, ppid, command FROM processes WHERE source = 'sysdiagnose-ps' ORDER BY pid").fetchall()
+    assert [tuple(row) for row in rows] == [(1, 0, 'launchd'), (55, 1, 'backboardd')]
+    assert db.execute("SELECT rows FROM sources WHERE name = 'sysdiagnose-ps'").fetchone()[0] == 2
+    db.close()
+    assert casedb.update(folder, 'sysdiagnose-unknown', output_file) is None
+
+
+def test_load_output(folder, monkeypatch, capsys):
+    output_file = parsed_data.write(ps, folder + '/sysdiagnose-ps')
+    monkeypatch.setattr(config, 'case_database', False)
+    assert casedb.load_output(folder, 'sysdiagnose-ps', output_file) is None
+    monkeypatch.setattr(config, 'case_database', True)
+    assert casedb.load_output(folder, 'sysdiagnose-ps', output_file) == 2
+
+    # another writer holding the lock: the load gives up after case_database_timeout, with a warning
+    monkeypatch.setattr(config, 'case_database_timeout', 0.1)
+    db = sqlite3.connect(folder + '/' + casedb.database_file, isolation_level=None)
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        assert casedb.load_output(folder, 'sysdiagnose-ps', output_file) is None
+    finally:
+        db.execute("ROLLBACK")
+        db.close()
+    assert capsys.readouterr().err.startswith('WARNING: sysdiagnose-ps output not loaded in case.db')
+
+
+def test_read_records(folder):
+    output_file = parsed_data.write((event for event in events), folder + '/sysdiagnose-logarchive')
+    assert casedb.update(folder, 'sysdiagnose-logarchive', output_file) == 3
+    db = casedb.connect(folder)
+    positions = [row['record'] for row in db.execute("SELECT record FROM log_events WHERE pid = 55")]
+    db.close()
+    assert list(casedb.read_records(output_file, positions)) == [(0, events[0]), (2, events[2])]
+    assert list(casedb.read_records(output_file, [])) == []
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
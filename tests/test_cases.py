@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/cases.py: case IDs are allocated once, even by concurrent ingests
+
+import json
+import sqlite3
+import multiprocessing
+
+from utils import cases
+
+
+def add(path, sha256):
+    db = cases.connect(path)
+    db.execute("BEGIN IMMEDIATE")
+    case_id = cases.add_case(db, sha256 + '.tar.gz', sha256)
+    db.execute("COMMIT")
+    db.close()
+    return case_id
+
+
+def test_add_find(workspace):
+    db = cases.connect()
+    db.execute("BEGIN IMMEDIATE")
+    first = cases.add_case(db, 'a.tar.gz', 'aaaa', digests={"md5": 'bbbb'})
+    folder = cases.add_case(db, '/cases/sysdiagnose_X', None, tree_hash='cccc')
+    db.execute("COMMIT")
+    assert (first, folder) == (1, 2)
+    assert cases.find_by_sha256(db, 'aaaa')['digests'] == {"md5": 'bbbb'}
+    assert cases.find_by_tree_hash(db, 'cccc')['case_id'] == folder
+    assert cases.find_by_sha256(db, 'dddd') is None
+    assert cases.get_case(db, '2')['source_sha256'] is None
+    assert [case['case_id'] for case in cases.list_cases(db)] == [1, 2]
+
+
+def test_ids_not_reused(workspace):
+    first = add('cases.db', 'aaaa')
+    last = add('cases.db', 'bbbb')
+    db = cases.connect()
+    db.execute("DELETE FROM cases WHERE case_id = ?", (last,))
+    db.close()
+    assert add('cases.db', 'cccc') == last + 1
+    assert first == 1
+
+
+def test_concurrent_ids(workspace):
+    with multiprocessing.Pool(4) as pool:
+        ids = pool.starmap(add, [('cases.db', f'{i:04}') for i in range(20)])
+    assert sorted(ids) == list(range(1, 21))
+
+
+def test_import_cases_file(workspace):
+    legacy = {"cases": [{"case_id": 4, "source_file": 'a.tar.gz', "source_sha256": 'aaaa', "case_file": './data/4.json'}]}
+    with open('cases.json', 'w') as f:
+        json.dump(legacy, f)
+    db = cases.connect()
+    assert cases.get_case(db, 4)['source_sha256'] == 'aaaa'
+    db.close()
+    assert add('cases.db', 'bbbb') == 5
+
+
+def test_upgrade(workspace):
+    # registry of an older version: no tree_hash, IDs reused
+    db = sqlite3.connect('cases.db')
+    db.execute("CREATE TABLE cases (case_id INTEGER PRIMARY KEY, source_file TEXT NOT NULL, "
+               "source_sha256 TEXT NOT NULL, case_file TEXT NOT NULL)")
+    db.execute("INSERT INTO cases VALUES (3, '/cases/sysdiagnose_X', 'cccc', './data/3.json')")
+    db.execute("INSERT INTO cases VALUES (7, 'a.tar.gz', 'aaaa', './data/7.json')")
+    db.commit()
+    db.close()
+    with open('data/3.json', 'w') as f:
+        json.dump({"extraction": 'folder'}, f)
+
+    db = cases.connect()
+    assert cases.find_by_tree_hash(db, 'cccc')['case_id'] == 3
+    assert cases.get_case(db, 3)['source_sha256'] is None
+    assert cases.find_by_sha256(db, 'aaaa')['case_id'] == 7
+    db.close()
+    assert add('cases.db', 'bbbb') == 8
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
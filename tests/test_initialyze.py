@@ -0,0 +1,56 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of initialyze.py: cases created from archives and folders
+
+import os
+import stat
+
+import initialyze
+from test_archive import files, make_archive
+
+
+def ingest(archive_file, force=False, **options):
+    return initialyze.register(initialyze.stage(archive_file, **options), force)
+
+
+def test_case_folder_permissions(workspace):
+    umask = os.umask(0o027)
+    try:
+        case_id = ingest(make_archive(workspace / 'sysdiagnose.tar.gz', files))
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(f'data/{case_id}').st_mode) == 0o750
+
+def test_force_replaces_indexes(workspace):
+    archive_file = make_archive(workspace / 'sysdiagnose.tar.gz', files)
+    case_id = ingest(archive_file, extract=False)
+    assert os.path.exists(f'data/{case_id}.members.json')
+    assert os.path.exists(f'data/{case_id}.gzidx')
+    # the case is replaced by a full extraction, without indexes
+    assert ingest(archive_file, force=True) == case_id
+    assert not os.path.exists(f'data/{case_id}.members.json')
+    assert not os.path.exists(f'data/{case_id}.gzidx')
+    assert sorted(os.listdir('data')) == [str(case_id), f'{case_id}.digests.json', f'{case_id}.json']
+
+def test_folder(workspace, capsys):
+    folder = workspace / 'cases' / 'sysdiagnose_X'
+    for name, data in files.items():
+        os.makedirs(workspace / 'cases' / os.path.dirname(name), exist_ok=True)
+        (workspace / 'cases' / name).write_bytes(data)
+    case_id = initialyze.register(initialyze.stage_folder(str(folder)))
+    # registered from the tree hash only, without reading the files
+    assert not os.path.exists(f'data/{case_id}.digests.json')
+    initialyze.verify(case_id)
+    assert 'unchanged since it was registered' in capsys.readouterr().out
+    (folder / 'ps.txt').write_bytes(b'modified')
+    initialyze.verify(case_id)
+    assert 'changed since it was registered' in capsys.readouterr().out
+
+    case_id = initialyze.register(initialyze.stage_folder(str(folder), digests=True), force=True)
+    assert os.path.exists(f'data/{case_id}.digests.json')
+    initialyze.verify(case_id)
+    assert capsys.readouterr().out.endswith('3/3 files verified\n')
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/parsed_data.py: parser outputs read back as written,
+# whatever the compression or the columnar output
+
+import os
+
+import pytest
+
+import config
+from utils import columnar
+from utils import parsed_data
+
+result = {
+    "data": [
+        {"pid": 1, "command": 'launchd', "ratio": 0.5},
+        {"pid": 55, "command": 'backboardd', "ratio": None},
+    ],
+    "version": '16.3',
+}
+
+
+@pytest.fixture(params=[None, 'gzip', 'zstd'])
+def compression(request, monkeypatch):
+    if request.param == 'zstd':
+        pytest.importorskip('zstandard')
+    monkeypatch.setattr(config, 'compression', request.param)
+    monkeypatch.setattr(config, 'columnar_output', None)
+    return request.param
+
+
+def suffix(compression):
+    return parsed_data.compressions[compression] if compression else ''
+
+
+def test_write_load(compression, tmp_path):
+    output_file = parsed_data.write(result, str(tmp_path / 'sysdiagnose-ps'))
+    assert output_file.endswith(suffix(compression))
+    assert parsed_data.name_of(output_file) == 'sysdiagnose-ps'
+    assert parsed_data.load(output_file) == result
+    assert list(parsed_data.records(output_file, 'data')) == result['data']
+    assert parsed_data.columns(output_file, ['pid'], 'data') == {"pid": [1, 55]}
+
+
+def test_write_stream(compression, tmp_path):
+    output_file = parsed_data.write((record for record in result['data']), str(tmp_path / 'sysdiagnose-logarchive'))
+    assert output_file.endswith('.jsonl' + suffix(compression))
+    assert parsed_data.is_stream_file(output_file)
+    assert list(parsed_data.records(output_file)) == result['data']
+    assert not os.path.exists(output_file + '.tmp')
+
+
+def test_previous_output_removed(compression, tmp_path, monkeypatch):
+    # the output of a previous run with another compression does not stay
+    base = str(tmp_path / 'sysdiagnose-ps')
+    monkeypatch.setattr(config, 'compression', 'gzip' if compression is None else None)
+    parsed_data.write(result, base)
+    monkeypatch.setattr(config, 'compression', compression)
+    output_file = parsed_data.write(result, base)
+    assert os.listdir(str(tmp_path)) == [os.path.basename(output_file)]
+    assert parsed_data.output_file(str(tmp_path), 'sysdiagnose-ps') == output_file
+
+
+def test_failing_stream(compression, tmp_path):
+    # a parser failing in the middle of its stream leaves no output
+    def failing():
+        yield result['data'][0]
+        raise RuntimeError('parser failed')
+
+    with pytest.raises(RuntimeError):
+        parsed_data.write(failing(), str(tmp_path / 'sysdiagnose-logarchive'))
+    assert os.listdir(str(tmp_path)) == []
+
+
+@pytest.fixture(params=['arrow', 'parquet'])
+def columnar_output(request, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(config, 'compression', None)
+    monkeypatch.setattr(config, 'columnar_output', request.param)
+    return request.param
+
+
+keyed = {
+    "1": {"PID": 1, "USER": 'root', "COMMAND": 'launchd', "FLAGS": []},
+    "55": {"PID": 55, "USER": 'mobile', "COMMAND": 'backboardd', "FLAGS": ['a', 'b']},
+}
+
+tables = {
+    "ZPROCESS": [{"Z_PK": 1, "ZNAME": 'launchd', "ZINFO": {"uid": 0}}],
+    "ZEVENT": [{"Z_PK": 1, "ZTIME": 1677145442.5}, {"Z_PK": 2, "ZTIME": 12}],
+}
+
+
+@pytest.mark.parametrize('data, schema', [
+    (result, {"layout": 'records', "key": 'data', "columns": {"pid": 'int64'}}),
+    (result['data'], {"layout": 'records'}),
+    (keyed, {"layout": 'keyed', "columns": {"PID": 'int64', "USER": 'string'}}),
+    (tables, {"layout": 'tables'}),
+])
+def test_columnar(columnar_output, tmp_path, data, schema):
+    output_file = parsed_data.write(data, str(tmp_path / 'sysdiagnose-ps'), schema)
+    assert output_file.endswith('.columns')
+    assert parsed_data.output_file(str(tmp_path), 'sysdiagnose-ps') == output_file
+    assert parsed_data.load(output_file) == data
+    if schema['layout'] == 'tables':
+        assert list(parsed_data.records(output_file, 'ZEVENT')) == tables['ZEVENT']
+        assert parsed_data.columns(output_file, ['ZTIME'], 'ZEVENT') == {"ZTIME": [1677145442.5, 12]}
+    elif schema['layout'] == 'records':
+        assert list(parsed_data.records(output_file)) == result['data']
+        assert parsed_data.columns(output_file, ['pid', 'ratio']) == {"pid": [1, 55], "ratio": [0.5, None]}
+
+
+def test_columnar_stream(columnar_output, tmp_path):
+    # fields not in the schema are kept too
+    schema = {"layout": 'records', "columns": {"pid": 'int64', "command": 'string'}}
+    output_file = parsed_data.write((record for record in result['data']), str(tmp_path / 'sysdiagnose-logarchive'), schema)
+    assert output_file.endswith('.columns')
+    assert list(parsed_data.records(output_file)) == result['data']
+    assert parsed_data.columns(output_file, ['command', 'ratio']) == {"command": ['launchd', 'backboardd'], "ratio": [0.5, None]}
+
+
+def test_columnar_fallback(tmp_path, monkeypatch):
+    # not a table, or no pyarrow: written as JSON
+    monkeypatch.setattr(config, 'compression', None)
+    monkeypatch.setattr(config, 'columnar_output', 'arrow')
+    schema = {"layout": 'keyed'}
+    if columnar.available():
+        output_file = parsed_data.write({"a": 1}, str(tmp_path / 'sysdiagnose-ps'), schema)
+        assert not output_file.endswith('.columns')
+        assert parsed_data.load(output_file) == {"a": 1}
+    monkeypatch.setattr(columnar, '_pyarrow', lambda: None)
+    output_file = parsed_data.write(keyed, str(tmp_path / 'sysdiagnose-ps'), schema)
+    assert not output_file.endswith('.columns')
+    assert parsed_data.load(output_file) == keyed
+    assert os.listdir(str(tmp_path)) == [os.path.basename(output_file)]
+
+
+def test_unknown_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'compression', 'bzip2')
+    with pytest.raises(ValueError):
+        parsed_data.write(result, str(tmp_path / 'sysdiagnose-ps'))
+    monkeypatch.setattr(config, 'compression', None)
+    monkeypatch.setattr(config, 'columnar_output', 'csv')
+    with pytest.raises(ValueError):
+        parsed_data.check_settings()
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
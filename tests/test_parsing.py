@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of parsing.py: parser inputs left in the archive
+
+import os
+import json
+import multiprocessing
+
+import pytest
+
+import config
+import parsing
+from utils import archive
+from test_archive import files, make_archive
+from test_initialyze import ingest
+
+
+def load_case(case_id):
+    with open(config.data_folder + str(case_id) + '.json', 'r') as f:
+        return json.load(f)
+
+
+def test_extract_pending(workspace, monkeypatch):
+    case_id = ingest(make_archive(workspace / 'sysdiagnose.tar.gz', files), names={'sysdiagnose.log', 'ps'})
+    case = load_case(case_id)
+    assert 'wifi_data' in case['pending']
+    wifi = case['wifi_data'][0]
+    assert not os.path.exists(wifi)
+
+    # parsers sharing an input extract it once, whatever the number asking at once
+    calls = str(workspace / 'calls')
+    extract = archive.ArchiveReader.extract
+
+    def counting(self, paths, destination, chunk_size=None):
+        with open(calls, 'a') as f:
+            f.write('extract\n')
+        extract(self, paths, destination, chunk_size)
+    monkeypatch.setattr(archive.ArchiveReader, 'extract', counting)
+
+    processes = [multiprocessing.Process(target=parsing.extract_pending, args=(case_id, case, 'wifi_data'))
+                 for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    with open(calls, 'r') as f:
+        assert f.read() == 'extract\n'
+    with open(wifi, 'rb') as f:
+        assert f.read() == files['sysdiagnose_X/WiFi/com.apple.wifi.known-networks.plist']
+    # no temporary file left next to the artifact
+    assert os.listdir(os.path.dirname(wifi)) == [os.path.basename(wifi)]
+
+    parsing.extract_pending(case_id, case, 'wifi_data')
+    with open(calls, 'r') as f:
+        assert f.read() == 'extract\n'
+
+
+def test_up_to_date(workspace, monkeypatch):
+    monkeypatch.setattr(config, 'parsers_folder', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'parsers', ''))
+    case_id = ingest(make_archive(workspace / 'sysdiagnose.tar.gz', files))
+    case = load_case(case_id)
+    parsing.run_parser('sysdiagnose-ps', case_id)
+    assert parsing.is_up_to_date('sysdiagnose-ps', case_id, case)
+    # written with other settings, the output is run again
+    monkeypatch.setattr(config, 'compression', 'gzip')
+    assert not parsing.is_up_to_date('sysdiagnose-ps', case_id, case)
+    parsing.run_parser('sysdiagnose-ps', case_id)
+    assert parsing.is_up_to_date('sysdiagnose-ps', case_id, case)
+    monkeypatch.setattr(config, 'serializer', 'msgpack')
+    assert not parsing.is_up_to_date('sysdiagnose-ps', case_id, case)
+
+
+def test_run_options():
+    assert parsing.run_options({"--workers": '4', "--timeout": None}) == (4, None)
+    assert parsing.run_options({"--workers": None, "--timeout": '60'}) == (None, 60)
+
+
+@pytest.mark.parametrize('option', ['--workers', '--timeout'])
+@pytest.mark.parametrize('value', ['0', '-1', 'four', ''])
+def test_run_options_invalid(option, value, capsys):
+    arguments = {"--workers": None, "--timeout": None}
+    arguments[option] = value
+    with pytest.raises(SystemExit):
+        parsing.run_options(arguments)
+    assert capsys.readouterr().err.startswith(f'{option} should be ... a number ...')
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
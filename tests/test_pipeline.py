@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of pipeline.py: steps run in the order of their dependencies
+
+import time
+
+import pytest
+
+import config
+import parsing
+import pipeline
+from utils import casedb
+from utils import plugins
+
+parsers = {
+    "sysdiagnose-ps": {"parser_call": 'parse_ps', "parser_input": 'ps'},
+    "sysdiagnose-wifi": {"parser_call": 'parse_wifi', "parser_input": 'wifi_data'},
+    "sysdiagnose-powerlogs": {"parser_call": 'parse_powerlogs', "parser_input": 'powerlogs'},
+}
+
+analysers = {
+    "ps-tree": {"analyser_call": 'tree', "analyser_input": ['sysdiagnose-ps']},
+    "wifi-map": {"analyser_call": 'map', "analyser_input": ['sysdiagnose-wifi', 'sysdiagnose-unknown']},
+    "summary": {"analyser_call": 'summary'},
+    "report": {"analyser_call": 'report', "analyser_input": ['ps-tree', 'summary']},
+}
+
+case = {"ps": 'data/1/ps.txt', "wifi_data": ['data/1/WiFi/a.plist']}
+
+
+@pytest.fixture
+def plugin_list(monkeypatch):
+    def list_plugins(folder, call):
+        return parsers if folder == config.parsers_folder else analysers
+    monkeypatch.setattr(plugins, 'list_plugins', list_plugins)
+
+
+def test_build_graph(plugin_list):
+    steps = pipeline.build_graph(case)
+    # no powerlogs in the case
+    assert 'sysdiagnose-powerlogs' not in steps
+    assert steps['sysdiagnose-ps'] == {"kind": 'parser', "depends": set()}
+    assert steps['ps-tree']['depends'] == {'sysdiagnose-ps'}
+    # unknown dependencies are ignored, analysers without input need all the parsers
+    assert steps['wifi-map']['depends'] == {'sysdiagnose-wifi'}
+    assert steps['summary']['depends'] == {'sysdiagnose-ps', 'sysdiagnose-wifi'}
+    assert steps['report']['depends'] == {'ps-tree', 'summary'}
+
+
+def test_cycles(plugin_list, monkeypatch):
+    pipeline.check_cycles({"a": {"depends": set()}, "b": {"depends": {'a'}}})
+    monkeypatch.setitem(analysers, 'summary', {"analyser_call": 'summary', "analyser_input": ['report']})
+    with pytest.raises(ValueError, match='ps-tree|report|summary'):
+        pipeline.build_graph(case)
+
+
+def step(name, log):
+    with open(log, 'a') as f:
+        f.write(f'start {name}\n')
+    time.sleep(0.1)
+    with open(log, 'a') as f:
+        f.write(f'end {name}\n')
+    return log
+
+
+def test_run_order(plugin_list, tmp_path, monkeypatch):
+    log = str(tmp_path / 'log')
+    monkeypatch.setattr(parsing, 'load_case', lambda case_id: case)
+    monkeypatch.setattr(parsing, 'is_up_to_date', lambda parser, case_id, case: parser == 'sysdiagnose-wifi')
+    monkeypatch.setattr(casedb, 'load_output', lambda folder, name, output_file: None)
+    monkeypatch.setattr(pipeline.parsed_data, 'size', lambda output_file: 0)
+    monkeypatch.setattr(pipeline, 'make_task', lambda name, step_, case_id: pipeline.scheduler.Task(name, step, (name, log)))
+
+    pipeline.run('1', workers=4, timeout=60)
+    with open(log, 'r') as f:
+        events = f.read().splitlines()
+    # up to date parsers are not run again
+    assert 'start sysdiagnose-wifi' not in events
+    for name, step_ in pipeline.build_graph(case).items():
+        if name == 'sysdiagnose-wifi':
+            continue
+        for depend in step_['depends'] - {'sysdiagnose-wifi'}:
+            assert events.index(f'end {depend}') < events.index(f'start {name}')
+    assert len(events) == 2 * 5
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
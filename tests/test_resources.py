@@ -0,0 +1,48 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/resources.py: runs are measured, and still run where the
+# Unix modules (fcntl, resource) are missing
+
+import os
+import sys
+import subprocess
+
+from utils import resources
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_record(tmp_path):
+    with resources.Meter() as meter:
+        data = bytearray(8 * 1024 * 1024)
+    resources.record(str(tmp_path), 'sysdiagnose-ps', resources.entry('parser', meter, 'ok', 10, records=len(data)))
+    run = resources.read(str(tmp_path))['sysdiagnose-ps']
+    assert run['status'] == 'ok' and run['records'] == len(data)
+    assert run['wall_time'] >= 0 and run['cpu_time'] >= 0
+    if meter.start_rss is not None:
+        assert run['peak_rss'] >= run['start_rss']
+
+
+def test_without_unix_modules(tmp_path):
+    # as on Windows: importing a module missing from sys.modules raises ImportError
+    code = f"""
+import sys
+sys.modules['fcntl'] = None
+sys.modules['resource'] = None
+import parsing
+from utils import resources
+with resources.Meter() as meter:
+    pass
+resources.record({str(tmp_path)!r}, 'sysdiagnose-ps', resources.entry('parser', meter, 'ok', 10))
+resources.limit_memory(100)
+print(meter.peak_rss, resources.out_of_memory(meter))
+"""
+    process = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout == 'None out of memory (unknown limit)\n'
+    assert process.stderr.startswith('WARNING: cannot limit memory to 100 MB')
+    assert resources.read(str(tmp_path))['sysdiagnose-ps']['status'] == 'ok'
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
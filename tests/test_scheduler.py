@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/scheduler.py: tasks are isolated in worker processes,
+# persistent workers are reused and replaced when they die
+
+import os
+import time
+
+import pytest
+
+from utils import scheduler
+
+initialized = False
+
+
+def initializer():
+    global initialized
+    initialized = True
+
+
+def pid():
+    return os.getpid()
+
+
+def is_initialized():
+    return initialized
+
+
+def fail():
+    raise RuntimeError('parser failed')
+
+
+def crash():
+    os._exit(3)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+def allocate(megabytes):
+    return len(bytearray(megabytes * 1024 * 1024))
+
+
+@pytest.fixture
+def pool():
+    pool = []
+    yield pool
+    for worker in pool:
+        worker.stop()
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+def test_status(persistent):
+    tasks = [scheduler.Task('ok', pid), scheduler.Task('error', fail), scheduler.Task('crash', crash)]
+    done = {task.name: task for task in scheduler.run(tasks, 2, persistent=persistent)}
+    assert done['ok'].status == 'ok'
+    assert done['ok'].result != os.getpid()
+    assert done['error'].status == 'error'
+    assert done['error'].error.startswith('RuntimeError: parser failed')
+    assert done['crash'].status == 'crashed'
+    assert 'exited with code 3' in done['crash'].error
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+def test_timeout(persistent):
+    start = time.monotonic()
+    [task] = scheduler.run([scheduler.Task('sleep', sleep, (30,))], 1, 0.5, persistent=persistent)
+    assert task.status == 'timeout'
+    assert time.monotonic() - start < 10
+    assert not task.process.is_alive()
+
+
+def test_memory_limit():
+    [task] = scheduler.run([scheduler.Task('allocate', allocate, (1024,))], 1, memory_limit=256)
+    assert task.status == 'out of memory'
+
+
+def test_on_done():
+    def on_done(task):
+        if task.name == 'first':
+            return [scheduler.Task('second', pid)]
+
+    done = scheduler.run([scheduler.Task('first', pid)], 1, on_done=on_done)
+    assert [task.name for task in done] == ['first', 'second']
+
+
+def test_pool_reuse(pool):
+    [first] = scheduler.run([scheduler.Task('first', pid)], 1, pool=pool)
+    # a task failing does not lose the worker
+    second, error, third = scheduler.run([scheduler.Task('second', pid), scheduler.Task('error', fail),
+                                          scheduler.Task('third', pid)], 1, pool=pool)
+    assert first.result == second.result == third.result
+    assert error.status == 'error'
+    assert len(pool) == 1
+
+
+def test_crashed_worker_replaced(pool):
+    done = scheduler.run([scheduler.Task('crash', crash), scheduler.Task('pid', pid)], 1, pool=pool,
+                         initializer=initializer)
+    assert [task.status for task in done] == ['crashed', 'ok']
+    # replacements are initialized too
+    [task] = scheduler.run([scheduler.Task('initialized', is_initialized)], 1, pool=pool)
+    assert task.result is True
+
+
+def test_timed_out_worker_replaced(pool):
+    [task] = scheduler.run([scheduler.Task('sleep', sleep, (30,))], 1, 0.5, pool=pool)
+    assert task.status == 'timeout'
+    assert pool == []
+    [task] = scheduler.run([scheduler.Task('pid', pid)], 1, pool=pool)
+    assert task.status == 'ok'
+
+
+def test_dead_idle_worker(pool):
+    [first] = scheduler.run([scheduler.Task('first', pid)], 1, pool=pool)
+    # killed while waiting for the next task (OOM killer...)
+    pool[0].process.kill()
+    pool[0].process.join()
+    [second] = scheduler.run([scheduler.Task('second', pid)], 1, pool=pool)
+    assert second.status == 'ok'
+    assert second.result != first.result
+    assert len(pool) == 1
+
+
+def test_worker_dying_before_submit(pool, monkeypatch):
+    [first] = scheduler.run([scheduler.Task('first', pid)], 1, pool=pool)
+    worker = pool[0]
+    worker.process.kill()
+    worker.process.join()
+    # died between the check and the task being sent
+    monkeypatch.setattr(worker.process, 'is_alive', lambda: True)
+    [second] = scheduler.run([scheduler.Task('second', pid)], 1, pool=pool)
+    assert second.status == 'ok'
+    assert second.result != first.result
+    assert worker not in pool
+
+def test_no_worker():
+    with pytest.raises(ValueError):
+        scheduler.run([scheduler.Task('pid', pid)], 0)
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Tests of utils/serialization.py: every backend gives the same data back
+
+import math
+
+import pytest
+
+import config
+from utils import serialization
+
+backends = ['json', 'orjson', 'msgpack']
+
+document = {
+    "name": 'backboardd',
+    "values": [1, 2.5, None, True, 'é', (3, 4)],
+    "nested": {"pid": 55, "ratio": float('nan')},
+    1: 'integer key',
+    None: 'null key',
+    "limits": [float('inf'), -float('inf')],
+}
+
+expected = {
+    "name": 'backboardd',
+    "values": [1, 2.5, None, True, 'é', [3, 4]],
+    "nested": {"pid": 55, "ratio": None},
+    "1": 'integer key',
+    "null": 'null key',
+    "limits": [None, None],
+}
+
+
+@pytest.fixture(params=backends)
+def backend(request, monkeypatch):
+    if request.param != 'json' and serialization._import(request.param) is None:
+        pytest.skip(f'{request.param} is not installed')
+    monkeypatch.setattr(config, 'serializer', request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_round_trip(backend, compact):
+    data = serialization.encode(document, compact)
+    assert serialization.decode(data, serialization.extension()) == expected
+
+
+def test_dump_load(backend, tmp_path):
+    path = str(tmp_path / ('document' + serialization.extension()))
+    serialization.dump(document, path)
+    assert serialization.load(path) == expected
+
+
+def test_big_integers(backend):
+    # above 64 bits: orjson falls back on the standard library
+    if backend == 'msgpack':
+        pytest.skip('MessagePack integers are 64 bits')
+    document = {"big": 2 ** 70, "ratio": float('nan')}
+    data = serialization.encode(document)
+    assert serialization.decode(data, '.json') == {"big": 2 ** 70, "ratio": None}
+
+
+def test_stream_lines(backend):
+    # lines of .jsonl streams are JSON whatever the backend
+    line = serialization.dumps(document, compact=True)
+    assert '\n' not in line
+    assert serialization.loads(line) == expected
+
+
+def test_loads_non_finite():
+    # documents written with NaN before they were normalized are still read
+    assert math.isnan(serialization.loads('{"ratio": NaN}')['ratio'])
+    assert serialization.loads(b'[Infinity]') == [float('inf')]
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setattr(config, 'serializer', 'pickle')
+    with pytest.raises(ValueError):
+        serialization.backend()
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
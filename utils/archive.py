@@ -0,0 +1,617 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Helpers to read sysdiagnose archives in a single streaming pass
+
+import os
+import sys
+import bz2
+import gzip
+import lzma
+import time
+import shutil
+import queue
+import hashlib
+import tempfile
+import threading
+import concurrent.futures
+import plistlib
+import tarfile
+
+import config
+from utils import artifacts
+
+
+class MultiHasher:
+    """
+        Compute several digests of the same stream in a single pass.
+        Each hasher runs in its own thread (hashlib releases the GIL on large
+        buffers) and is fed through a bounded queue, so hashing keeps up with
+        the disk and memory stays bounded.
+    """
+
+    def __init__(self, algorithms, queue_size=4):
+        self.hashers = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+        self.queues = []
+        self.threads = []
+        for hasher in self.hashers.values():
+            chunks = queue.Queue(maxsize=queue_size)
+            thread = threading.Thread(target=self._run, args=(hasher, chunks), daemon=True)
+            thread.start()
+            self.queues.append(chunks)
+            self.threads.append(thread)
+
+    @staticmethod
+    def _run(hasher, chunks):
+        while True:
+            data = chunks.get()
+            if data is None:
+                break
+            hasher.update(data)
+
+    def update(self, data):
+        for chunks in self.queues:
+            chunks.put(data)
+
+    def close(self):
+        """
+            Stop the hashing threads once they have consumed all the data
+        """
+        for chunks in self.queues:
+            chunks.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.queues = []
+        self.threads = []
+
+    def hexdigests(self):
+        self.close()
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()}
+
+
+class HashingReader:
+    """
+        File-like wrapper feeding every chunk read from fileobj to a hasher.
+        Lets tarfile decompress the archive while the digest is computed on
+        the very same compressed bytes, so the file is only read once.
+        Bytes are hashed once and in order whatever the seeks of the reader
+        (indexed_gzip reads some blocks again): bytes_read is the position up
+        to which the file is hashed.
+    """
+
+    def __init__(self, fileobj, hasher, chunk_size=None):
+        self.fileobj = fileobj
+        self.hasher = hasher
+        self.chunk_size = chunk_size or config.ingest_chunk_size
+        self.bytes_read = 0
+        self.position = 0
+
+    def read(self, size=-1):
+        start = self.position
+        data = self.fileobj.read(size)
+        self.position += len(data)
+        if self.position > self.bytes_read:
+            self.hasher.update(data[self.bytes_read - start:])
+            self.bytes_read = self.position
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        position = self.fileobj.seek(offset, whence)
+        if position > self.bytes_read:
+            # the bytes skipped are hashed first
+            self.fileobj.seek(self.bytes_read)
+            while self.bytes_read < position:
+                data = self.fileobj.read(min(self.chunk_size, position - self.bytes_read))
+                if not data:
+                    break
+                self.hasher.update(data)
+                self.bytes_read += len(data)
+            self.fileobj.seek(position)
+        self.position = position
+        return position
+
+    def drain(self, chunk_size):
+        """
+            Consume what tarfile left unread (end of archive padding, gzip trailer)
+            so the digest covers the whole file.
+        """
+        while self.read(chunk_size):
+            pass
+
+
+def _indexed_gzip(fileobj):
+    # fileobj decompressed by indexed_gzip if it is a gzip file and the module
+    # is installed, saving seek points as it goes, None otherwise
+    magic = fileobj.read(2)
+    fileobj.seek(0)
+    if magic != b'\x1f\x8b':
+        return None
+    try:
+        import indexed_gzip
+    except ImportError:
+        return None
+    return indexed_gzip.IndexedGzipFile(fileobj=fileobj, spacing=config.gzip_index_spacing)
+
+
+def extract(archive_file, destination, select=None, capture=None, store=None, chunk_size=None, algorithms=None,
+            gzip_index=None, file_digest=None):
+    """
+        Hash (with all the configured digests) and extract archive_file into
+        destination in one chunked read.
+        Memory usage is bounded by chunk_size whatever the archive size.
+        If select is given, only the members for which select(path) is True
+        are written to disk, the others are only listed. The content of the
+        (small) members for which capture(path) is True is returned.
+        If store is given, files are written once in this content-addressed
+        store and hard linked in destination.
+        If gzip_index is given and archive_file is a gzip file, its seek
+        points are saved there during the same read (needs indexed_gzip), for
+        ArchiveReader to read members without decompressing from the start.
+        If file_digest (an algorithm) is given, the digest of every file
+        written is computed as it is written.
+        Raise ValueError on a member that would be written outside
+        destination (absolute path, '..'). Links pointing outside of it are
+        not extracted.
+
+        Return a dict with the digests, the list of members, the captured
+        contents, the file digests (relative path -> hex digest), the number of
+        bytes read and the elapsed time.
+    """
+    if chunk_size is None:
+        chunk_size = config.ingest_chunk_size
+    if algorithms is None:
+        algorithms = config.digests
+    # sha256 identifies the source file of a case
+    algorithms = list(dict.fromkeys(list(algorithms) + ['sha256']))
+
+    start = time.monotonic()
+    members = []
+    captured = {}
+    file_digests = {}
+    links = []
+    deduplicated = 0
+    hasher = MultiHasher(algorithms)
+    try:
+        with open(archive_file, 'rb') as f:
+            reader = HashingReader(f, hasher, chunk_size)
+            indexed = _indexed_gzip(reader) if gzip_index is not None else None
+            if indexed is not None:
+                tf = tarfile.open(fileobj=indexed, mode='r|', bufsize=chunk_size)
+            else:
+                tf = tarfile.open(fileobj=reader, mode='r|*', bufsize=chunk_size)
+            with tf:
+                for member in tf:
+                    members.append(member)
+                    path = artifacts.normalize(member.name)
+                    if capture is not None and member.isfile() and capture(path):
+                        captured[path] = tf.extractfile(member).read()
+                    elif select is None or select(path):
+                        target = _target(destination, member.name)
+                        digest = None
+                        if store is not None and member.isfile():
+                            already_stored, digest = _extract_to_store(tf, member, target, store, chunk_size,
+                                                                       file_digest=file_digest)
+                            if already_stored:
+                                deduplicated += member.size
+                        elif member.isfile():
+                            digest = _write_member(tf, member, target, chunk_size, file_digest)
+                        elif (member.issym() or member.islnk()) and not _is_link_inside(member, target, destination):
+                            print(f'WARNING: {member.name} links to {member.linkname}, outside of the archive, '
+                                  'not extracted', file=sys.stderr)
+                        else:
+                            _extract_member(tf, member, target, destination)
+                            if member.issym() or member.islnk():
+                                links.append(path)
+                        if digest is not None:
+                            file_digests[path] = digest
+            if indexed is not None:
+                indexed.export_index(gzip_index)
+                indexed.close()
+            reader.drain(chunk_size)
+    finally:
+        digests = hasher.hexdigests()
+    # links to files are hashed once their target is extracted
+    if file_digest is not None:
+        for path in links:
+            if os.path.isfile(os.path.join(destination, path)):
+                file_digests[path] = digest_file(os.path.join(destination, path), file_digest, chunk_size)
+    elapsed = time.monotonic() - start
+
+    return {
+        "sha256": digests['sha256'],
+        "digests": digests,
+        "members": members,
+        "captured": captured,
+        "file_digests": file_digests,
+        "deduplicated": deduplicated,
+        "bytes_read": reader.bytes_read,
+        "elapsed": elapsed
+    }
+
+
+def digest_file(path, algorithm='sha256', chunk_size=None):
+    """
+        Return the hex digest of a file
+    """
+    if chunk_size is None:
+        chunk_size = config.ingest_chunk_size
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def digest_tree(folder, algorithm='sha256', workers=None):
+    """
+        Return the digest of every file below folder: relative path -> hex digest.
+        Files are hashed in parallel by a thread pool.
+    """
+    files = []
+    for root, dirs, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if os.path.isfile(path):
+                files.append(os.path.relpath(path, folder))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(lambda path: digest_file(os.path.join(folder, path), algorithm), files)
+        return dict(zip(files, digests))
+
+
+def tree_hash(folder):
+    """
+        Return a sha256 identifying an extracted sysdiagnose folder from the
+        relative path, size and modification time of all its files.
+        Only metadata is read, so it is computed in seconds whatever the size
+        of the folder, and changes whenever a file is added, removed or modified.
+    """
+    entries = []
+    for root, dirs, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            stat = os.lstat(path)
+            entries.append(f'{os.path.relpath(path, folder)}\0{stat.st_size}\0{stat.st_mtime_ns}\n')
+    hasher = hashlib.sha256()
+    for entry in sorted(entries):
+        hasher.update(entry.encode('utf-8', errors='surrogateescape'))
+    return hasher.hexdigest()
+
+
+def member_index(members):
+    """
+        Return the member index of an archive: relative path -> [offset of the
+        data in the uncompressed tar stream, size, is a folder]
+    """
+    index = {}
+    for member in members:
+        if member.isfile() or member.isdir():
+            index[artifacts.normalize(member.name)] = [member.offset_data, member.size, member.isdir()]
+    return index
+
+
+class ArchiveReader:
+    """
+        Random access to the members of an archive through its member index,
+        without extracting it.
+
+        Uncompressed archives are read with seeks. gzip archives are read from
+        the seek points saved in gzip_index at ingest (built on first use for
+        older cases) with indexed_gzip. Without it, seeking forward
+        decompresses the stream up to the offset (and seeking backward
+        restarts from the beginning), which is why members are always read in
+        archive order.
+    """
+
+    def __init__(self, archive_file, members, gzip_index=None):
+        self.members = members
+        self.fileobj = _open_seekable(archive_file, gzip_index)
+
+    def close(self):
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read(self, path):
+        """
+            Return the content of a member
+        """
+        offset, size, is_dir = self.members[artifacts.normalize(path)]
+        self.fileobj.seek(offset)
+        return self.fileobj.read(size)
+
+    def extract(self, paths, destination, chunk_size=None):
+        """
+            Write the given relative paths (files, or folders with all their
+            content when ending with '/') to destination.
+            Each file is written to a temporary file renamed once complete, so
+            a file being read is never truncated nor seen partly written.
+        """
+        if chunk_size is None:
+            chunk_size = config.ingest_chunk_size
+        names = set()
+        for path in paths:
+            name = artifacts.normalize(path)
+            if path.endswith('/'):
+                names.update(member for member in self.members if member == name or member.startswith(name + '/'))
+            elif name in self.members:
+                names.add(name)
+
+        for name in sorted(names, key=lambda member: self.members[member][0]):
+            offset, size, is_dir = self.members[name]
+            target = _target(destination, name)
+            if is_dir:
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self.fileobj.seek(offset)
+            fd, tmp_file = tempfile.mkstemp(prefix='.' + os.path.basename(target) + '.', dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    while size > 0:
+                        data = self.fileobj.read(min(chunk_size, size))
+                        if not data:
+                            raise EOFError(f'unexpected end of archive while reading {name}')
+                        f.write(data)
+                        size -= len(data)
+                # mkstemp files are only readable by the user
+                os.chmod(tmp_file, 0o666 & ~_umask())
+                os.replace(tmp_file, target)
+            except BaseException:
+                os.remove(tmp_file)
+                raise
+
+
+def _umask():
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def _open_seekable(archive_file, gzip_index=None):
+    with open(archive_file, 'rb') as f:
+        magic = f.read(6)
+    if magic.startswith(b'\x1f\x8b'):
+        try:
+            import indexed_gzip
+        except ImportError:
+            return gzip.open(archive_file, 'rb')
+        fileobj = indexed_gzip.IndexedGzipFile(archive_file)
+        if gzip_index is not None and os.path.exists(gzip_index):
+            fileobj.import_index(gzip_index)
+        elif gzip_index is not None:
+            fileobj.build_full_index()
+            fileobj.export_index(gzip_index)
+        return fileobj
+    if magic.startswith(b'BZh'):
+        return bz2.open(archive_file, 'rb')
+    if magic.startswith(b'\xfd7zXZ'):
+        return lzma.open(archive_file, 'rb')
+    return open(archive_file, 'rb')
+
+
+def _is_inside(path, folder):
+    folder = os.path.realpath(folder)
+    return os.path.commonpath([folder, os.path.realpath(path)]) == folder
+
+
+def _target(destination, name):
+    """
+        Return the path where the member name is written in destination.
+        Raise ValueError if it is outside of destination: absolute, with '..'
+        or below a link pointing outside.
+    """
+    path = artifacts.normalize(name)
+    if os.path.isabs(path) or '..' in path.split('/'):
+        raise ValueError(f'unsafe member path in archive: {name}')
+    target = os.path.join(destination, path)
+    if not _is_inside(target, destination):
+        raise ValueError(f'member written outside of the extraction folder: {name}')
+    return target
+
+
+def _is_link_inside(member, target, destination):
+    # tell if a symbolic or hard link member points inside destination
+    if member.islnk():
+        path = artifacts.normalize(member.linkname)
+        return '..' not in path.split('/') and _is_inside(os.path.join(destination, path), destination)
+    if os.path.isabs(member.linkname):
+        return False
+    return _is_inside(os.path.join(os.path.dirname(target), member.linkname), destination)
+
+
+def _extract_member(tf, member, target, destination):
+    # folders are created with default permissions so that a read-only
+    # folder cannot prevent its content to be extracted afterwards
+    if member.isdir():
+        os.makedirs(target, exist_ok=True)
+    elif hasattr(tarfile, 'tar_filter'):
+        tf.extract(member, path=destination, filter='tar')
+    else:
+        tf.extract(member, path=destination)
+
+
+def _write_member(tf, member, target, chunk_size, file_digest=None):
+    """
+        Write a regular file member to target, with its permissions and
+        modification time. Return its file_digest digest, None if not given.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    hasher = hashlib.new(file_digest) if file_digest is not None else None
+    source = tf.extractfile(member)
+    with open(target, 'wb') as f:
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            if hasher is not None:
+                hasher.update(data)
+            f.write(data)
+    os.chmod(target, member.mode & 0o777)
+    os.utime(target, (member.mtime, member.mtime))
+    return hasher.hexdigest() if hasher is not None else None
+
+
+def _extract_to_store(tf, member, target, store, chunk_size, buffer_size=None, file_digest=None):
+    """
+        Write a member in the content-addressed store (store/<2 first chars of
+        the sha256>/<sha256>_<mtime>_<mode>) unless an identical file is
+        already there, and hard link it to target. Return (True if the content
+        was already stored, its file_digest digest or None if not given).
+        Files are keyed on their metadata too: the cases linking a stored file
+        share its inode, so they must all have the same modification time and
+        permissions for it.
+        Members up to buffer_size bytes (config.store_buffer_size) are hashed
+        in memory and only written if new. Larger ones are written to a
+        temporary file while hashed, the tar stream cannot be read twice.
+        Stored files are read-only (write permissions removed), and published
+        with a hard link, so concurrent ingests storing the same file keep
+        the first one.
+    """
+    if buffer_size is None:
+        buffer_size = config.store_buffer_size
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.makedirs(store, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    file_hasher = None
+    if file_digest is not None and file_digest != 'sha256':
+        file_hasher = hashlib.new(file_digest)
+    chunks = []
+    buffered = 0
+    tmp_file = None
+    try:
+        f = None
+        try:
+            source = tf.extractfile(member)
+            while True:
+                data = source.read(chunk_size)
+                if not data:
+                    break
+                hasher.update(data)
+                if file_hasher is not None:
+                    file_hasher.update(data)
+                if f is None and buffered + len(data) <= buffer_size:
+                    chunks.append(data)
+                    buffered += len(data)
+                    continue
+                if f is None:
+                    fd, tmp_file = tempfile.mkstemp(dir=store)
+                    f = os.fdopen(fd, 'wb')
+                    f.writelines(chunks)
+                    chunks = []
+                f.write(data)
+        finally:
+            if f is not None:
+                f.close()
+        digest = hasher.hexdigest()
+
+        mode = member.mode & 0o555
+        stored = os.path.join(store, digest[:2], f'{digest}_{member.mtime}_{mode:o}')
+        already_stored = os.path.exists(stored)
+        if not already_stored:
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            if tmp_file is None:
+                fd, tmp_file = tempfile.mkstemp(dir=store)
+                with os.fdopen(fd, 'wb') as f:
+                    f.writelines(chunks)
+            os.chmod(tmp_file, mode)
+            os.utime(tmp_file, (member.mtime, member.mtime))
+            try:
+                os.link(tmp_file, stored)
+            except FileExistsError:
+                # stored meanwhile by another ingest
+                already_stored = True
+            except OSError:
+                # no hard links on this file system
+                os.replace(tmp_file, stored)
+    finally:
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    try:
+        os.link(stored, target)
+    except OSError:
+        # no hard links across file systems (or on this file system)
+        shutil.copy2(stored, target)
+    if file_digest is None:
+        return already_stored, None
+    return already_stored, file_hasher.hexdigest() if file_hasher is not None else digest
+
+
+def probe(archive_file):
+    """
+        Inventory archive_file without extracting it.
+        Only the tar headers are read, plus SystemVersion.plist or sysdiagnose.log
+        to get the iOS version. For uncompressed archives the content of the other
+        members is skipped with seeks.
+
+        Return a dict with the number of members, their total size, the iOS version
+        and, for each artifact of the manifest found, the list of (path, size).
+    """
+    members = []
+    sizes = {}
+    ios_version = None
+    with tarfile.open(archive_file) as tf:
+        for member in tf:
+            members.append(member)
+            if not member.isfile():
+                continue
+            path = artifacts.normalize(member.name)
+            # size of a folder is the size of all the files below it
+            parent = path
+            while parent:
+                sizes[parent] = sizes.get(parent, 0) + member.size
+                parent = parent.rpartition('/')[0]
+            below = path.partition('/')[2]
+            if below == 'logs/SystemVersion/SystemVersion.plist':
+                try:
+                    ios_version = plistlib.loads(tf.extractfile(member).read())['ProductVersion']
+                except Exception:
+                    pass
+            elif below == 'sysdiagnose.log' and ios_version is None:
+                for line in tf.extractfile(member):
+                    line = line.decode('utf-8', errors='replace')
+                    if 'iPhone OS' in line:
+                        ios_version = line.split()[4]
+                        break
+
+    found = {}
+    for name, paths in artifacts.ArtifactIndex.from_members(members).match().items():
+        if not isinstance(paths, list):
+            paths = [paths]
+        found[name] = [(path, sizes.get(path.rstrip('/'), 0)) for path in paths]
+
+    return {
+        "members": len(members),
+        "size": sum(member.size for member in members if member.isfile()),
+        "ios_version": ios_version,
+        "artifacts": found
+    }
+
+
+def throughput(bytes_read, elapsed):
+    """
+        Return the throughput in MB/s
+    """
+    if elapsed <= 0:
+        return 0.0
+    return bytes_read / (1024 * 1024) / elapsed
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,180 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Manifest of the artifacts found in a sysdiagnose and one-pass discovery
+
+import os
+import re
+import fnmatch
+
+# Structure:
+# case json key, pattern relative to the sysdiagnose folder, multiple files
+# Patterns ending with '/' only match folders. Entries with multiple files
+# are stored as a list, even if nothing was found.
+artifacts = [
+    ("sysdiagnose.log", "sysdiagnose.log", False),
+    ("ps", "ps.txt", False),
+    ("swcutil_show", "swcutil_show.txt", False),
+    ("ps_thread", "ps_thread.txt", False),
+    ("appupdate_db", "logs/appinstallation/AppUpdates.sqlitedb", False),
+    ("brctl", "brctl/", False),
+    ("networkextensioncache", "logs/Networking/com.apple.networkextension.cache.plist", False),
+    ("networkextension", "logs/Networking/com.apple.networkextension.plist", False),
+    ("powerlogs", "logs/powerlogs/powerlog_*", False),
+    ("systemversion", "logs/SystemVersion/SystemVersion.plist", False),
+    ("UUIDToBinaryLocations", "logs/tailspindb/UUIDToBinaryLocations", False),
+    ("logarchive_folder", "system_logs.logarchive/", False),
+    ("shutdownlog", "system_logs.logarchive/Extra/shutdown.log", False),
+    ("taskinfo", "taskinfo.txt", False),
+    ("spindump-nosymbols", "spindump-nosymbols.txt", False),
+    ("Accessibility-TCC", "logs/Accessibility/TCC.db", False),
+    ("appinstallation", "logs/appinstallation/appstored.sqlitedb", False),
+    ("itunesstore", "logs/itunesstored/downloads.*.sqlitedb", False),
+    ("wifisecurity", "WiFi/security.txt", False),
+    ("wifi_data", "WiFi/*.plist", True),
+    ("wifi_data", "WiFi/wifi_scan*.txt", True),
+    ("wifi_data", "WiFi/com.apple.wifi.recent-networks.json", True),
+    ("ips_files", "crashes_and_spins/*.ips", True),
+    ("mobile_activation", "logs/MobileActivation/mobileactivationd.log*", True),
+    ("container_manager", "logs/MobileContainerManager/containermanagerd.log*", True),
+    ("mobile_installation", "logs/MobileInstallation/mobile_installation.log*", True),
+]
+
+
+def normalize(path):
+    """
+        Normalize an archive member name to a relative path without trailing slash
+    """
+    path = path.strip('/')
+    while path.startswith('./'):
+        path = path[2:]
+    return path
+
+
+def _translate(pattern):
+    # like glob, wildcards do not match the path separator
+    return re.escape(pattern).replace(r'\*', '[^/]*').replace(r'\?', '[^/]')
+
+
+def selector(names=None, manifest=None):
+    """
+        Return a function telling if a relative path (sysdiagnose folder included)
+        belongs to one of the artifacts names of the manifest, all artifacts if
+        names is None. Content of artifacts that are folders is selected too.
+    """
+    if manifest is None:
+        manifest = artifacts
+    regexes = []
+    for name, pattern, multiple in manifest:
+        if names is not None and name not in names:
+            continue
+        regex = _translate(pattern.rstrip('/'))
+        if pattern.endswith('/'):
+            regex += '(/.*)?'
+        regexes.append(regex)
+    compiled = re.compile('[^/]+/(?:' + '|'.join(regexes) + ')') if regexes else None
+
+    def select(path):
+        return compiled is not None and compiled.fullmatch(path) is not None
+    return select
+
+
+class ArtifactIndex:
+    """
+        In-memory index of the paths of an extracted sysdiagnose.
+
+        Paths are relative to the extraction folder, the first component being
+        the sysdiagnose folder itself. They are indexed by their path below that
+        folder, and by parent folder for patterns ending with a wildcard, so
+        matching the whole manifest costs one lookup per pattern.
+    """
+
+    def __init__(self):
+        self.paths = {}         # path below the sysdiagnose folder -> relative paths
+        self.children = {}      # parent below the sysdiagnose folder -> [(name, relative path)]
+        self.seen = set()
+
+    @classmethod
+    def from_members(cls, members):
+        """
+            Build the index from a list of TarInfo
+        """
+        index = cls()
+        for member in members:
+            index.add(member.name, member.isdir())
+        return index
+
+    @classmethod
+    def from_folder(cls, folder, prefix=''):
+        """
+            Build the index with a single os.scandir walk of folder, prefix
+            being prepended to the paths (e.g. the name of the sysdiagnose
+            folder when folder is the sysdiagnose folder itself).
+        """
+        index = cls()
+        stack = ['']
+        while stack:
+            current = stack.pop()
+            with os.scandir(os.path.join(folder, current)) as it:
+                for entry in it:
+                    path = current + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        index.add(prefix + path, True)
+                        stack.append(path + '/')
+                    else:
+                        index.add(prefix + path, False)
+        return index
+
+    def add(self, path, is_dir):
+        path = normalize(path)
+        if not path or path in self.seen:
+            return
+        self.seen.add(path)
+        # archives do not always contain entries for the parent folders
+        parent, _, name = path.rpartition('/')
+        if parent:
+            self.add(parent, True)
+        parts = path.split('/', 1)
+        if len(parts) < 2:
+            return
+        suffix = '/' if is_dir else ''
+        full = path + suffix
+        self.paths.setdefault(parts[1] + suffix, []).append(full)
+        parent_key, _, child = parts[1].rpartition('/')
+        self.children.setdefault(parent_key, []).append((child + suffix, full))
+
+    def lookup(self, pattern):
+        """
+            Return the sorted list of relative paths matching pattern
+        """
+        parent, _, name = pattern.rstrip('/').rpartition('/')
+        if pattern.endswith('/'):
+            name += '/'
+        if not any(c in parent for c in '*?['):
+            if not any(c in name for c in '*?['):
+                return sorted(self.paths.get(pattern, []))
+            # like glob, wildcards do not match hidden files
+            return sorted(full for child, full in self.children.get(parent, [])
+                          if fnmatch.fnmatchcase(child, name) and not child.startswith('.'))
+        # wildcard in a folder name, fall back on a scan of the index
+        regex = re.compile(_translate(pattern))
+        return sorted(full for key, fulls in self.paths.items() if regex.fullmatch(key) for full in fulls)
+
+    def match(self, manifest=None):
+        """
+            Match the artifact manifest against the index.
+            Return a dict artifact name -> relative path (or list of paths)
+        """
+        if manifest is None:
+            manifest = artifacts
+        found = {}
+        for name, pattern, multiple in manifest:
+            paths = self.lookup(pattern)
+            if multiple:
+                found.setdefault(name, []).extend(paths)
+            elif paths and name not in found:
+                found[name] = paths[0]
+        return found
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,304 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Per-case SQLite database built from the parser outputs
+#
+# parsed_data/<case>/case.db gathers what several parsers report in a few
+# normalized tables, so cross-artifact questions are indexed queries instead
+# of loading large JSON files:
+#
+#   processes       ps, psthread, taskinfo                  index on pid
+#   apps            tcc, brctl, itunesstore, appinstallation    index on bundle_id
+#   wifi_networks   wifi known networks, wifiscan           index on ssid
+#   log_events      logarchive          indexes on timestamp, pid and process/sender UUID
+#   timeline        timeliner analyser  index on timestamp
+#
+# Every row keeps the parser it comes from (source). Rows of the small
+# tables keep the whole record as JSON (data). Rows of log_events and
+# timeline, which may be millions, only keep the position of their record in
+# the output (record), read back with read_records.
+#
+# The database is opt-in (config.case_database) and loaded by the parent
+# process once a parser or analyser run is over, out of its timeout and
+# memory limit: the rows of that parser are replaced, the others are left
+# untouched. Rows are written in batches, each in its own short transaction,
+# so that other parsers finishing meanwhile are not kept waiting. A source is
+# listed in the sources table once all its rows are written.
+#
+# e.g. SELECT * FROM processes p JOIN log_events l ON l.pid = p.pid WHERE p.command LIKE '%backboardd%'
+
+import os
+import sys
+import sqlite3
+import datetime
+import contextlib
+
+import config
+from utils import parsed_data
+from utils import serialization
+
+database_file = 'case.db'
+schema_version = 2      # databases of another version are emptied, rebuilt by parsing.py casedb
+batch_size = 10000      # rows written in a transaction
+
+tables = {
+    "processes": ['pid INTEGER', 'ppid INTEGER', 'thread_id TEXT', 'user TEXT', 'command TEXT', 'data TEXT'],
+    "apps": ['bundle_id TEXT', 'detail TEXT', 'data TEXT'],
+    "wifi_networks": ['ssid TEXT', 'bssid TEXT', 'added_at TEXT', 'joined_at TEXT', 'data TEXT'],
+    "log_events": ['record INTEGER', 'timestamp TEXT', 'pid INTEGER', 'thread_id INTEGER', 'process TEXT',
+                   'process_uuid TEXT', 'sender_uuid TEXT', 'boot_uuid TEXT', 'subsystem TEXT', 'category TEXT',
+                   'event_type TEXT', 'message TEXT'],
+    "timeline": ['record INTEGER', 'timestamp INTEGER', 'datetime TEXT', 'timestamp_desc TEXT', 'message TEXT'],
+}
+
+indexes = {
+    "processes": [['pid']],
+    "apps": [['bundle_id']],
+    "wifi_networks": [['ssid']],
+    "log_events": [['timestamp'], ['pid'], ['process_uuid'], ['sender_uuid']],
+    "timeline": [['timestamp']],
+}
+
+
+def connect(folder):
+    """
+        Open the case.db of a parsed data folder, creating it if needed
+    """
+    db = sqlite3.connect(os.path.join(folder, database_file), timeout=config.case_database_timeout, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    # readers (analysers) are not blocked while a parser output is loaded
+    db.execute("PRAGMA journal_mode=WAL")
+    if db.execute("PRAGMA user_version").fetchone()[0] != schema_version:
+        for table in list(tables) + ['sources']:
+            db.execute(f"DROP TABLE IF EXISTS {table}")
+        db.execute(f"PRAGMA user_version = {schema_version}")
+        db.execute("VACUUM")
+    db.execute("""CREATE TABLE IF NOT EXISTS sources (
+                    name TEXT PRIMARY KEY,
+                    output_file TEXT NOT NULL,
+                    updated TEXT NOT NULL,
+                    rows INTEGER NOT NULL)""")
+    for table, columns in tables.items():
+        db.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY,
+                        source TEXT NOT NULL,
+                        {', '.join(columns)})""")
+        db.execute(f"CREATE INDEX IF NOT EXISTS {table}_source ON {table} (source)")
+        for columns in indexes[table]:
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})")
+    return db
+
+
+"""
+    Rows of the parser outputs: each loader yields (table, row) where row
+    maps the columns of the table to their value
+"""
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _json(record):
+    return serialization.dumps(record, compact=True)
+
+
+def _processes(path):
+    data = parsed_data.load(path)
+    if isinstance(data, dict) and 'tasks' in data:
+        # taskinfo: thread ID -> thread
+        for thread_id, thread in (data['tasks'] or {}).items():
+            yield 'processes', {"thread_id": thread_id, "command": thread.get('thread name'), "data": _json(thread)}
+        return
+    # ps: PID -> process, psthread: list of threads
+    for process in (data.values() if isinstance(data, dict) else data or []):
+        yield 'processes', {"pid": _int(process.get('PID')), "ppid": _int(process.get('PPID')),
+                            "user": process.get('USER'), "command": process.get('COMMAND'), "data": _json(process)}
+
+
+def _tcc(path):
+    for access in (parsed_data.load(path) or {}).get('access', []):
+        yield 'apps', {"bundle_id": access.get('client'), "detail": access.get('service'), "data": _json(access)}
+
+
+def _brctl(path):
+    for bundle_id, libraries in ((parsed_data.load(path) or {}).get('app_library_id') or {}).items():
+        yield 'apps', {"bundle_id": bundle_id, "detail": None, "data": _json(libraries)}
+
+
+def _bundle_ids(path):
+    # SQLite-backed parsers (itunesstore, appinstallation): rows with a bundle ID
+    for table, rows in (parsed_data.load(path) or {}).items():
+        for row in (rows if isinstance(rows, list) else []):
+            if isinstance(row, dict) and row.get('bundle_id'):
+                yield 'apps', {"bundle_id": row['bundle_id'], "detail": table, "data": _json(row)}
+
+
+def _known_networks(path):
+    data = parsed_data.load(path) or {}
+    data = data.get('com.apple.wifi.known-networks.plist', data)
+    for name, network in data.items():
+        if isinstance(network, dict):
+            yield 'wifi_networks', {"ssid": network.get('SSID', name), "bssid": None,
+                                    "added_at": network.get('AddedAt'), "joined_at": network.get('JoinedByUserAt'),
+                                    "data": _json(network)}
+
+
+def _wifiscan(path):
+    for network in parsed_data.load(path) or []:
+        yield 'wifi_networks', {"ssid": network.get('ssid'), "bssid": network.get('bssid'), "data": _json(network)}
+
+
+def _records_key(path):
+    # the logarchive document keeps its records at 'data', a .jsonl stream is the records
+    if parsed_data.is_stream_file(path) or parsed_data.name_of(path) != 'sysdiagnose-logarchive':
+        return None
+    return 'data'
+
+
+def _log_events(path):
+    for record, event in enumerate(parsed_data.records(path, _records_key(path))):
+        yield 'log_events', {"record": record, "timestamp": event.get('timestamp'), "pid": event.get('processID'),
+                             "thread_id": event.get('threadID'), "process": event.get('processImagePath'),
+                             "process_uuid": event.get('processImageUUID'), "sender_uuid": event.get('senderImageUUID'),
+                             "boot_uuid": event.get('bootUUID'), "subsystem": event.get('subsystem'),
+                             "category": event.get('category'), "event_type": event.get('eventType'),
+                             "message": event.get('eventMessage')}
+
+
+def _timeline(path):
+    for record, event in enumerate(parsed_data.records(path)):
+        yield 'timeline', {"record": record, "timestamp": event.get('timestamp'), "datetime": event.get('datetime'),
+                           "timestamp_desc": event.get('timestamp_desc'), "message": event.get('message')}
+
+
+loaders = {
+    "sysdiagnose-ps": _processes,
+    "sysdiagnose-psthread": _processes,
+    "sysdiagnose-taskinfo": _processes,
+    "sysdiagnose-accessibility-tcc": _tcc,
+    "sysdiagnose-brctl": _brctl,
+    "sysdiagnose-itunesstore": _bundle_ids,
+    "sysdiagnose-appinstallation": _bundle_ids,
+    "sysdiagnose_wifi_known_networks": _known_networks,
+    "sysdiagnose-wifiscan": _wifiscan,
+    "sysdiagnose-logarchive": _log_events,
+    "sysdiagnose-timeliner": _timeline,
+}
+
+
+"""
+    Update
+"""
+
+
+@contextlib.contextmanager
+def _transaction(db):
+    # the write lock is taken at once, for a batch of rows only
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+
+def _insert(db, table, source, rows):
+    columns = [column.split()[0] for column in tables[table]]
+    with _transaction(db):
+        db.executemany(f"INSERT INTO {table} (source, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+                       [[source] + [row.get(column) for column in columns] for row in rows])
+
+
+def update(folder, name, output_file):
+    """
+        Replace the rows of a parser (or analyser) in the case.db of folder by
+        those of its output. Return the number of rows, None if its output
+        does not go in the database.
+    """
+    if name not in loaders:
+        return None
+
+    db = connect(folder)
+    try:
+        # unlisted while its rows are replaced
+        with _transaction(db):
+            db.execute("DELETE FROM sources WHERE name = ?", (name,))
+        for table in tables:
+            deleted = batch_size
+            while deleted == batch_size:
+                with _transaction(db):
+                    deleted = db.execute(f"DELETE FROM {table} WHERE id IN "
+                                         f"(SELECT id FROM {table} WHERE source = ? LIMIT ?)", (name, batch_size)).rowcount
+
+        count = 0
+        batches = {}
+        for table, row in loaders[name](output_file):
+            batches.setdefault(table, []).append(row)
+            count += 1
+            if len(batches[table]) >= batch_size:
+                _insert(db, table, name, batches.pop(table))
+        for table, rows in batches.items():
+            _insert(db, table, name, rows)
+
+        with _transaction(db):
+            db.execute("INSERT INTO sources (name, output_file, updated, rows) VALUES (?, ?, ?, ?)",
+                       (name, output_file, datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                        count))
+    finally:
+        db.close()
+    return count
+
+
+def load_output(folder, name, output_file):
+    """
+        Update the case.db of folder with the output of a parser or analyser
+        run that is over, if config.case_database is on. Called by the parent
+        process, so that loading does not count in the timeout and memory
+        limit of the run. A failure only prints a warning.
+        Return the number of rows, None if not loaded.
+    """
+    if not config.case_database or name not in loaders:
+        return None
+    try:
+        return update(folder, name, output_file)
+    except Exception as e:
+        print(f'WARNING: {name} output not loaded in {database_file}. Reason: {str(e)}', file=sys.stderr)
+        return None
+
+
+def build(folder):
+    """
+        Load all the parser outputs of folder in its case.db.
+        Return name -> number of rows of the outputs found.
+    """
+    counts = {}
+    for name in loaders:
+        output_file = parsed_data.output_file(folder, name)
+        if output_file is not None:
+            counts[name] = update(folder, name, output_file)
+    return counts
+
+
+def read_records(output_file, positions):
+    """
+        Iterate on (position, record) of the records of a parser output at
+        the given positions (the record column of log_events or timeline),
+        in one pass over the output
+    """
+    positions = set(positions)
+    if not positions:
+        return
+    last = max(positions)
+    for position, record in enumerate(parsed_data.records(output_file, _records_key(output_file))):
+        if position in positions:
+            yield position, record
+        if position >= last:
+            break
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
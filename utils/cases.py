@@ -0,0 +1,174 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Case registry stored in a SQLite database
+#
+# Replaces cases.json: case IDs are allocated atomically by SQLite, so
+# concurrent ingests cannot get the same ID, and duplicates are found with
+# an index on the sha256 of the source file instead of a scan of all cases.
+# IDs are never reused, even those of the last cases deleted, so an ID always
+# designates the same case (and its parsed data, reports...).
+#
+# A case registered from an extracted folder has no source file to hash: it
+# is identified by the tree hash of the folder (see archive.tree_hash), kept
+# in its own column, and has no source_sha256.
+
+import os
+import json
+import sqlite3
+
+import config
+
+schema = """CREATE TABLE IF NOT EXISTS cases (
+                case_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_file TEXT NOT NULL,
+                source_sha256 TEXT,
+                tree_hash TEXT,
+                case_file TEXT NOT NULL,
+                digests TEXT)"""
+
+
+def connect(path=None):
+    """
+        Open the case registry, creating it if needed.
+        When created, the cases of the legacy cases.json file are imported.
+    """
+    if path is None:
+        path = config.cases_db
+    # autocommit mode, transactions are explicitly opened by callers
+    db = sqlite3.connect(path, timeout=60, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(schema)
+    if not _is_current(db):
+        _upgrade(db)
+    db.execute("CREATE INDEX IF NOT EXISTS cases_source_sha256 ON cases (source_sha256)")
+    db.execute("CREATE INDEX IF NOT EXISTS cases_tree_hash ON cases (tree_hash)")
+    if db.execute("SELECT count(*) FROM cases").fetchone()[0] == 0 and os.path.exists(config.cases_file):
+        import_cases_file(db, config.cases_file)
+    return db
+
+
+def _columns(db):
+    return [row['name'] for row in db.execute("PRAGMA table_info(cases)")]
+
+
+def _is_current(db):
+    sql = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'cases'").fetchone()[0]
+    return 'tree_hash' in _columns(db) and 'AUTOINCREMENT' in sql.upper()
+
+
+def _upgrade(db):
+    """
+        Recreate the cases table of a registry created by an older version
+        with the current schema, keeping its cases and their IDs. Folder cases
+        of registries without tree_hash have their tree hash in source_sha256,
+        it is moved to tree_hash.
+    """
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if _is_current(db):
+            db.execute("ROLLBACK")      # upgraded meanwhile by another process
+            return
+        old_columns = _columns(db)
+        columns = ', '.join(column for column in old_columns
+                            if column in ('case_id', 'source_file', 'source_sha256', 'tree_hash', 'case_file', 'digests'))
+        db.execute("ALTER TABLE cases RENAME TO cases_old")
+        db.execute("DROP INDEX IF EXISTS cases_source_sha256")
+        db.execute("DROP INDEX IF EXISTS cases_tree_hash")
+        db.execute(schema)
+        # the next ID allocated follows the highest ID copied
+        db.execute(f"INSERT INTO cases ({columns}) SELECT {columns} FROM cases_old ORDER BY case_id")
+        if 'tree_hash' not in old_columns:
+            for row in db.execute("SELECT case_id, case_file FROM cases").fetchall():
+                if _is_folder_case(row['case_file']):
+                    db.execute("UPDATE cases SET tree_hash = source_sha256, source_sha256 = NULL WHERE case_id = ?",
+                               (row['case_id'],))
+        db.execute("DROP TABLE cases_old")
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+
+def _is_folder_case(case_file):
+    try:
+        with open(case_file, 'r') as f:
+            return json.load(f).get('extraction') == 'folder'
+    except (OSError, ValueError):
+        return False
+
+
+def import_cases_file(db, cases_file):
+    """
+        Import the cases of a legacy cases.json file
+    """
+    with open(cases_file, 'r') as f:
+        cases = json.load(f)
+    db.execute("BEGIN IMMEDIATE")
+    for case in cases['cases']:
+        db.execute("INSERT OR REPLACE INTO cases (case_id, source_file, source_sha256, case_file) VALUES (?, ?, ?, ?)",
+                   (case['case_id'], case['source_file'], case['source_sha256'], case['case_file']))
+    db.execute("COMMIT")
+
+
+def find_by_sha256(db, sha256):
+    """
+        Return the case of a source file from its sha256, None if unknown
+    """
+    row = db.execute("SELECT * FROM cases WHERE source_sha256 = ? ORDER BY case_id LIMIT 1", (sha256,)).fetchone()
+    return _to_case(row)
+
+
+def find_by_tree_hash(db, tree_hash):
+    """
+        Return the case of an extracted folder from its tree hash, None if unknown
+    """
+    row = db.execute("SELECT * FROM cases WHERE tree_hash = ? ORDER BY case_id LIMIT 1", (tree_hash,)).fetchone()
+    return _to_case(row)
+
+
+def get_case(db, case_id):
+    """
+        Return a case from its ID, None if unknown
+    """
+    row = db.execute("SELECT * FROM cases WHERE case_id = ?", (int(case_id),)).fetchone()
+    return _to_case(row)
+
+
+def list_cases(db):
+    """
+        Return all the cases ordered by ID
+    """
+    return [_to_case(row) for row in db.execute("SELECT * FROM cases ORDER BY case_id")]
+
+
+def add_case(db, source_file, source_sha256, case_id=None, digests=None, tree_hash=None):
+    """
+        Register a case and return its ID. A new ID is allocated if case_id is None,
+        otherwise the existing case is replaced. digests is a dict algorithm -> hex
+        digest of the source file. A folder case has no source_sha256 (None) but
+        a tree_hash.
+        To be called in a transaction opened with BEGIN IMMEDIATE, so the ID cannot
+        be allocated twice.
+    """
+    if case_id is None:
+        cursor = db.execute("INSERT INTO cases (source_file, source_sha256, tree_hash, case_file) VALUES (?, ?, ?, '')",
+                            (source_file, source_sha256, tree_hash))
+        case_id = cursor.lastrowid
+    db.execute("INSERT OR REPLACE INTO cases (case_id, source_file, source_sha256, tree_hash, case_file, digests) "
+               "VALUES (?, ?, ?, ?, ?, ?)",
+               (case_id, source_file, source_sha256, tree_hash, config.data_folder + str(case_id) + ".json",
+                json.dumps(digests) if digests else None))
+    return case_id
+
+
+def _to_case(row):
+    if row is None:
+        return None
+    case = dict(row)
+    case['digests'] = json.loads(case['digests']) if case['digests'] else {}
+    return case
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,311 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Columnar output (Arrow IPC or Parquet) of tabular parsers, needs pyarrow
+#
+# Parsers whose output is a table declare its layout and the type of its
+# columns (string, int64, float64 or bool) in parser_schema, e.g.
+#   parser_schema = {"layout": "keyed", "columns": {"PID": "int64", "COMMAND": "string"}}
+# Layouts:
+#   records   a list of records, or a dict holding it at "key", or a stream
+#             of records
+#   tables    a dict table name -> list of records (SQLite-backed parsers),
+#             "columns" then maps table names to their columns
+#   keyed     a dict key -> record
+#
+# The output is a <parser>.columns folder holding one file per table and
+# _layout.json, needed to rebuild the parser result. Undeclared columns get
+# the type pyarrow infers. Columns that cannot be stored without changing
+# their values (nested, mixed types) are stored as JSON text. Fields missing
+# from a record come back as null.
+
+import os
+import json
+
+from utils import serialization
+
+formats = {'arrow': '.arrow', 'parquet': '.parquet'}
+suffix = '.columns'
+layout_file = '_layout.json'
+key_column = '__key__'          # key of the records of a keyed layout
+extra_column = '__extra__'      # undeclared fields of streamed records, as JSON
+batch_size = 10000              # records of a stream converted at once
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def available():
+    """
+        Tell if pyarrow is installed
+    """
+    return _pyarrow() is not None
+
+
+def _type(pa, name):
+    types = {'string': pa.string(), 'int64': pa.int64(), 'float64': pa.float64(), 'bool': pa.bool_()}
+    if name not in types:
+        raise ValueError(f'unknown column type {name}, use {", ".join(types)}')
+    return types[name]
+
+
+def _is_records(rows):
+    return isinstance(rows, list) and all(isinstance(row, dict) for row in rows)
+
+
+def _json_key(key):
+    # keys as a JSON round trip gives them back
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+def tables_of(result, schema):
+    """
+        Return the tables of a parser result according to its layout:
+        name -> list of records, and what else is needed to rebuild it.
+        Return None, None if the result does not have the declared layout.
+    """
+    layout = schema.get('layout', 'records')
+    if layout == 'tables':
+        if isinstance(result, dict) and all(_is_records(rows) for rows in result.values()):
+            return dict(result), {}
+    elif layout == 'keyed':
+        if isinstance(result, dict) and all(isinstance(record, dict) for record in result.values()):
+            return {'data': [dict(record, **{key_column: _json_key(key)}) for key, record in result.items()]}, {}
+    elif layout == 'records':
+        key = schema.get('key')
+        if key is None and _is_records(result):
+            return {'data': result}, {}
+        if key is not None and isinstance(result, dict) and _is_records(result.get(key)):
+            return {'data': result[key]}, {name: value for name, value in result.items() if name != key}
+    else:
+        raise ValueError(f'unknown layout {layout}, use records, tables or keyed')
+    return None, None
+
+
+def _array(pa, values, column_type=None):
+    """
+        Return the Arrow array of values and whether it holds JSON text
+    """
+    if column_type is not None:
+        return pa.array(values, type=_type(pa, column_type)), False
+    try:
+        array = pa.array(values)
+        exact = not pa.types.is_nested(array.type)
+        # integers would come back as floats
+        if pa.types.is_floating(array.type):
+            exact = not any(isinstance(value, int) for value in values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError, TypeError):
+        exact = False
+    if exact:
+        return array, False
+    return pa.array([None if value is None else serialization.dumps(value, compact=True) for value in values],
+                    type=pa.string()), True
+
+
+def _table(pa, rows, columns):
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    arrays = []
+    json_columns = []
+    for name in names:
+        array, is_json = _array(pa, [row.get(name) for row in rows], columns.get(name))
+        arrays.append(array)
+        if is_json:
+            json_columns.append(name)
+    return pa.Table.from_arrays(arrays, names=names), json_columns
+
+
+def _write_table(pa, table, path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def write(result, folder, schema, output_format='arrow'):
+    """
+        Write the tables of a parser result in folder, one file per table.
+        Return False (writing nothing) if the result does not have the
+        declared layout.
+    """
+    pa = _pyarrow()
+    tables, rest = tables_of(result, schema)
+    if tables is None:
+        return False
+
+    os.makedirs(folder)
+    layout = {"layout": schema.get('layout', 'records'), "key": schema.get('key'), "rest": rest, "tables": {}}
+    for index, (name, rows) in enumerate(tables.items()):
+        columns = schema.get('columns', {})
+        if layout['layout'] == 'tables':
+            columns = columns.get(name, {})
+        table, json_columns = _table(pa, rows, columns)
+        file_name = str(index) + formats[output_format]
+        _write_table(pa, table, os.path.join(folder, file_name))
+        layout['tables'][name] = {"file": file_name, "json_columns": json_columns}
+
+    with open(os.path.join(folder, layout_file), 'w') as f:
+        json.dump(layout, f, indent=4)
+    return True
+
+
+def write_stream(records, folder, schema, output_format='arrow'):
+    """
+        Write a stream of records in folder, batch by batch. The declared
+        columns keep their type, the other fields of each record are stored
+        as JSON in the __extra__ column.
+    """
+    pa = _pyarrow()
+    columns = schema.get('columns', {})
+    fields = [(name, _type(pa, column_type)) for name, column_type in columns.items()]
+    fields.append((extra_column, pa.string()))
+    arrow_schema = pa.schema(fields)
+
+    os.makedirs(folder)
+    file_name = '0' + formats[output_format]
+    path = os.path.join(folder, file_name)
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, arrow_schema)
+        sink = None
+    else:
+        sink = pa.OSFile(path, 'wb')
+        writer = pa.ipc.new_file(sink, arrow_schema)
+
+    def write_batch(batch):
+        arrays = [pa.array([record.get(name) for record in batch], type=_type(pa, column_type))
+                  for name, column_type in columns.items()]
+        extras = []
+        for record in batch:
+            extra = {name: value for name, value in record.items() if name not in columns}
+            extras.append(serialization.dumps(extra, compact=True) if extra else None)
+        arrays.append(pa.array(extras, type=pa.string()))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=arrow_schema))
+
+    try:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                write_batch(batch)
+                batch = []
+        if batch:
+            write_batch(batch)
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+
+    layout = {"layout": 'records', "key": None, "rest": {}, "stream": True,
+              "tables": {'data': {"file": file_name, "json_columns": []}}}
+    with open(os.path.join(folder, layout_file), 'w') as f:
+        json.dump(layout, f, indent=4)
+
+
+def _layout(folder):
+    with open(os.path.join(folder, layout_file), 'r') as f:
+        return json.load(f)
+
+
+def _table_path(folder, layout, table):
+    if table is None or (table not in layout['tables'] and len(layout['tables']) == 1):
+        table = next(iter(layout['tables']))
+    return os.path.join(folder, layout['tables'][table]['file']), layout['tables'][table]
+
+
+def _column_names(pa, path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def read_table(folder, table=None, columns=None):
+    """
+        Return a table of a columnar output as a pyarrow Table, with only the
+        given columns if any. Arrow IPC files are memory mapped, so only the
+        selected columns are read from disk.
+    """
+    pa = _pyarrow()
+    path, entry = _table_path(folder, _layout(folder), table)
+    if columns is not None:
+        names = _column_names(pa, path)
+        columns = [name for name in columns if name in names]
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns)
+    with pa.memory_map(path) as source:
+        arrow_table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        arrow_table = arrow_table.select(columns)
+    return arrow_table
+
+
+def _decode(row, json_columns):
+    for name in json_columns:
+        if row.get(name) is not None:
+            row[name] = serialization.loads(row[name])
+    if extra_column in row:
+        extra = row.pop(extra_column)
+        if extra is not None:
+            row.update(serialization.loads(extra))
+    return row
+
+
+def rows(folder, table=None):
+    """
+        Iterate on the records of a table, batch by batch
+    """
+    path, entry = _table_path(folder, _layout(folder), table)
+    for batch in read_table(folder, table).to_batches():
+        for row in batch.to_pylist():
+            yield _decode(row, entry['json_columns'])
+
+
+def columns(folder, names, table=None):
+    """
+        Return name -> list of values of some columns of a table. Fields of
+        streamed records not declared in the schema are looked up in the
+        __extra__ column.
+    """
+    path, entry = _table_path(folder, _layout(folder), table)
+    arrow_table = read_table(folder, table, list(names) + [extra_column])
+    result = {}
+    for name in names:
+        if name in arrow_table.column_names:
+            values = arrow_table.column(name).to_pylist()
+            if name in entry['json_columns']:
+                values = [None if value is None else serialization.loads(value) for value in values]
+        elif extra_column in arrow_table.column_names:
+            values = [None if extra is None else serialization.loads(extra).get(name)
+                      for extra in arrow_table.column(extra_column).to_pylist()]
+        else:
+            values = [None] * arrow_table.num_rows
+        result[name] = values
+    return result
+
+
+def load(folder):
+    """
+        Rebuild the parser result from its columnar output
+    """
+    layout = _layout(folder)
+    if layout['layout'] == 'tables':
+        return {name: list(rows(folder, name)) for name in layout['tables']}
+    if layout['layout'] == 'keyed':
+        return {row.pop(key_column): row for row in rows(folder)}
+    records = list(rows(folder))
+    if layout['key'] is None:
+        return records
+    return dict(layout['rest'], **{layout['key']: records})
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Lazy imports, to keep the start of the command line scripts fast
+#
+# A module imported with lazy.module is only executed when one of its
+# attributes is first used, a function imported with lazy.function when it
+# is first called. Commands not using them (e.g. list parsers) never pay
+# for their import:
+#
+#   tabulate = lazy.function('tabulate', 'tabulate')
+#   archive = lazy.module('utils.archive')
+
+import sys
+import importlib
+import importlib.util
+
+
+def module(name):
+    """
+        Return module name, executed on first access to one of its attributes.
+        Raise ModuleNotFoundError if it is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    lazy_module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = lazy_module
+    loader.exec_module(lazy_module)
+    return lazy_module
+
+
+def function(module_name, name):
+    """
+        Return a function calling module_name.name, the module being imported
+        on the first call
+    """
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), name)(*args, **kwargs)
+
+    call.__name__ = name
+    call.__qualname__ = name
+    return call
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
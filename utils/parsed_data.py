@@ -0,0 +1,297 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Write and read the outputs of parsers in parsed_data
+#
+# Parsers returning a dict or a list are saved as <parser>.json. Parsers
+# returning a generator are streamed to <parser>.jsonl, one record per line,
+# so the records never all sit in memory.
+#
+# Tabular outputs of parsers declaring a parser_schema are written as a
+# <parser>.columns folder (Arrow IPC or Parquet) when config.columnar_output
+# is set and pyarrow is installed, see utils/columnar.py.
+#
+# With config.compression, the .json, .jsonl and .msgpack outputs are written
+# compressed (<parser>.json.gz, <parser>.jsonl.zst, ...). open_output and
+# records read them back as a stream, whatever the compression.
+
+import io
+import os
+import gzip
+import types
+import shutil
+
+import config
+from utils import columnar
+from utils import serialization
+
+formats = ['.jsonl', '.json', '.msgpack']
+compressions = {'gzip': '.gz', 'zstd': '.zst'}
+levels = {'gzip': 6, 'zstd': 3}     # fast levels, outputs are written once and read often
+extensions = [extension + suffix for extension in formats for suffix in [''] + list(compressions.values())]
+extensions.append(columnar.suffix)
+
+
+def is_streaming(result):
+    """
+        Tell if a parser result is a stream of records
+    """
+    return isinstance(result, types.GeneratorType)
+
+
+def count(result, schema=None):
+    """
+        Return the number of records of a parser result (not a stream): the
+        items of its list, of the list at the key or of the tables declared by
+        its schema, or of its dict
+    """
+    layout = schema.get('layout', 'records') if schema else None
+    if layout == 'tables' and isinstance(result, dict):
+        return sum(len(rows) for rows in result.values() if isinstance(rows, list))
+    if layout == 'records' and schema.get('key') and isinstance(result, dict) and isinstance(result.get(schema['key']), list):
+        return len(result[schema['key']])
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def _zstandard():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ImportError('zstandard is not installed, use another compression in config.py')
+
+
+def format_of(path):
+    """
+        Return the format of a parser output (.jsonl, .json, .msgpack or
+        .columns), whatever its compression
+    """
+    for suffix in compressions.values():
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    return os.path.splitext(path)[1]
+
+
+def name_of(path):
+    """
+        Return the name of the parser of an output
+    """
+    name = os.path.basename(path)
+    for extension in extensions:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return os.path.splitext(name)[0]
+
+
+def is_stream_file(path):
+    """
+        Tell if a parser output holds a stream of records (.jsonl)
+    """
+    return format_of(path) == '.jsonl'
+
+
+def is_columnar(path):
+    """
+        Tell if a parser output is a .columns folder
+    """
+    return path.endswith(columnar.suffix)
+
+
+def check_settings():
+    """
+        Raise ValueError if config.compression or config.columnar_output is
+        not a known value, before a parser runs for nothing
+    """
+    if config.compression is not None and config.compression not in compressions:
+        raise ValueError(f'unknown compression {config.compression}, use gzip, zstd or None')
+    if config.columnar_output and config.columnar_output not in columnar.formats:
+        raise ValueError(f'unknown columnar output {config.columnar_output}, use arrow, parquet or None')
+
+
+def settings():
+    """
+        Return the settings outputs are written with: an output written with
+        other settings is out of date
+    """
+    return {
+        "format": serialization.extension(),
+        "compression": config.compression,
+        "columnar_output": config.columnar_output if columnar.available() else None
+    }
+
+
+def open_output(path):
+    """
+        Open a parser output file for reading, in binary, decompressed on the fly
+    """
+    if path.endswith(compressions['gzip']):
+        return gzip.open(path, 'rb')
+    if path.endswith(compressions['zstd']):
+        return io.BufferedReader(_zstandard().open(path, 'rb'))
+    return open(path, 'rb')
+
+
+def _create(path, compression):
+    # open path for writing, compressed with compression if not None
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=levels['gzip'])
+    if compression == 'zstd':
+        zstandard = _zstandard()
+        return zstandard.open(path, 'wb', cctx=zstandard.ZstdCompressor(level=levels['zstd']))
+    return open(path, 'wb')
+
+
+def write(result, base, schema=None):
+    """
+        Save a parser result to base + '.json' (or '.msgpack', depending on the
+        serializer), or base + '.jsonl' for a stream of records. With a schema,
+        config.columnar_output set and pyarrow installed, a tabular result is
+        saved to base + '.columns' instead. The output of another format, left
+        by a previous run, is removed. Return the path of the output.
+        The output is compressed with config.compression if set.
+    """
+    check_settings()
+    output_file = None
+    if schema and config.columnar_output and columnar.available():
+        output_file = _write_columnar(result, base, schema)
+    if output_file is None:
+        output_file = _write_serialized(result, base)
+
+    for extension in extensions:
+        path = base + extension
+        if path != output_file and os.path.isdir(path):
+            shutil.rmtree(path)
+        elif path != output_file and os.path.exists(path):
+            os.remove(path)
+    return output_file
+
+
+def _write_serialized(result, base):
+    # written to a temporary file then renamed, so a parser failing in the
+    # middle of its stream does not leave a truncated output behind
+    compression = config.compression
+    output_file = base + ('.jsonl' if is_streaming(result) else serialization.extension())
+    if compression is not None:
+        output_file += compressions[compression]
+    tmp_file = output_file + '.tmp'
+    try:
+        with _create(tmp_file, compression) as data_file:
+            if is_streaming(result):
+                for record in result:
+                    data_file.write(serialization.dumps(record, compact=True).encode('utf-8'))
+                    data_file.write(b'\n')
+            else:
+                data_file.write(serialization.encode(result))
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    return output_file
+
+
+def _write_columnar(result, base, schema):
+    # return None if the result is not a table, to save it as JSON instead
+    output_file = base + columnar.suffix
+    tmp_folder = output_file + '.tmp'
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    try:
+        if is_streaming(result):
+            if schema.get('layout', 'records') != 'records':
+                raise ValueError(f'a stream of records cannot have the {schema["layout"]} layout')
+            columnar.write_stream(result, tmp_folder, schema, config.columnar_output)
+        elif not columnar.write(result, tmp_folder, schema, config.columnar_output):
+            return None
+        if os.path.isdir(output_file):
+            shutil.rmtree(output_file)
+        os.replace(tmp_folder, output_file)
+    except BaseException:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        raise
+    return output_file
+
+
+def output_file(folder, parser):
+    """
+        Return the path of the output of a parser in folder, None if missing
+    """
+    for extension in extensions:
+        path = os.path.join(folder, parser + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def size(path):
+    """
+        Return the size in bytes of a parser output (file or .columns folder)
+    """
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, folders, files in os.walk(path) for name in files)
+
+
+def load(path):
+    """
+        Return the content of a parser output (.json, .msgpack or .columns,
+        compressed or not)
+    """
+    if path.endswith(columnar.suffix):
+        return columnar.load(path)
+    with open_output(path) as f:
+        return serialization.decode(f.read(), format_of(path))
+
+
+def records(path, key=None):
+    """
+        Iterate on the records of a parser output: the lines of a .jsonl file,
+        the rows of a .columns output, or the items of the list (at key, if
+        given) of a .json or .msgpack file. Compressed files are decompressed
+        as they are read.
+        The .json list is streamed with ijson when installed.
+    """
+    if is_stream_file(path):
+        with open_output(path) as f:
+            for line in f:
+                if line.strip():
+                    yield serialization.loads(line)
+        return
+
+    if path.endswith(columnar.suffix):
+        yield from columnar.rows(path, key)
+        return
+
+    if format_of(path) == '.json':
+        try:
+            import ijson
+        except ImportError:
+            ijson = None
+        if ijson is not None:
+            with open_output(path) as f:
+                yield from ijson.items(f, key + '.item' if key else 'item')
+            return
+    data = load(path)
+    if data is None:
+        return
+    yield from (data[key] if key else data)
+
+
+def columns(path, names, key=None):
+    """
+        Return name -> list of values of some columns of the records of a
+        parser output (the list at key, or the table key of a multi-table
+        output). Only these columns are read from a .columns output.
+    """
+    if path.endswith(columnar.suffix):
+        return columnar.columns(path, names, key)
+    result = {name: [] for name in names}
+    for row in records(path, key):
+        for name in names:
+            result[name].append(row.get(name))
+    return result
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Registry of the parsers and analysers
+#
+# Listing them only reads their definitions from their source (cached by
+# file modification time), none of their dependencies get imported. A
+# module is only imported when one of its functions is actually called.
+
+import os
+import ast
+import glob
+import json
+import tempfile
+import importlib.util
+
+import config
+
+# modules already imported: path -> (mtime, module)
+_modules = {}
+
+
+def read_metadata(path):
+    """
+        Return the module level constants of a parser or analyser
+        (parser_description, parser_input, parser_call, version_string, ...)
+        read from its source, so none of its dependencies get imported.
+    """
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read(), path)
+    metadata = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                metadata[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                continue
+    return metadata
+
+
+def list_plugins(folder, call, cache_file=None):
+    """
+        Return name -> metadata of the modules of folder defining call
+        (parser_call or analyser_call), sorted by name.
+        Metadata is cached in cache_file and only read again from the source
+        of the modules modified since.
+    """
+    if cache_file is None:
+        cache_file = config.metadata_cache
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    plugins = {}
+    updated = False
+    for path in sorted(glob.glob(os.path.join(folder, "*.py"))):
+        name = os.path.basename(path)[:-3]
+        if name.startswith('_'):
+            continue
+        key = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        entry = cache.get(key)
+        if entry is None or entry['mtime'] != mtime:
+            try:
+                entry = {"mtime": mtime, "metadata": read_metadata(path)}
+            except SyntaxError:
+                continue
+            cache[key] = entry
+            updated = True
+        if call in entry['metadata']:
+            plugins[name] = entry['metadata']
+
+    if updated:
+        _save_cache(cache, cache_file)
+    return plugins
+
+
+def _save_cache(cache, cache_file):
+    # written to a temporary file then renamed, so concurrent runs never
+    # read a partial cache
+    try:
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass        # the cache is only an optimization
+
+
+def load_module(path):
+    """
+        Import a parser or analyser from its path, once (again if modified)
+    """
+    key = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    if key in _modules and _modules[key][0] == mtime:
+        return _modules[key][1]
+    spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _modules[key] = (mtime, module)
+    return module
+
+
+def get_function(path, call):
+    """
+        Return the function named call of a parser or analyser
+    """
+    function = getattr(load_module(path), call, None)
+    if not callable(function):
+        raise AttributeError(f'{path} has no function {call}')
+    return function
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Profile parser and analyser runs (--profile)
+#
+# A profiled run writes to parsed_data/<case>/_profiles/:
+#   <name>.prof       cProfile statistics, for pstats or snakeviz
+#   <name>.collapsed  collapsed stacks, one "frame;frame;frame microseconds"
+#                     line per stack, for flamegraph.pl or speedscope
+#
+# cProfile only records caller -> callee edges, not full stacks: the time of
+# a function called from several places is split between its callers in
+# proportion of the time spent in each call site.
+
+import os
+import contextlib
+
+profiles_folder = '_profiles'
+max_depth = 128     # deeper stacks are cut in the collapsed output
+
+
+def profile_files(folder, name):
+    """
+        Return the paths of the .prof and .collapsed files of a run
+    """
+    base = os.path.join(folder, profiles_folder, name)
+    return base + '.prof', base + '.collapsed'
+
+
+@contextlib.contextmanager
+def profile(folder, name, enabled=True):
+    """
+        Profile the block and save its profile in folder/_profiles/, even if
+        it raised. Do nothing if not enabled.
+    """
+    if not enabled:
+        yield
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        prof_file, collapsed_file = profile_files(folder, name)
+        os.makedirs(os.path.dirname(prof_file), exist_ok=True)
+        profiler.dump_stats(prof_file)
+        stats = pstats.Stats(profiler).stats
+        with open(collapsed_file, 'w') as f:
+            for stack, microseconds in sorted(collapsed(stats).items()):
+                f.write(f'{stack} {microseconds}\n')
+
+
+def _label(function):
+    filename, line, name = function
+    if filename == '~':     # built-in function
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def collapsed(stats):
+    """
+        Return stack -> own time in microseconds, rebuilt from the statistics
+        of a profile (pstats.Stats().stats)
+    """
+    callees = {}
+    for function, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[function] = edge[3]
+
+    stacks = {}
+
+    def walk(function, stack, on_stack, time):
+        total_time = stats[function][3]
+        if total_time <= 0 or time < 0.000001:     # below a microsecond
+            return
+        fraction = min(1.0, time / total_time)
+        microseconds = int(stats[function][2] * fraction * 1000000)
+        if microseconds > 0:
+            stacks[stack] = stacks.get(stack, 0) + microseconds
+        if len(on_stack) >= max_depth:
+            return
+        for callee, edge_time in callees.get(function, {}).items():
+            if callee not in on_stack:      # recursion is folded in its first call
+                walk(callee, stack + ';' + _label(callee), on_stack | {callee}, edge_time * fraction)
+
+    for function, (cc, nc, tt, ct, callers) in stats.items():
+        if not callers:
+            walk(function, _label(function), {function}, ct)
+    return stacks
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,243 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Resources used by parser and analyser runs
+#
+# Each run of a parser or an analyser records its wall time, CPU time, peak
+# memory, input and output sizes and records per second in
+# parsed_data/<case>/_run_report.json (one entry per parser or analyser, the
+# last run). Runs of allparsers happen in parallel worker processes, the
+# report is updated under a lock.
+#
+# The peak memory is the one of the run, not of the (worker) process: the
+# resident memory is sampled while the run lasts, as ru_maxrss only gives
+# the peak since the process started, which a persistent worker reached in
+# any of its previous runs.
+#
+# fcntl and resource are Unix modules: without them (Windows) the report is
+# updated without a lock, the CPU time is the one of the process only, and
+# the memory is neither measured nor limited.
+
+import os
+import sys
+import json
+import time
+import datetime
+import tempfile
+import threading
+
+report_file = '_run_report.json'
+sample_interval = 0.05      # seconds between two samples of the resident memory of a run
+
+
+def _import(name):
+    try:
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+fcntl = _import('fcntl')
+resource = _import('resource')
+
+
+def _cpu_time():
+    # CPU time of this process and of its waited for children (e.g. log show)
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def current_rss():
+    """
+        Return the resident memory in bytes of this process, None where
+        /proc is not available (macOS)
+    """
+    if resource is None:
+        return None
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss():
+    # peaks in bytes since they started of this process and of its waited for
+    # children, kilobytes on Linux, bytes on macOS
+    if resource is None:
+        return 0, 0
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit)
+
+
+def limit_memory(megabytes):
+    """
+        Limit the address space of this process to megabytes MB: allocations
+        past it raise MemoryError instead of exhausting the memory of the host
+    """
+    if resource is None:
+        print(f'WARNING: cannot limit memory to {megabytes} MB. Reason: no resource module on {sys.platform}', file=sys.stderr)
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = megabytes * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        print(f'WARNING: cannot limit memory to {megabytes} MB. Reason: {str(e)}', file=sys.stderr)
+
+
+def out_of_memory(meter=None):
+    """
+        Return the description of a MemoryError: the memory limit and the
+        peak memory of the run measured by meter, if given
+    """
+    if resource is None:
+        limit = 'unknown limit'
+    else:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = 'no limit' if soft == resource.RLIM_INFINITY else f'limit {soft // (1024 * 1024)} MB'
+    if meter is None or meter.peak_rss is None:
+        return f'out of memory ({limit})'
+    return f'out of memory ({limit}, peak RSS of the run {meter.peak_rss / (1024 * 1024):.1f} MB)'
+
+
+class Meter:
+    """
+        Measure the wall time, CPU time and peak memory of a block:
+
+            with resources.Meter() as meter:
+                ...
+            meter.wall, meter.cpu, meter.start_rss, meter.peak_rss
+
+        peak_rss is the peak resident memory during the block: a new peak of
+        the process (ru_maxrss) if it reached one, the highest sample
+        otherwise, or of a child process (e.g. log show) if higher. None if
+        it cannot be told (no /proc and no new peak).
+    """
+
+    def __init__(self):
+        self.started = None
+        self.wall = None
+        self.cpu = None
+        self.start_rss = None
+        self.peak_rss = None
+        self._sampled = None
+        self._stop = None
+        self._sampler = None
+
+    def _sample(self):
+        while not self._stop.wait(sample_interval):
+            rss = current_rss()
+            if rss is not None and rss > self._sampled:
+                self._sampled = rss
+
+    def __enter__(self):
+        self.started = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        self.start_rss = current_rss()
+        self._sampled = self.start_rss
+        self._max_rss = _max_rss()
+        if self.start_rss is not None:
+            self._stop = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        self._wall = time.monotonic()
+        self._cpu = _cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.wall = time.monotonic() - self._wall
+        self.cpu = _cpu_time() - self._cpu
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            rss = current_rss()
+            if rss is not None and rss > self._sampled:
+                self._sampled = rss
+
+        own, children = _max_rss()
+        peaks = []
+        if own > self._max_rss[0]:
+            peaks.append(own)       # a peak of the process, so reached during this run
+        elif self._sampled is not None:
+            peaks.append(self._sampled)
+        if children > self._max_rss[1]:
+            peaks.append(children)
+        self.peak_rss = max(peaks) if peaks else None
+        return False
+
+
+def path_size(paths):
+    """
+        Return the size in bytes of files and folders (all the files below)
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for root, folders, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in files
+                             if os.path.isfile(os.path.join(root, name)))
+        elif os.path.isfile(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def entry(kind, meter, status, input_bytes, output_bytes=None, records=None, error=None):
+    """
+        Return the report entry of a run
+    """
+    records_per_second = None
+    if records is not None and meter.wall:
+        records_per_second = round(records / meter.wall, 1)
+    return {
+        "kind": kind,
+        "status": status,
+        "started": meter.started,
+        "wall_time": round(meter.wall, 3),
+        "cpu_time": round(meter.cpu, 3),
+        "start_rss": meter.start_rss,
+        "peak_rss": meter.peak_rss,
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "records": records,
+        "records_per_second": records_per_second,
+        "error": error
+    }
+
+
+def record(folder, name, run):
+    """
+        Save the report entry of the last run of name in folder/_run_report.json
+    """
+    path = os.path.join(folder, report_file)
+    os.makedirs(folder, exist_ok=True)
+    with open(path + '.lock', 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        report = read(folder)
+        report[name] = run
+        fd, tmp_file = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+        os.replace(tmp_file, path)
+
+
+def read(folder):
+    """
+        Return name -> entry of the last runs recorded in folder, {} if none
+    """
+    try:
+        with open(os.path.join(folder, report_file), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
@@ -0,0 +1,248 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Run tasks concurrently, each in its own worker process
+#
+# A process per task isolates the tasks from each other: a task crashing the
+# interpreter (segfault in a native module, os._exit, out of memory) or going
+# past its timeout is killed and reported without affecting the others.
+#
+# With persistent workers, a worker process runs task after task, so what a
+# task imports (parser modules) is imported once per worker. A worker whose
+# task crashed or timed out, or that died while idle, is replaced by a new
+# one. A worker may be given an initializer, called when it starts (e.g. to
+# import all the parser modules), replacements included.
+#
+# A worker may be given a memory limit (RLIMIT_AS): a task going past it
+# ends as 'out of memory', with the peak memory it reached, instead of
+# taking the host down.
+
+import time
+import signal
+import traceback
+import multiprocessing
+import multiprocessing.connection
+
+from utils import resources
+
+
+def _call(conn, function, args):
+    try:
+        result = function(*args)
+        conn.send(('ok', result, None))
+    except MemoryError:
+        conn.send(('out of memory', None, f'MemoryError: {resources.out_of_memory()}'))
+    except BaseException as e:
+        conn.send(('error', None, f'{type(e).__name__}: {str(e)}\n{traceback.format_exc()}'))
+
+
+def _worker(conn, function, args, memory_limit=None):
+    try:
+        if memory_limit is not None:
+            resources.limit_memory(memory_limit)
+        _call(conn, function, args)
+    finally:
+        conn.close()
+
+
+def _serve(conn, memory_limit=None, initializer=None):
+    # run the tasks received until told to stop, terminated quietly (a
+    # worker forked by serve.py inherits its SIGTERM handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        if memory_limit is not None:
+            resources.limit_memory(memory_limit)
+        if initializer is not None:
+            initializer()
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            _call(conn, *message)
+    finally:
+        conn.close()
+
+
+def _exit_message(exitcode, memory_limit):
+    message = f'worker exited with code {exitcode}'
+    if memory_limit is not None:
+        message += f' (memory limit {memory_limit} MB)'
+    elif exitcode == -9:
+        message += ' (killed, out of memory?)'
+    return message
+
+
+class Worker:
+    """
+        A worker process running task after task
+    """
+
+    def __init__(self, memory_limit=None, initializer=None):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child_conn, memory_limit, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def submit(self, function, args):
+        """
+            Send a task to the worker, raise OSError if it died
+        """
+        self.conn.send((function, args))
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class Task:
+    """
+        A function to call with args in a worker process
+    """
+
+    def __init__(self, name, function, args=()):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.status = 'pending'     # then ok, error, timeout, crashed or out of memory
+        self.result = None
+        self.error = None
+        self.start = None
+        self.duration = None
+        self.process = None
+        self.conn = None
+        self.worker = None
+
+    def launch(self, worker=None, memory_limit=None):
+        """
+            Run the task in its own process, limited to memory_limit MB, or in
+            worker (a Worker) if given
+        """
+        self.start = time.monotonic()
+        if worker is not None:
+            self.worker = worker
+            self.conn = worker.conn
+            self.process = worker.process
+            worker.submit(self.function, self.args)
+        else:
+            self.conn, child_conn = multiprocessing.Pipe(duplex=False)
+            self.process = multiprocessing.Process(target=_worker, args=(child_conn, self.function, self.args, memory_limit),
+                                                   name=self.name, daemon=True)
+            self.process.start()
+            child_conn.close()
+        self.status = 'running'
+
+    def finish(self, status, result=None, error=None):
+        self.duration = time.monotonic() - self.start
+        self.status = status
+        self.result = result
+        self.error = error
+        if self.worker is not None and status in ('ok', 'error'):
+            return      # the worker runs the next task
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def _idle_worker(idle, memory_limit=None, initializer=None):
+    # an idle worker may have died since its last task (killed, OOM killer)
+    while idle:
+        worker = idle.pop()
+        if worker.process.is_alive():
+            return worker
+        worker.stop()
+    return Worker(memory_limit, initializer)
+
+
+def _launch(task, idle, memory_limit=None, initializer=None):
+    worker = _idle_worker(idle, memory_limit, initializer)
+    try:
+        task.launch(worker)
+    except OSError:
+        # died between the check and the task being sent
+        worker.stop()
+        task.launch(Worker(memory_limit, initializer))
+
+
+def run(tasks, workers=None, timeout=None, on_done=None, persistent=False, pool=None, memory_limit=None,
+        initializer=None):
+    """
+        Run tasks (list of Task) with at most workers processes at once,
+        the number of CPUs by default. A task running longer than timeout
+        seconds is killed. on_done(task) is called as soon as a task is over
+        and may return new tasks to run. With persistent, the tasks are run
+        by long-lived worker processes instead of a process per task. pool,
+        a list of idle Worker, makes the workers outlive the call: they are
+        taken from it and put back in it when done, for the next call.
+        memory_limit is the memory (MB of address space) of each worker,
+        unlimited if None. initializer() is called in each persistent worker
+        when it starts.
+        Return the list of all the tasks run, with their status, result (value
+        returned by the function), error and duration.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers < 1:
+        raise ValueError(f'at least one worker is needed to run tasks, not {workers}')
+    waiting = list(tasks)
+    running = []
+    done = []
+    idle = pool if pool is not None else []        # persistent workers waiting for a task
+    persistent = persistent or pool is not None
+
+    while waiting or running:
+        while waiting and len(running) < workers:
+            task = waiting.pop(0)
+            if persistent:
+                _launch(task, idle, memory_limit, initializer)
+            else:
+                task.launch(memory_limit=memory_limit)
+            running.append(task)
+
+        wait_timeout = None
+        if timeout is not None:
+            wait_timeout = max(0, min(task.start + timeout for task in running) - time.monotonic())
+        handles = [task.conn for task in running]
+        handles += [task.process.sentinel for task in running]
+        ready = multiprocessing.connection.wait(handles, wait_timeout)
+
+        now = time.monotonic()
+        for task in list(running):
+            if task.conn in ready:
+                try:
+                    status, result, error = task.conn.recv()
+                    task.finish(status, result, error)
+                except EOFError:
+                    task.process.join()
+                    task.finish('crashed', error=_exit_message(task.process.exitcode, memory_limit))
+            elif task.process.sentinel in ready:
+                task.process.join()
+                task.finish('crashed', error=_exit_message(task.process.exitcode, memory_limit))
+            elif timeout is not None and now - task.start >= timeout:
+                task.finish('timeout', error=f'stopped after {timeout} seconds')
+            else:
+                continue
+            running.remove(task)
+            done.append(task)
+            if task.worker is not None and task.status in ('ok', 'error'):
+                idle.append(task.worker)
+            if on_done is not None:
+                waiting.extend(on_done(task) or [])
+
+    if pool is None:
+        for worker in idle:
+            worker.stop()
+    return done
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
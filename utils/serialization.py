@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+#
+# For Python3
+# Serialization of the parsed data, with selectable backends
+#
+# Backends (config.serializer):
+#   json      standard library
+#   orjson    JSON too, several times faster (optional module)
+#   msgpack   MessagePack, binary and more compact (optional module)
+#   auto      orjson if installed, json otherwise
+#
+# Streams of records (.jsonl) are always written as JSON lines, with orjson
+# when installed, so they stay readable by Timesketch and line tools.
+#
+# All the backends give the same data back: what JSON makes of it, keys as
+# strings and non-finite floats (NaN, Infinity) as null.
+
+import json
+import math
+
+import config
+
+extensions = {'json': '.json', 'orjson': '.json', 'msgpack': '.msgpack'}
+
+
+def _import(name):
+    try:
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+orjson = _import('orjson')
+
+
+def backend():
+    """
+        Return the name of the configured backend
+    """
+    name = config.serializer
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'json'
+    if name not in extensions:
+        raise ValueError(f'unknown serializer {name}, use json, orjson, msgpack or auto')
+    if name == 'orjson' and orjson is None:
+        raise ImportError('orjson is not installed, use another serializer in config.py')
+    if name == 'msgpack' and _import('msgpack') is None:
+        raise ImportError('msgpack is not installed, use another serializer in config.py')
+    return name
+
+
+def extension():
+    """
+        Return the extension of the documents written by the configured backend
+    """
+    return extensions[backend()]
+
+
+def _key(key):
+    # the key JSON writes for a non-string key
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    return str(key)
+
+
+def normalize(obj):
+    """
+        Return obj as JSON represents it: keys as strings, non-finite floats as
+        None, tuples as lists
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {_key(key): normalize(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [normalize(value) for value in obj]
+    return obj
+
+
+def dumps(obj, compact=None):
+    """
+        Return obj as JSON text. Indented unless compact (config.compact_output
+        by default).
+    """
+    if compact is None:
+        compact = config.compact_output
+    if orjson is not None and config.serializer != 'json':
+        option = orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option).decode('utf-8')
+        except TypeError:
+            pass        # e.g. integers above 64 bits, let the standard library write them
+    options = {"separators": (',', ':')} if compact else {"indent": 4}
+    try:
+        return json.dumps(obj, allow_nan=False, **options)
+    except ValueError:
+        # NaN and Infinity are not JSON, written as null like orjson does
+        return json.dumps(normalize(obj), allow_nan=False, **options)
+
+
+def loads(data):
+    """
+        Return the object of a JSON text (str or bytes)
+    """
+    if orjson is not None and config.serializer != 'json':
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass        # e.g. NaN written by an older version, accepted by the standard library
+    return json.loads(data)
+
+
+def encode(obj, compact=None):
+    """
+        Return obj as bytes, with the configured backend
+    """
+    if backend() == 'msgpack':
+        import msgpack
+        return msgpack.packb(normalize(obj), use_bin_type=True)
+    return dumps(obj, compact).encode('utf-8')
+
+
+def decode(data, extension):
+    """
+        Return the object of bytes written by encode, the backend being given
+        by the extension (.json or .msgpack)
+    """
+    if extension == '.msgpack':
+        import msgpack
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return loads(data)
+
+
+def dump(obj, path, compact=None):
+    """
+        Write obj to path with the configured backend
+    """
+    with open(path, 'wb') as f:
+        f.write(encode(obj, compact))
+
+
+def load(path):
+    """
+        Read a document written by dump, the backend being given by the extension
+    """
+    with open(path, 'rb') as f:
+        return decode(f.read(), '.msgpack' if path.endswith('.msgpack') else '.json')
+
+# --------------------------------------------------------------------------- #
+# That's all folk ;)
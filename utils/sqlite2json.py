@@ -9,16 +9,55 @@
 #   ./logs/powerlogs/powerlog_2019-11-07_17-23_ED7F7E2B.PLSQL
 #   ./logs/Accessibility/TCC.db
 #   ./logs/appinstallation/appstored.sqlitedb
+import os
 import sys
 import json
+import shutil
 import sqlite3
+import tempfile
+import contextlib
+import urllib.parse
 from optparse import OptionParser
 
 version_string = "sqlite2json.py v2020-02-18 Version 1.0"
 
+journal_suffixes = ['-wal', '-journal']
+
 # --------------------------------------------------------------------------- #
 
 
+@contextlib.contextmanager
+def open_database(dbpath):
+    """
+        Open a SQLite DB of a case without ever writing to it: its files are
+        evidence, or read-only hard links shared by the cases of the store.
+        A DB with a journal is copied with it to a temporary folder, where
+        SQLite can replay the journal, others are opened read-only.
+    """
+    journals = [dbpath + suffix for suffix in journal_suffixes if os.path.exists(dbpath + suffix)]
+    if not journals:
+        uri = f"file:{urllib.parse.quote(os.path.abspath(dbpath))}?mode=ro&immutable=1"
+        dbfd = sqlite3.connect(uri, uri=True)
+        try:
+            yield dbfd
+        finally:
+            dbfd.close()
+        return
+
+    tmp_folder = tempfile.mkdtemp(prefix='sysdiagnose-sqlite-')
+    try:
+        copy = os.path.join(tmp_folder, os.path.basename(dbpath))
+        for path in [dbpath] + journals:
+            shutil.copyfile(path, copy + path[len(dbpath):])
+        dbfd = sqlite3.connect(copy)
+        try:
+            yield dbfd
+        finally:
+            dbfd.close()
+    finally:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+
+
 def sqlite2struct(dbpath):
     """
         Transform a SQLite DB to a Python struct.
@@ -26,10 +65,10 @@ def sqlite2struct(dbpath):
     """
     try:
         dbstruct = {}
-        dbfd = sqlite3.connect(dbpath)
-        for table in gettables(dbfd):
-            content = table2struct(dbfd, table)
-            dbstruct[table] = content
+        with open_database(dbpath) as dbfd:
+            for table in gettables(dbfd):
+                content = table2struct(dbfd, table)
+                dbstruct[table] = content
         return dbstruct
     except Exception as e:
         print(f"Could not parse {dbpath}. Reason: {str(e)}", file=sys.stderr)